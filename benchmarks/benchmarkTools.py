@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+# Copyright 2016 - 2024 Bas van Meerten and Wouter Franssen
+
+# This file is part of ssNake.
+#
+# ssNake is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ssNake is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ssNake. If not, see <http://www.gnu.org/licenses/>.
+
+# Shared timing, comparison and output of the benchmark scripts.
+# Importing this module makes the ssNake modules in src importable.
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+import numpy as np
+import scipy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+def timeRepeat(func, repeat=1):
+    """
+    Times repeated calls of a function.
+
+    Parameters
+    ----------
+    func : callable
+        The function to time, called without arguments.
+    repeat : int, optional
+        The number of timed calls.
+
+    Returns
+    -------
+    ndarray
+        The duration of every call in seconds.
+    object
+        The return value of the last call.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return np.array(times), result
+
+def systemInfo():
+    """
+    Returns the date and information on the system, which are stored with the results.
+
+    Returns
+    -------
+    dict
+        The date, machine, processor, number of CPUs, and the versions of Python, NumPy and SciPy.
+    """
+    return {'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'machine': platform.platform(),
+            'processor': platform.processor(),
+            'cpuCount': multiprocessing.cpu_count(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'scipy': scipy.__version__}
+
+def argumentParser(description, output):
+    """
+    Returns an argument parser with the output and compare options of all benchmarks.
+
+    Parameters
+    ----------
+    description : str
+        The description of the benchmark.
+    output : str
+        The default output file.
+
+    Returns
+    -------
+    ArgumentParser
+        The parser, to which the options of the benchmark can be added.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('-o', '--output', default=output, help='file to write the results to (JSON)')
+    parser.add_argument('--compare', help='earlier result file to compare with')
+    return parser
+
+def compare(new, old, key, formatResult):
+    """
+    Prints the results that are in both benchmark results, with the ratio of their timings (new/old).
+
+    Parameters
+    ----------
+    new, old : dict
+        The benchmark results.
+    key : callable
+        Returns the identification of a single result, such as the case parameters.
+    formatResult : callable
+        Formats a result, with an optional reference result to compare with.
+    """
+    oldResults = {key(result): result for result in old['results']}
+    for result in new['results']:
+        if key(result) in oldResults:
+            print(formatResult(result, oldResults[key(result)]))
+
+def saveResults(output, args, key, formatResult):
+    """
+    Writes the benchmark results to the output file and compares them with an earlier result file if requested.
+
+    Parameters
+    ----------
+    output : dict
+        The benchmark results.
+    args : Namespace
+        The parsed arguments of argumentParser.
+    key : callable
+        Returns the identification of a single result (see compare).
+    formatResult : callable
+        Formats a result (see compare).
+    """
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=2)
+    if args.compare is not None:
+        with open(args.compare) as f:
+            print('\nCompared with ' + args.compare + ':')
+            compare(output, json.load(f), key, formatResult)
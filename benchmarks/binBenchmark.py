@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+# Copyright 2016 - 2024 Bas van Meerten and Wouter Franssen
+
+# This file is part of ssNake.
+#
+# ssNake is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ssNake is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ssNake. If not, see <http://www.gnu.org/licenses/>.
+
+# Headless benchmark of the binning of simulated frequencies.
+# The static CSA powder frequencies of ZCW angle sets are binned with np.histogram (np.histogram2d for 2D),
+# as before, and with simFunctions.binFrequencies, with and without interpolation.
+# The discretization noise is the RMS deviation from the spectrum of a much larger angle set.
+# Usage: python binBenchmark.py [-o results.json] [--compare previous.json]
+
+import numpy as np
+import benchmarkTools as bench
+import simFunctions as simFunc
+
+SIZE = 2048
+SIZE2D = 256
+CHENGS = [10, 15, 20, 24]
+REFCHENG = 30           # Cheng number of the reference spectrum for the discretization noise
+REPEAT = 20
+TENSORS = [(0.6, 0.3), (-0.4, 0.8)]     # Anisotropy relative to the spectral width, and asymmetry of the CSA in every dimension
+
+def frequencies(cheng, dim):
+    """
+    Returns the static CSA powder frequencies of a ZCW angle set.
+
+    Parameters
+    ----------
+    cheng : int
+        The Cheng number of the angle set.
+    dim : int
+        The number of dimensions, each with a different tensor (see TENSORS).
+
+    Returns
+    -------
+    list of ndarray
+        The frequencies in units of the spectral width for every dimension.
+    ndarray
+        The weights of the orientations.
+    """
+    phi, theta, weight = simFunc.zcw_angles(cheng, 2)
+    v = []
+    for delta, eta in TENSORS[:dim]:
+        v.append(0.5 * delta * (3 * np.cos(theta)**2 - 1 - eta * np.sin(theta)**2 * np.cos(2 * phi)))
+    return v, weight
+
+def binHistogram(v, weight, length, limits, interpolate):
+    if len(v) == 1:
+        return np.histogram(v[0], length[0], range=limits[0], weights=weight)[0]
+    return np.histogram2d(v[0], v[1], length, range=limits, weights=weight)[0]
+
+def binBincount(v, weight, length, limits, interpolate):
+    return simFunc.binFrequencies(v, weight, length, limits, interpolate)
+
+# name: (function, interpolate)
+ENGINES = {'histogram': (binHistogram, False),
+           'bincount': (binBincount, False),
+           'bincount interpolated': (binBincount, True)}
+
+def runCase(engine, cheng, dim, repeat):
+    """
+    Benchmarks a single engine, Cheng number, and dimension.
+
+    Returns
+    -------
+    dict
+        The timing, the difference with np.histogram, and the discretization noise of the case.
+    """
+    length = [SIZE] if dim == 1 else [SIZE2D] * dim
+    limits = [(-0.5, 0.5)] * dim
+    binFunc, interpolate = ENGINES[engine]
+    v, weight = frequencies(cheng, dim)
+    times, result = bench.timeRepeat(lambda: binFunc(v, weight, length, limits, interpolate), repeat)
+    elapsed = float(np.mean(times))
+    scale = np.max(np.abs(result))
+    difference = np.max(np.abs(result - binHistogram(v, weight, length, limits, False))) / scale
+    refV, refWeight = frequencies(REFCHENG, dim)
+    reference = binBincount(refV, refWeight, length, limits, interpolate) * (np.sum(weight) / np.sum(refWeight))
+    noise = np.sqrt(np.mean((result - reference)**2)) / scale
+    return {'engine': engine, 'dim': dim, 'cheng': cheng, 'orientations': len(weight),
+            'time': elapsed, 'difference': float(difference), 'noise': float(noise)}
+
+def runBenchmark(engines, chengs, dims, repeat, verbose=True):
+    """
+    Runs the benchmark for all combinations of engines, Cheng numbers, and dimensions.
+
+    Returns
+    -------
+    dict
+        The benchmark results and information on the system.
+    """
+    results = []
+    for dim in dims:
+        for cheng in chengs:
+            for engine in engines:
+                result = runCase(engine, cheng, dim, repeat)
+                if verbose:
+                    print(formatResult(result), flush=True)
+                results.append(result)
+    output = bench.systemInfo()
+    output.update({'size': SIZE, 'size2D': SIZE2D, 'refCheng': REFCHENG})
+    output['results'] = results
+    return output
+
+def formatResult(result, reference=None):
+    line = '%-22s %dD cheng %2d %8d orientations %9.3f ms   difference %.1e   noise %.2e' % (result['engine'], result['dim'], result['cheng'], result['orientations'],
+                                                                                          result['time'] * 1e3, result['difference'], result['noise'])
+    if reference is not None:
+        line += '   x%.2f' % (result['time'] / reference['time'])
+    return line
+
+def resultKey(result):
+    return (result['engine'], result['dim'], result['cheng'])
+
+def main():
+    parser = bench.argumentParser('Benchmark of the ssNake frequency binning.', 'binBenchmark.json')
+    parser.add_argument('-e', '--engines', nargs='+', default=list(ENGINES.keys()), choices=list(ENGINES.keys()), metavar='ENGINE',
+                        help='engines to benchmark: ' + ', '.join(ENGINES.keys()))
+    parser.add_argument('-c', '--cheng', nargs='+', type=int, default=CHENGS, help='Cheng numbers of the angle sets')
+    parser.add_argument('-d', '--dims', nargs='+', type=int, default=[1, 2], choices=[1, 2], help='number of dimensions')
+    parser.add_argument('-r', '--repeat', type=int, default=REPEAT, help='number of timed repetitions')
+    args = parser.parse_args()
+    output = runBenchmark(args.engines, args.cheng, args.dims, args.repeat)
+    bench.saveResults(output, args, resultKey, formatResult)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+
+# Copyright 2016 - 2024 Bas van Meerten and Wouter Franssen
+
+# This file is part of ssNake.
+#
+# ssNake is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ssNake is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ssNake. If not, see <http://www.gnu.org/licenses/>.
+
+# Headless benchmark of the fitting engine.
+# Synthetic spectra are simulated with the built-in fit models, after which single
+# evaluations of the cost function and complete fits are timed.
+# Usage: python fitBenchmark.py [-o results.json] [--compare previous.json]
+
+import queue
+import numpy as np
+import benchmarkTools as bench
+import simFunctions as simFunc
+import fitFunctions as fitFuncs
+
+FREQ = 100e6            # Larmor frequency in Hz
+SW = 50e3               # Spectral width in Hz
+SIZES = [512, 2048, 8192]
+SIZES2D = [32, 64, 128]
+CHENGS = [5, 10, 15]
+ANGLE = np.arctan(np.sqrt(2))
+NOISE = 1e-3            # Noise level relative to the maximum of the spectrum
+PERTURB = 1.05          # Factor between the true values and the initial guess
+
+def freqAxis(size, sw=SW):
+    """
+    Returns a frequency axis as used for a spectrum.
+
+    Parameters
+    ----------
+    size : int
+        The number of points.
+    sw : float, optional
+        The spectral width in Hz.
+
+    Returns
+    -------
+    ndarray
+        The frequency axis in Hz.
+    """
+    return np.fft.fftshift(np.fft.fftfreq(size, 1.0 / sw))
+
+def powder(cheng, symm=2):
+    """
+    Returns the powder angles and Wigner matrices as used by the parameter frames.
+
+    Parameters
+    ----------
+    cheng : int
+        The Cheng number of the ZCW angle set.
+    symm : int, optional
+        The symmetry of the angle set (see zcw_angles).
+
+    Returns
+    -------
+    ndarray
+        The second rank Wigner matrices.
+    ndarray
+        The fourth rank Wigner matrices.
+    ndarray
+        The weights of the orientations.
+    """
+    alpha, beta, weight = simFunc.zcw_angles(cheng, symm)
+    D2 = simFunc.D2tens(alpha, beta, np.zeros_like(alpha))
+    D4 = simFunc.D4tens(alpha, beta, np.zeros_like(alpha))
+    return D2, D4, weight
+
+def czjzekLib(size, cheng, mas, spinspeed):
+    """
+    Generates a small library for the Czjzek models.
+    """
+    D2, D4, weight = powder(cheng)
+    extra = [False, 1.5, 32, ANGLE, D2, D4, weight, mas]
+    return simFunc.genLib(size, 0.0, 4.0, 0.0, 1.0, 20, 5, extra, FREQ, SW, spinspeed)
+
+def setupPeak(size, cheng, freqDomain=False):
+    return {'func': simFunc.peakSimFreq if freqDomain else simFunc.peakSim,
+            'x': [freqAxis(size)], 'freq': [FREQ], 'sw': [SW],
+            'fft': () if freqDomain else (0,), 'fftshift': () if freqDomain else (0,),
+            'single': {'Offset': 0.0, 'Multiplier': 1.0},
+            'multi': {'Position': [-5e3, 0.0, 4e3], 'Integral': [1.0, 2.0, 1.5], 'Lorentz': [200.0, 300.0, 150.0], 'Gauss': [100.0, 0.0, 50.0]},
+            'fit': ['Position', 'Integral', 'Lorentz'], 'extra': []}
+
+def setupCsa(size, cheng, mas=0, interpolate=False):
+    if interpolate:
+        D2, _, triangles, weight = simFunc.powderTriangles(cheng, 2)
+    else:
+        D2, _, weight = powder(cheng)
+    return {'func': simFunc.csaFunc, 'x': [freqAxis(size)], 'freq': [FREQ], 'sw': [SW],
+            'fft': (0,), 'fftshift': (),
+            'single': {'Offset': 0.0, 'Multiplier': 1.0, 'Spinspeed': 5.0},
+            'multi': {'Definition1': [8e3], 'Definition2': [1e3], 'Definition3': [-6e3], 'Integral': [1.0], 'Lorentz': [200.0], 'Gauss': [0.0]},
+            'fit': ['Definition1', 'Definition2', 'Definition3', 'Lorentz'],
+            'extra': [0, 32, ANGLE, D2, weight, mas] + ([triangles] if interpolate else [])}
+
+def setupQuad(size, cheng):
+    D2, D4, weight = powder(cheng)
+    return {'func': simFunc.quadFunc, 'x': [freqAxis(size)], 'freq': [FREQ], 'sw': [SW],
+            'fft': (0,), 'fftshift': (),
+            'single': {'Offset': 0.0, 'Multiplier': 1.0, 'Spinspeed': 10.0},
+            'multi': {'Position': [0.0], 'Cq': [2.5], 'eta': [0.3], 'Integral': [1.0], 'Lorentz': [100.0], 'Gauss': [0.0], 'LorentzST': [100.0]},
+            'fit': ['Position', 'Cq', 'eta', 'Lorentz'],
+            'extra': [False, 1.5, 32, ANGLE, D2, D4, weight, 2]}
+
+def setupQuadCsa(size, cheng, interpolate=False):
+    if interpolate:
+        D2, D4, triangles, weight = simFunc.powderTriangles(cheng, 1)
+    else:
+        D2, D4, weight = powder(cheng, 1)
+    return {'func': simFunc.quadCSAFunc, 'x': [freqAxis(size)], 'freq': [FREQ], 'sw': [SW],
+            'fft': (0,), 'fftshift': (),
+            'single': {'Offset': 0.0, 'Multiplier': 1.0, 'Spinspeed': 10.0},
+            'multi': {'Definition1': [4e3], 'Definition2': [0.0], 'Definition3': [-3e3], 'Cq': [1.5], 'eta': [0.5], 'Alpha': [0.0], 'Beta': [30.0],
+                      'Gamma': [0.0], 'Integral': [1.0], 'Lorentz': [100.0], 'Gauss': [0.0], 'LorentzST': [100.0]},
+            'fit': ['Definition1', 'Definition2', 'Definition3', 'Cq', 'eta'],
+            'extra': [False, 1.5, 32, ANGLE, D2, D4, weight, 0, 0] + ([triangles] if interpolate else [])}
+
+def setupQuadCzjzek(size, cheng):
+    lib, cqLib, etaLib = czjzekLib(size, cheng, 2, 10.0)
+    return {'func': simFunc.quadCzjzekFunc, 'x': [freqAxis(size)], 'freq': [FREQ], 'sw': [SW],
+            'fft': (0,), 'fftshift': (),
+            'single': {'Offset': 0.0, 'Multiplier': 1.0},
+            'multi': {'Position': [0.0], 'Sigma': [1.0], 'Cq0': [0.0], 'eta0': [0.0], 'Integral': [1.0], 'Lorentz': [100.0], 'Gauss': [0.0]},
+            'fit': ['Position', 'Sigma', 'Lorentz'],
+            'extra': [0, 5, lib, cqLib, etaLib]}
+
+def setupMqmas(size, cheng):
+    D2, D4, weight = powder(cheng)
+    return {'func': simFunc.mqmasFunc, 'x': [freqAxis(size), freqAxis(size)], 'freq': [FREQ, FREQ], 'sw': [SW, SW],
+            'fft': (0, 1), 'fftshift': (),
+            'single': {'Offset': 0.0, 'Multiplier': 1.0, 'Spinspeed': 10.0},
+            'multi': {'Position': [0.0], 'Gauss': [500.0], 'Cq': [2.5], 'eta': [0.3], 'Integral': [1.0], 'Lorentz': [200.0], 'Lorentz1': [200.0]},
+            'fit': ['Position', 'Cq', 'eta'],
+            'extra': [1.5, 3, 32, ANGLE, D2, D4, weight, 0.0, 1.0, 2, True]}
+
+def setupMqmasCzjzek(size, cheng):
+    lib, cqLib, etaLib = czjzekLib(size, cheng, 2, np.inf)
+    return {'func': simFunc.mqmasCzjzekFunc, 'x': [freqAxis(size), freqAxis(size)], 'freq': [FREQ, FREQ], 'sw': [SW, SW],
+            'fft': (0,), 'fftshift': (),
+            'single': {'Offset': 0.0, 'Multiplier': 1.0},
+            'multi': {'Position': [0.0], 'Gauss': [500.0], 'Sigma': [1.0], 'Cq0': [0.0], 'eta0': [0.0], 'Integral': [1.0], 'Lorentz': [200.0], 'Lorentz1': [200.0]},
+            'fit': ['Position', 'Sigma'],
+            'extra': [1.5, 3, cqLib, etaLib, lib, 0.0, 1.0, 0, 5]}
+
+def setupRelax(size, cheng):
+    return {'func': simFunc.relaxationFunc, 'x': [np.linspace(0, 5.0, size)], 'freq': [FREQ], 'sw': [SW],
+            'fft': (), 'fftshift': (),
+            'single': {'Amplitude': 1.0, 'Constant': 0.0},
+            'multi': {'Coefficient': [1.0, 0.5], 'T': [0.2, 1.5]},
+            'fit': ['Coefficient', 'T'], 'extra': []}
+
+def setupDiffusion(size, cheng):
+    return {'func': simFunc.diffusionFunc, 'x': [np.linspace(0, 1.0, size)], 'freq': [FREQ], 'sw': [SW],
+            'fft': (), 'fftshift': (),
+            'single': {'Amplitude': 1.0, 'Constant': 0.0},
+            'multi': {'Coefficient': [1.0], 'D': [1e-9]},
+            'fit': ['Coefficient', 'D'], 'extra': [42.576, 1e-3, 0.1]}
+
+# name: (setup function, powder model, dimension)
+MODELS = {'peakSim': (setupPeak, False, 1),
+          'peakSimFreq': (lambda size, cheng: setupPeak(size, cheng, True), False, 1),
+          'csaFunc': (setupCsa, True, 1),
+          'csaFunc MAS': (lambda size, cheng: setupCsa(size, cheng, 1), True, 1),
+          'csaFunc ASG': (lambda size, cheng: setupCsa(size, cheng, 0, True), True, 1),
+          'quadFunc': (setupQuad, True, 1),
+          'quadCSAFunc': (setupQuadCsa, True, 1),
+          'quadCSAFunc ASG': (lambda size, cheng: setupQuadCsa(size, cheng, True), True, 1),
+          'quadCzjzekFunc': (setupQuadCzjzek, True, 1),
+          'mqmasFunc': (setupMqmas, True, 2),
+          'mqmasCzjzekFunc': (setupMqmasCzjzek, True, 2),
+          'relaxationFunc': (setupRelax, False, 1),
+          'diffusionFunc': (setupDiffusion, False, 1)}
+
+def buildFit(setup, seed=0):
+    """
+    Simulates the synthetic data of a model and builds the input of the fitting engine.
+
+    Parameters
+    ----------
+    setup : dict
+        The model definition as returned by one of the setup functions.
+    seed : int, optional
+        The seed of the noise.
+
+    Returns
+    -------
+    tuple
+        The x-axes, data, initial guess, and additional arguments as used by mpFit.
+    """
+    singleNames = list(setup['single'].keys())
+    multiNames = list(setup['multi'].keys())
+    numExp = len(setup['multi'][multiNames[0]])
+    struc = {name: [] for name in singleNames + multiNames}
+    true = []
+    argu = []
+    for name in singleNames:
+        argu.append(setup['single'][name])
+        struc[name].append((0, len(argu) - 1))
+    for i in range(numExp):
+        for name in multiNames:
+            if name in setup['fit']:
+                true.append(setup['multi'][name][i])
+                struc[name].append((1, len(true) - 1))
+            else:
+                argu.append(setup['multi'][name][i])
+                struc[name].append((0, len(argu) - 1))
+    argu.append(setup['extra'])
+    args = ([slice(0, len(true))], [numExp], [struc], [argu], [setup['freq']], [setup['sw']], [1.0], [setup['fft']],
+            [setup['fftshift']], [singleNames], [multiNames])
+    xax = [setup['x']]
+    data = fitFuncs.fitFunc([setup['func']], (np.array(true),), xax, args)[0]
+    rng = np.random.default_rng(seed)
+    data = data + NOISE * np.max(np.abs(data)) * rng.standard_normal(data.shape)
+    guess = [val * PERTURB if val != 0.0 else 0.1 for val in true]
+    return xax, [data], guess, args
+
+def runCase(name, size, cheng, repeat, method, numfeval, fit):
+    """
+    Benchmarks a single model, size, and Cheng number.
+
+    Returns
+    -------
+    dict
+        The timings of the case.
+    """
+    setupFunc = MODELS[name][0]
+
+    def prepare():
+        setup = setupFunc(size, cheng)
+        return setup, buildFit(setup)
+
+    setupTime, (setup, (xax, data, guess, args)) = bench.timeRepeat(prepare)
+    result = {'model': name, 'size': size, 'cheng': cheng, 'numParam': len(guess),
+              'setupTime': float(setupTime[0])}
+    cost = fitFuncs.FitCost(data, [1.0], [setup['func']], xax, args)
+    times, _ = bench.timeRepeat(lambda: cost(np.array(guess)), repeat)
+    result['evalTime'] = float(np.median(times))
+    result['evalTimeMin'] = float(np.min(times))
+    if fit:
+        resultQueue = queue.Queue()
+        fitTime, _ = bench.timeRepeat(lambda: fitFuncs.mpFit(xax, data, [1.0], guess, args, resultQueue, [setup['func']], method, numfeval))
+        result['fitTime'] = float(fitTime[0])
+        fitVal = resultQueue.get()
+        if fitVal is None or isinstance(fitVal, str):
+            result['fitError'] = fitVal if fitVal is not None else 'Optimal parameters not found'
+        else:
+            result['nfev'] = int(fitVal['nfev'])
+            result['cost'] = float(fitVal['fun'])
+    return result
+
+def runBenchmark(models, sizes, sizes2D, chengs, repeat, method, numfeval, fit, verbose=True):
+    """
+    Runs the benchmark for all combinations of models, sizes, and Cheng numbers.
+
+    Returns
+    -------
+    dict
+        The benchmark results and information on the system.
+    """
+    results = []
+    for name in models:
+        _, isPowder, dim = MODELS[name]
+        for size in (sizes2D if dim == 2 else sizes):
+            for cheng in (chengs if isPowder else [None]):
+                result = runCase(name, size, cheng, repeat, method, numfeval, fit)
+                if verbose:
+                    print(formatResult(result), flush=True)
+                results.append(result)
+    output = bench.systemInfo()
+    output.update({'method': method, 'numfeval': numfeval, 'repeat': repeat})
+    output['results'] = results
+    return output
+
+def formatResult(result, reference=None):
+    line = '%-16s %6d %6s %10.3f ms' % (result['model'], result['size'], result['cheng'], result['evalTime'] * 1e3)
+    if 'fitTime' in result:
+        line += ' %10.3f s' % result['fitTime']
+    if reference is not None:
+        line += '   eval x%.2f' % (result['evalTime'] / reference['evalTime'])
+        if 'fitTime' in result and 'fitTime' in reference:
+            line += '   fit x%.2f' % (result['fitTime'] / reference['fitTime'])
+    return line
+
+def resultKey(result):
+    return (result['model'], result['size'], result['cheng'])
+
+def main():
+    parser = bench.argumentParser('Benchmark of the ssNake fitting engine.', 'fitBenchmark.json')
+    parser.add_argument('-m', '--models', nargs='+', default=list(MODELS.keys()), choices=list(MODELS.keys()), metavar='MODEL',
+                        help='models to benchmark: ' + ', '.join(MODELS.keys()))
+    parser.add_argument('-s', '--sizes', nargs='+', type=int, default=SIZES, help='number of points of the 1-D models')
+    parser.add_argument('--sizes2d', nargs='+', type=int, default=SIZES2D, help='number of points per dimension of the 2-D models')
+    parser.add_argument('-c', '--cheng', nargs='+', type=int, default=CHENGS, help='Cheng numbers of the powder models (octant edge divisions for the ASG models)')
+    parser.add_argument('-r', '--repeat', type=int, default=20, help='number of timed evaluations')
+    parser.add_argument('--method', default='Powell', help='minimization method of the fits')
+    parser.add_argument('--numfeval', type=int, default=150, help='maximum number of function evaluations of the fits (the total budget for the global methods)')
+    parser.add_argument('--nofit', action='store_true', help='only time single evaluations')
+    args = parser.parse_args()
+    output = runBenchmark(args.models, args.sizes, args.sizes2d, args.cheng, args.repeat, args.method, args.numfeval, not args.nofit)
+    bench.saveResults(output, args, resultKey, formatResult)
+
+if __name__ == '__main__':
+    main()
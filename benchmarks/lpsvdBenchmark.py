@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+# Copyright 2016 - 2024 Bas van Meerten and Wouter Franssen
+
+# This file is part of ssNake.
+#
+# ssNake is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ssNake is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ssNake. If not, see <http://www.gnu.org/licenses/>.
+
+# Headless benchmark of the LPSVD linear prediction.
+# Synthetic 2D FIDs are predicted with the full SVD (one trace after the other, as before)
+# and with the fast engine, both serial and in parallel over the traces.
+# Usage: python lpsvdBenchmark.py [-o results.json] [--compare previous.json]
+
+import numpy as np
+import benchmarkTools as bench
+import functions as func
+import hypercomplex as hc
+import spectrum as sc
+
+SIZES = [256, 1024, 2048]
+TRACES = 8
+MAXFREQ = 20
+NPREDICT = 32
+FULLMAXSIZE = 2048      # Larger sizes are not run with the full SVD, which scales with the cube of the size
+NOISE = 1e-3            # Noise level relative to the largest amplitude
+FREQS = [0.05, 0.13, -0.2, 0.31, -0.37]            # Frequencies in units of the spectral width
+DAMPING = [0.002, 0.004, 0.001, 0.003, 0.005]       # Decay per point
+AMPS = [1.0, 0.5, 0.8, 0.3, 0.6]
+
+def syntheticFid(size, traces, seed=0):
+    """
+    Simulates noisy FIDs, including the points before and after the FID.
+
+    Parameters
+    ----------
+    size : int
+        The number of points of each FID.
+    traces : int
+        The number of FIDs.
+    seed : int, optional
+        The seed of the noise and the amplitude variation between the traces.
+
+    Returns
+    -------
+    ndarray
+        The noisy FIDs, with NPREDICT points on both sides that are not used for the prediction.
+    ndarray
+        The FIDs without noise.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(-NPREDICT, size + NPREDICT)
+    amps = np.array(AMPS) * rng.uniform(0.5, 1.0, (traces, 1))
+    clean = np.sum(amps[:, np.newaxis] * np.exp(t[:, np.newaxis] * (2j * np.pi * np.array(FREQS) - np.array(DAMPING))), axis=-1)
+    noise = NOISE * (rng.standard_normal(clean.shape) + 1j * rng.standard_normal(clean.shape))
+    return clean + noise, clean
+
+def predictionError(result, clean, forward):
+    """
+    Returns the largest deviation of the predicted points from the noise free signal.
+    """
+    if forward:
+        return float(np.max(np.abs(result[:, -NPREDICT:] - clean[:, -NPREDICT:])))
+    return float(np.max(np.abs(result[:, :NPREDICT] - clean[:, :NPREDICT])))
+
+def runSerial(fid, forward, fast):
+    return np.array([func.lpsvd(trace, NPREDICT, MAXFREQ, forward, fast=fast) for trace in fid])
+
+def runSpectrum(fid, forward, fast):
+    spec = sc.Spectrum(hc.HComplexData(fid), ('', ), [100e6] * 2, [50e3] * 2)
+    spec.noUndo = True
+    spec.lpsvd(NPREDICT, MAXFREQ, forward, axis=-1, fast=fast)
+    return spec.data.getHyperData(0)
+
+# name: (function, fast)
+ENGINES = {'full': (runSerial, False),
+           'full parallel': (runSpectrum, False),
+           'fast': (runSerial, True),
+           'fast parallel': (runSpectrum, True)}
+
+def runCase(engine, size, traces, forward):
+    """
+    Benchmarks a single engine, size, and direction.
+
+    Returns
+    -------
+    dict
+        The timing and accuracy of the case.
+    """
+    fid, clean = syntheticFid(size, traces)
+    if forward:
+        fid = fid[:, :-NPREDICT]
+        clean = clean[:, NPREDICT:]
+    else:
+        fid = fid[:, NPREDICT:]
+        clean = clean[:, :-NPREDICT]
+    runFunc, fast = ENGINES[engine]
+    times, result = bench.timeRepeat(lambda: runFunc(fid, forward, fast))
+    return {'engine': engine, 'size': size, 'traces': traces, 'forward': forward,
+            'time': float(times[0]),
+            'error': predictionError(result, clean, forward)}
+
+def runBenchmark(engines, sizes, traces, verbose=True):
+    """
+    Runs the benchmark for all combinations of engines, sizes, and directions.
+
+    Returns
+    -------
+    dict
+        The benchmark results and information on the system.
+    """
+    results = []
+    for size in sizes:
+        for forward in [False, True]:
+            for engine in engines:
+                if not ENGINES[engine][1] and size > FULLMAXSIZE:
+                    continue
+                result = runCase(engine, size, traces, forward)
+                if verbose:
+                    print(formatResult(result), flush=True)
+                results.append(result)
+    output = bench.systemInfo()
+    output.update({'maxFreq': MAXFREQ, 'nPredict': NPREDICT})
+    output['results'] = results
+    return output
+
+def formatResult(result, reference=None):
+    line = '%-14s %6d %4d %-8s %10.3f s   error %.2e' % (result['engine'], result['size'], result['traces'],
+                                                          'forward' if result['forward'] else 'backward', result['time'], result['error'])
+    if reference is not None:
+        line += '   x%.2f' % (result['time'] / reference['time'])
+    return line
+
+def resultKey(result):
+    return (result['engine'], result['size'], result['traces'], result['forward'])
+
+def main():
+    parser = bench.argumentParser('Benchmark of the ssNake LPSVD linear prediction.', 'lpsvdBenchmark.json')
+    parser.add_argument('-e', '--engines', nargs='+', default=list(ENGINES.keys()), choices=list(ENGINES.keys()), metavar='ENGINE',
+                        help='engines to benchmark: ' + ', '.join(ENGINES.keys()))
+    parser.add_argument('-s', '--sizes', nargs='+', type=int, default=SIZES, help='number of points of the FIDs')
+    parser.add_argument('-t', '--traces', type=int, default=TRACES, help='number of FIDs')
+    args = parser.parse_args()
+    output = runBenchmark(args.engines, args.sizes, args.traces)
+    bench.saveResults(output, args, resultKey, formatResult)
+
+if __name__ == '__main__':
+    main()
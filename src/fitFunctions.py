@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+
+# Copyright 2016 - 2024 Bas van Meerten and Wouter Franssen
+
+# This file is part of ssNake.
+#
+# ssNake is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ssNake is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ssNake. If not, see <http://www.gnu.org/licenses/>.
+
+import multiprocessing
+import signal
+import sys
+import numpy as np
+import scipy.optimize
+import simFunctions as simFunc
+import hypercomplex as hc
+
+GLOBALMETHODS = ['Differential evolution', 'Multi-start', 'Basin hopping']
+GLOBALLOCALMETHOD = 'Powell'  # Local method used by the multi-start and basin hopping searches
+GLOBALSPREAD = 1.0            # Relative half-width of the global search region around the guess
+GLOBALPOPSIZE = 15            # Population size multiplier for differential evolution
+GLOBALNUMSTART = 16           # Number of starting points for the multi-start search
+GLOBALNITER = 10              # Number of basin hopping iterations per chain
+
+def lstSqrs(dataList, indexList, *args):
+    """
+    Simulates spectra and calculates the least squares value with a given list of data.
+
+    Parameters
+    ----------
+    dataList : list of arrays
+        The list of spectra to compare with the simulations.
+        When the index of a spectrum is not None, only the data at these indices should be given (flattened).
+    indexList : list
+        For each spectrum the flat indices of the points included in the fit, or None to include all points.
+    *args
+        All other arguments are passed to fitFunc.
+
+    Returns
+    -------
+    float
+        The sum of the least squares values of the spectra.
+    """
+    simData = fitFunc(*args, index=indexList)
+    if simData is None:
+        return np.inf
+    costValue = 0
+    for i,_ in enumerate(dataList):
+        costValue += np.sum((dataList[i] - simData[i])**2)
+    return costValue
+
+def mpFit(xax, data1D, maskList, guess, args, queue, funcs, minmethod, numfeval, ranges=None):
+    """
+    The minimization function running in an separate process.
+
+    Parameters
+    ----------
+    xax : list of arrays
+        List of the x-axes of the data.
+    data1D : array or list of arrays
+        Array with the data to be fit.
+    maskList : list
+        The masks of the data, as returned by genMask.
+    guess : list
+        List with the initial guess values.
+    args : tuple
+        The tuple with additional values.
+    queue : Queue
+        The queue to communicate with the main process.
+        On success the results are put in this queue.
+        When a SimException is raised, the error message is put on this queue.
+        When the simulation fails otherwise, None is put on this queue.
+    funcs : list of functions
+        The functions to run per data in data1D.
+    minmethod : str
+        The minimization method of Scipy minimize to use, or one of GLOBALMETHODS.
+    numfeval : int
+        The maximum number of function evaluations.
+        For the global methods this is the total budget of the search, see globalFit.
+    ranges : list of tuple, optional
+        The (minimum, maximum) of every parameter in guess, None for no limit.
+        Only used by the global methods, see globalFit.
+    """
+    try:
+        costFunc = FitCost(data1D, maskList, funcs, xax, args)
+        if minmethod in GLOBALMETHODS:
+            # Make sure the worker pool is cleaned up when the fit is stopped
+            signal.signal(signal.SIGTERM, lambda *args: sys.exit())
+            fitVal = globalFit(costFunc, guess, minmethod, numfeval, ranges)
+        else:
+            fitVal = scipy.optimize.minimize(costFunc, guess, method=minmethod, options={'maxfev': numfeval})
+    except simFunc.SimException as e:
+        fitVal = str(e)
+    except Exception:
+        fitVal = None
+    queue.put(fitVal)
+
+class FitCost(object):
+    """
+    The least squares cost of a fit as a picklable object, such that it can be evaluated by a worker pool.
+    """
+
+    def __init__(self, data1D, maskList, funcs, xax, args):
+        """
+        Initializes the cost function.
+
+        Parameters
+        ----------
+        data1D : array or list of arrays
+            Array with the data to be fit.
+        maskList : list
+            The masks of the data, as returned by genMask.
+        funcs : list of functions
+            The functions to run per data in data1D.
+        xax : list of arrays
+            List of the x-axes of the data.
+        args : tuple
+            The tuple with additional values.
+        """
+        self.funcs = funcs
+        self.xax = xax
+        self.args = args
+        self.plan = FitPlan(args)
+        # Only the points included by the masks are compared with the simulations
+        self.indexList = []
+        self.dataList = []
+        for data, mask in zip(data1D, maskList):
+            if np.ndim(mask) == 0:
+                self.indexList.append(None)
+                self.dataList.append(np.asarray(data, dtype=float))
+            else:
+                index = np.flatnonzero(mask)
+                self.indexList.append(index)
+                self.dataList.append(np.asarray(data, dtype=float).reshape(-1)[index])
+
+    def __call__(self, *param):
+        return lstSqrs(self.dataList, self.indexList, self.funcs, param, self.xax, self.args, self.plan)
+
+class LocalFit(object):
+    """
+    A local minimization from a given starting point, used for the multi-start search.
+    """
+
+    def __init__(self, costFunc, numfeval, bounds):
+        self.costFunc = costFunc
+        self.numfeval = numfeval
+        self.bounds = bounds
+
+    def __call__(self, start):
+        return scipy.optimize.minimize(self.costFunc, start, method=GLOBALLOCALMETHOD, bounds=self.bounds, options={'maxfev': self.numfeval})
+
+class ScaledStep(object):
+    """
+    Random displacement for basin hopping, scaled per parameter to the size of the search region.
+    """
+
+    def __init__(self, scale, low, high, seed, stepsize=0.5):
+        self.scale = scale
+        self.low = low
+        self.high = high
+        self.stepsize = stepsize
+        self.rng = np.random.default_rng(seed)
+
+    def __call__(self, x):
+        return np.clip(x + self.rng.uniform(-self.stepsize, self.stepsize, len(x)) * self.scale, self.low, self.high)
+
+class BasinHopChain(object):
+    """
+    A single basin hopping chain, such that several independent chains can run on a worker pool.
+    """
+
+    def __init__(self, costFunc, guess, scale, bounds, numfeval):
+        self.costFunc = costFunc
+        self.guess = guess
+        self.scale = scale
+        self.bounds = bounds
+        self.numfeval = numfeval
+
+    def __call__(self, seed):
+        low, high = np.array(self.bounds, dtype=float).T
+        return scipy.optimize.basinhopping(self.costFunc, self.guess, niter=GLOBALNITER,
+                                           minimizer_kwargs={'method': GLOBALLOCALMETHOD, 'bounds': self.bounds, 'options': {'maxfev': self.numfeval}},
+                                           take_step=ScaledStep(self.scale, low, high, seed), seed=seed)
+
+def globalFit(costFunc, guess, method, numfeval, ranges=None):
+    """
+    Global minimization of the cost function.
+    The search region is centred on the initial guess, with a half-width of GLOBALSPREAD times the guess value (or GLOBALSPREAD for zero values).
+    The region is clipped to the physical range of every parameter (e.g. eta between 0 and 1, broadenings not negative),
+    which also bounds the local minimizations of the multi-start and basin hopping searches.
+    The population (differential evolution), the starting points (multi-start) or the chains (basin hopping) are evaluated on a worker pool.
+    The evaluation budget is the total of the search and is divided over the generations, starting points or chains,
+    so all methods use about the same number of evaluations.
+
+    Parameters
+    ----------
+    costFunc : FitCost
+        The function to minimize.
+    guess : list
+        List with the initial guess values.
+    method : str
+        The global method to use, one of GLOBALMETHODS.
+    numfeval : int
+        The total number of function evaluations of the search.
+        The final local polish of differential evolution is not included.
+    ranges : list of tuple, optional
+        The (minimum, maximum) of every parameter in guess, None for no limit.
+        By default the parameters are not limited.
+
+    Returns
+    -------
+    OptimizeResult
+        The best result that was found.
+    """
+    if ranges is None:
+        ranges = [(None, None)] * len(guess)
+    rangeLow, rangeHigh = np.array(ranges, dtype=float).T   # None becomes nan
+    rangeLow[np.isnan(rangeLow)] = -np.inf
+    rangeHigh[np.isnan(rangeHigh)] = np.inf
+    guess = np.clip(np.array(guess, dtype=float), rangeLow, rangeHigh)
+    scale = GLOBALSPREAD * np.abs(guess)
+    scale[scale == 0.0] = GLOBALSPREAD
+    low = np.maximum(guess - scale, rangeLow)
+    high = np.minimum(guess + scale, rangeHigh)
+    bounds = list(zip(low, high))
+    localBounds = list(zip(rangeLow, rangeHigh))
+    numProc = multiprocessing.cpu_count()
+    with multiprocessing.Pool(numProc) as pool:
+        if method == 'Differential evolution':
+            # The initial population counts as one generation
+            maxiter = max(1, numfeval // (GLOBALPOPSIZE * len(guess)) - 1)
+            return scipy.optimize.differential_evolution(costFunc, bounds, x0=guess, maxiter=maxiter, popsize=GLOBALPOPSIZE,
+                                                         updating='deferred', workers=pool.map)
+        if method == 'Multi-start':
+            rng = np.random.default_rng()
+            starts = [guess] + list(rng.uniform(low, high, (GLOBALNUMSTART - 1, len(guess))))
+            results = pool.map(LocalFit(costFunc, max(1, numfeval // GLOBALNUMSTART), localBounds), starts)
+        elif method == 'Basin hopping':
+            # Every chain does an initial minimization and GLOBALNITER hops
+            localfeval = max(1, numfeval // (numProc * (GLOBALNITER + 1)))
+            results = pool.map(BasinHopChain(costFunc, guess, scale, localBounds, localfeval), range(numProc))
+        else:
+            raise simFunc.SimException("Fitting: Unknown minimization method")
+    best = min(results, key=lambda result: result['fun'])
+    best['nfev'] = sum([result['nfev'] for result in results])
+    return best
+
+class FitPlan(object):
+    """
+    The parameter mapping of a fit, compiled once from the link structure.
+    All fitted, fixed and linked parameters are obtained with a single gather from a vector of the fitted and fixed values.
+    """
+
+    def __init__(self, args):
+        """
+        Compiles the parameter mapping.
+
+        Parameters
+        ----------
+        args : tuple
+            The additional arguments of fitFunc.
+
+        Raises
+        ------
+        SimException
+            When one of the parameters or links cannot be resolved.
+        """
+        specSlices = args[0]
+        allStruc = args[2]
+        allArgu = args[3]
+        self.numParam = max([0] + [length.stop for length in specSlices])
+        arguStart = [self.numParam]
+        for argu in allArgu:
+            arguStart.append(arguStart[-1] + len(argu) - 1)
+        self.fixed = np.array([val for argu in allArgu for val in argu[:-1]], dtype=float)
+        self.extra = [argu[-1] for argu in allArgu]
+        self.numExp = args[1]
+        self.numMulti = [len(multiNames) for multiNames in args[10]]
+        self.singleSlices = []
+        self.multiSlices = []
+        self.offsetIndex = []
+        index = []
+        scale = []
+        offset = []
+
+        def resolve(n, name, site):
+            # Returns the position in the value vector of parameter name of site in spectrum n
+            kind, pos = allStruc[n][name][site]
+            if kind == 1:
+                return specSlices[n].start + pos
+            if kind == 0:
+                return arguStart[n] + pos
+            raise KeyError(name)
+
+        def add(n, name, site):
+            kind, pos = allStruc[n][name][site]
+            if kind == 2:
+                index.append(resolve(pos[4], pos[0], pos[1]))
+                scale.append(pos[2])
+                offset.append(pos[3])
+            else:
+                index.append(resolve(n, name, site))
+                scale.append(1.0)
+                offset.append(0.0)
+
+        try:
+            for n, _ in enumerate(allStruc):
+                singleNames = args[9][n]
+                multiNames = args[10][n]
+                start = len(index)
+                for name in singleNames:
+                    add(n, name, 0)
+                self.singleSlices.append(slice(start, len(index)))
+                start = len(index)
+                for i in range(self.numExp[n]):
+                    for name in multiNames:
+                        add(n, name, i)
+                self.multiSlices.append(slice(start, len(index)))
+                self.offsetIndex.append(singleNames.index("Offset") if "Offset" in singleNames else None)
+        except (KeyError, IndexError, TypeError):
+            raise simFunc.SimException("Fitting: One of the keywords is not correct")
+        self.index = np.array(index, dtype=int)
+        self.scale = np.array(scale, dtype=float)
+        self.offset = np.array(offset, dtype=float)
+
+    def gather(self, params):
+        """
+        Assembles the parameters of all sites.
+
+        Parameters
+        ----------
+        params : array_like
+            The fitted parameters.
+
+        Returns
+        -------
+        list of tuples
+            For each spectrum a tuple with the list of single parameters and the array of the multi parameters with shape (numExp, number of multi names).
+        """
+        values = np.concatenate((np.asarray(params, dtype=float).reshape(-1), self.fixed))
+        values = self.scale * values[self.index] + self.offset
+        result = []
+        for n, numExp in enumerate(self.numExp):
+            singles = values[self.singleSlices[n]].tolist()
+            multis = values[self.multiSlices[n]].reshape(numExp, self.numMulti[n])
+            result.append((singles, multis))
+        return result
+
+def fitFunc(funcs, params, allX, args, plan=None, index=None):
+    """
+    Reconstructs all linked parameters and executes the fitting function for each set of data.
+
+    Parameters
+    ----------
+    funcs : list of functions
+        The list of fitting functions to execute.
+    params : tuple
+        The tuple with the function parameters generated by minimize.
+    allX : list of arrays
+        The list with x-axes.
+    args : tuple
+        Additional arguments for the fitting functions.
+    plan : FitPlan, optional
+        The compiled parameter mapping of args.
+        When None, it is compiled from args.
+    index : list, optional
+        For each spectrum the flat indices of the points to return, or None to return all points.
+        Functions in simFunc.POINTWISEFUNCS are only evaluated at these points.
+        None by default.
+
+    Returns
+    -------
+    list of arrays
+        A list with the simulated data.
+        When an index is given for a spectrum, only the (flattened) data at these indices is returned.
+    """
+    if plan is None:
+        plan = FitPlan(args)
+    allValues = plan.gather(params[0])
+    fullTestFunc = []
+    for n, _ in enumerate(allX):
+        x = allX[n]
+        select = None if index is None else index[n]
+        pointwise = select is not None and len(x) == 1 and funcs[n] in simFunc.POINTWISEFUNCS
+        if pointwise:
+            x = [x[0][select]]
+        testFunc = np.zeros([len(item) for item in x], dtype=complex)
+        freq = args[4][n]
+        sw = args[5][n]
+        axMult = args[6][n]
+        fft_axes = args[7][n]
+        fftshift_axes = args[8][n]
+        extra = plan.extra[n]
+        singles, multis = allValues[n]
+        multiFunc = simFunc.MULTISITEFUNCS.get(funcs[n])
+        if multiFunc is not None and len(multis) > 0:
+            output = multiFunc(x, freq, sw, axMult, extra, *(singles + list(multis.T)))
+            if output is None:
+                return None
+            testFunc += output
+        else:
+            for site in multis:
+                output = funcs[n](x, freq, sw, axMult, extra, *(singles + site.tolist()))
+                if output is None:
+                    return None
+                testFunc += output
+        testFunc = np.real(hc.fftn(testFunc, fft_axes, shift=fftshift_axes, overwrite=True))
+        if plan.offsetIndex[n] is not None:
+            testFunc += singles[plan.offsetIndex[n]]
+        if select is not None and not pointwise:
+            testFunc = testFunc.reshape(-1)[select]
+        fullTestFunc.append(testFunc)
+    return fullTestFunc
@@ -28,14 +28,15 @@ import numpy as np
 import matplotlib as mpl
 from matplotlib.figure import Figure
 import matplotlib.patches as mppatches
-import scipy.optimize
 from safeEval import safeEval
 from views import Current1D, CurrentContour
 import widgetClasses as wc
 import functions as func
 import simFunctions as simFunc
+import fitFunctions as fitFuncs
 import specIO as io
 import spectrum as sc
+import hypercomplex as hc
 from ssNake import SideFrame, VERSION, QtGui, QtCore, QtWidgets, FigureCanvas
 import Czjzek
 
@@ -74,6 +75,7 @@ class TabFittingWindow(QtWidgets.QWidget):
 
     MINMETHOD = 'Powell'
     NUMFEVAL = 150
+    NUMGLOBALFEVAL = 20000
 
     def __init__(self, father, oldMainWindow, mainFitType):
         """
@@ -216,7 +218,7 @@ class TabFittingWindow(QtWidgets.QWidget):
                 self.tabs.removeTab(num)
                 del self.subFitWindows[num - 1]
 
-    def fitProcess(self, xax, data1D, maskList, guess, args, funcs):
+    def fitProcess(self, xax, data1D, maskList, guess, args, funcs, ranges=None):
         """
         Creates a new process to fit the spectra.
 
@@ -232,13 +234,17 @@ class TabFittingWindow(QtWidgets.QWidget):
             The additional parameters of the fit.
         funcs : list of functions
             The fit function for each of the spectra.
+        ranges : list of tuple, optional
+            The physical (minimum, maximum) of every fit parameter, used by the global methods.
+
         Returns
         -------
         OptimizeResult
             The results of the fit.
         """
         self.queue = multiprocessing.Queue()
-        self.process1 = multiprocessing.Process(target=mpFit, args=(xax, data1D, maskList, guess, args, self.queue, funcs, self.MINMETHOD, self.NUMFEVAL))
+        numfeval = self.NUMGLOBALFEVAL if self.MINMETHOD in fitFuncs.GLOBALMETHODS else self.NUMFEVAL
+        self.process1 = multiprocessing.Process(target=fitFuncs.mpFit, args=(xax, data1D, maskList, guess, args, self.queue, funcs, self.MINMETHOD, numfeval, ranges))
         self.process1.start()
         self.running = True
         self.mainFitWindow.paramframe.stopButton.show()
@@ -331,6 +337,7 @@ class TabFittingWindow(QtWidgets.QWidget):
         data1D = [data1D]
         maskList = [mask]
         selectList = [slice(0, len(guess))]
+        ranges = self.mainFitWindow.paramframe.getGuessRanges(args[1][0], len(guess))
         funcs = [self.mainFitWindow.paramframe.FITFUNC]
         for i in range(len(self.subFitWindows)):
             xax_tmp, data1D_tmp, guess_tmp, args_tmp, out_tmp, mask = self.subFitWindows[i].paramframe.getFitParams()
@@ -339,13 +346,14 @@ class TabFittingWindow(QtWidgets.QWidget):
             data1D.append(data1D_tmp)
             maskList.append(mask)
             funcs.append(self.subFitWindows[i].paramframe.FITFUNC)
+            ranges += self.subFitWindows[i].paramframe.getGuessRanges(args_tmp[1][0], len(guess_tmp))
             guess += guess_tmp
             new_args = ()
             for n, _ in enumerate(args):
                 new_args += (args[n] + args_tmp[n],)
             args = new_args  # tuples are immutable
         new_args = (selectList,) + args
-        allFitVal = self.fitProcess(xax, np.array(data1D, dtype=object), maskList, guess, new_args, funcs)
+        allFitVal = self.fitProcess(xax, np.array(data1D, dtype=object), maskList, guess, new_args, funcs, ranges)
         if allFitVal is None:
             return
         allFitVal = allFitVal['x']
@@ -969,6 +977,7 @@ class AbstractParamFrame(QtWidgets.QWidget):
     SINGLENAMES = []    # The names of the parameters which are common for all sites
     MULTINAMES = []     # The names of the parameters which increase with the number of sites
     EXTRANAMES = []     # The names of additional parameters
+    PARAMRANGES = {}    # The (minimum, maximum) of the parameters with a physical range, None for no limit
     TICKS = True        # Fitting parameters can be fixed by checkboxes
     FFT_AXES = ()       # Which axes should be transformed after simulation
     FFTSHIFT_AXES = ()  # Which axes should be transformed after simulation
@@ -1352,6 +1361,32 @@ class AbstractParamFrame(QtWidgets.QWidget):
         """
         return self.numExp.currentIndex() + 1
 
+    def setPowderAveraging(self, func, extra, cheng, symm):
+        """
+        Selects between the powder averaging with a fixed Cheng number and the adaptive powder averaging (Cheng set to Auto).
+
+        Parameters
+        ----------
+        func : function
+            The powder function used for the simulation.
+        extra : list
+            The extra parameters of func.
+        cheng : int
+            The Cheng number, 0 selects the adaptive powder averaging.
+        symm : {0, 1, 2}
+            The symmetry of the ZCW angle set.
+
+        Returns
+        -------
+        list
+            The extra parameters of the selected fit function.
+        """
+        if cheng == 0:
+            self.FITFUNC = simFunc.adaptivePowderFunc
+            return [func, extra, symm, simFunc.ADAPTIVETOL, simFunc.ADAPTIVEMAXCHENG]
+        self.FITFUNC = func
+        return extra
+
     def getExtraParams(self, out):
         """
         Returns the extra parameters of the fit.
@@ -1439,6 +1474,41 @@ class AbstractParamFrame(QtWidgets.QWidget):
         # A dummy function that is replaced by a function that checks the fit results (e.g., makes values absolute, etc)
         pass
 
+    def getParamRanges(self):
+        """
+        Returns the physical ranges of the parameters.
+
+        Returns
+        -------
+        dict
+            The (minimum, maximum) per parameter name, None for no limit.
+        """
+        return self.PARAMRANGES
+
+    def getGuessRanges(self, struc, numGuess):
+        """
+        Returns the physical range of every fitted parameter, which limits the search region of the global fit methods.
+
+        Parameters
+        ----------
+        struc : dict
+            The structure of the parameters, as created by getFitParams.
+        numGuess : int
+            The number of fitted parameters.
+
+        Returns
+        -------
+        list of tuple
+            The (minimum, maximum) of every fitted parameter, None for no limit.
+        """
+        ranges = [(None, None)] * numGuess
+        paramRanges = self.getParamRanges()
+        for name in paramRanges:
+            for kind, pos in struc.get(name, []):
+                if kind == 1:
+                    ranges[pos] = paramRanges[name]
+        return ranges
+
     def getSimParams(self):
         """
         Returns the dictionary with simulation parameters.
@@ -1945,7 +2015,7 @@ class AbstractParamFrame(QtWidgets.QWidget):
             y = self.FITFUNC(tmpx, self.parent.data1D.freq, self.parent.data1D.sw, self.axMult, out['extra'], *inputVars)
             if y is None:
                 raise FittingException("Fitting: The fitting function didn't output anything")
-            y = np.real(np.fft.fftshift(np.fft.fftn(y, axes=self.FFT_AXES), axes=self.FFTSHIFT_AXES))
+            y = np.real(hc.fftn(y, self.FFT_AXES, shift=self.FFTSHIFT_AXES))
             outCurvePart.append(offset + y)
             outCurve += y
         locList = self.getRedLocList()
@@ -2021,148 +2091,6 @@ class AbstractParamFrame(QtWidgets.QWidget):
 
 ##############################################################################
 
-def lstSqrs(dataList, maskList, *args):
-    """
-    Simulates spectra and calculates the least squares value with a given list of data.
-
-    Parameters
-    ----------
-    dataList : list of arrays
-        The list of spectra to compare with the simulations.
-    *args
-        All other arguments are passed to fitFunc.
-
-    Returns
-    -------
-    float
-        The sum of the least squares values of the spectra.
-    """
-    simData = fitFunc(*args)
-    if simData is None:
-        return np.inf
-    costValue = 0
-    for i,_ in enumerate(dataList):
-        costValue += np.sum(maskList[i]*(dataList[i] - simData[i])**2)
-    return costValue
-
-def mpFit(xax, data1D, maskList, guess, args, queue, funcs, minmethod, numfeval):
-    """
-    The minimization function running in an separate process.
-
-    Parameters
-    ----------
-    xax : list of arrays
-        List of the x-axes of the data.
-    data1D : array or list of arrays
-        Array with the data to be fit.
-    guess : list
-        List with the initial guess values.
-    args : tuple
-        The tuple with additional values.
-    queue : Queue
-        The queue to communicate with the main process.
-        On success the results are put in this queue.
-        When a SimException is raised, the error message is put on this queue.
-        When the simulation fails otherwise, None is put on this queue.
-    funcs : list of functions
-        The functions to run per data in data1D.
-    minmethod : str
-        The minimization method of Scipy minimize to use.
-    numfeval : int
-        The maximum number of function evaluations.
-    """
-    try:
-        fitVal = scipy.optimize.minimize(lambda *param: lstSqrs(data1D, maskList, funcs, param, xax, args), guess, method=minmethod, options={'maxfev': numfeval})
-    except simFunc.SimException as e:
-        fitVal = str(e)
-    except Exception:
-        fitVal = None
-    queue.put(fitVal)
-
-def fitFunc(funcs, params, allX, args):
-    """
-    Reconstructs all linked parameters and executes the fitting function for each set of data.
-
-    Parameters
-    ----------
-    funcs : list of functions
-        The list of fitting functions to execute.
-    params : tuple
-        The tuple with the function parameters generated by minimize.
-    allX : list of arrays
-        The list with x-axes.
-    args : tuple
-        Additional arguments for the fitting functions.
-
-    Returns
-    -------
-    list of arrays
-        A list with the simulated data.
-    """
-    params = params[0]
-    specSlices = args[0]
-    allParam = []
-    for length in specSlices:
-        allParam.append(params[length])
-    allStruc = args[2]
-    allArgu = args[3]
-    fullTestFunc = []
-    for n, _ in enumerate(allX):
-        x = allX[n]
-        testFunc = np.zeros([len(item) for item in x], dtype=complex)
-        param = allParam[n]
-        numExp = args[1][n]
-        struc = allStruc[n]
-        argu = allArgu[n]
-        extra = argu[-1]
-        freq = args[4][n]
-        sw = args[5][n]
-        axMult = args[6][n]
-        fft_axes = args[7][n]
-        fftshift_axes = args[8][n]
-        singleNames = args[9][n]
-        multiNames = args[10][n]
-        parameters = {}
-        try:
-            for name in singleNames:
-                if struc[name][0][0] == 1:
-                    parameters[name] = param[struc[name][0][1]]
-                elif struc[name][0][0] == 0:
-                    parameters[name] = argu[struc[name][0][1]]
-                else:
-                    altStruc = struc[name][0][1]
-                    if struc[altStruc[0]][altStruc[1]][0] == 1:
-                        parameters[name] = altStruc[2] * allParam[altStruc[4]][struc[altStruc[0]][altStruc[1]][1]] + altStruc[3]
-                    elif struc[altStruc[0]][altStruc[1]][0] == 0:
-                        parameters[name] = altStruc[2] * allArgu[altStruc[4]][struc[altStruc[0]][altStruc[1]][1]] + altStruc[3]
-            for i in range(numExp):
-                for name in multiNames:
-                    if struc[name][i][0] == 1:
-                        parameters[name] = param[struc[name][i][1]]
-                    elif struc[name][i][0] == 0:
-                        parameters[name] = argu[struc[name][i][1]]
-                    else:
-                        altStruc = struc[name][i][1]
-                        strucTarget = allStruc[altStruc[4]]
-                        if strucTarget[altStruc[0]][altStruc[1]][0] == 1:
-                            parameters[name] = altStruc[2] * allParam[altStruc[4]][strucTarget[altStruc[0]][altStruc[1]][1]] + altStruc[3]
-                        elif strucTarget[altStruc[0]][altStruc[1]][0] == 0:
-                            parameters[name] = altStruc[2] * allArgu[altStruc[4]][strucTarget[altStruc[0]][altStruc[1]][1]] + altStruc[3]
-                inputVars = [parameters[name] for name in singleNames]
-                inputVars += [parameters[name] for name in multiNames]
-                output = funcs[n](x, freq, sw, axMult, extra, *inputVars)
-                if output is None:
-                    return None
-                #output[np.isnan(output)] = 0
-                testFunc += output
-            testFunc = np.real(np.fft.fftshift(np.fft.fftn(testFunc, axes=fft_axes), axes=fftshift_axes))
-        except KeyError:
-            raise(simFunc.SimException("Fitting: One of the keywords is not correct"))
-        if "Offset" in parameters.keys():
-            testFunc += parameters["Offset"]
-        fullTestFunc.append(testFunc)
-    return fullTestFunc
-
 ##############################################################################
 
 
@@ -2171,7 +2099,7 @@ class PrefWindow(QtWidgets.QWidget):
     Window for setting the fitting preferences.
     """
 
-    METHODLIST = ['Powell', 'Nelder-Mead']
+    METHODLIST = ['Powell', 'Nelder-Mead'] + fitFuncs.GLOBALMETHODS
 
     def __init__(self, parent):
         """
@@ -2204,6 +2132,13 @@ class PrefWindow(QtWidgets.QWidget):
         self.numFevalBox.setMinimum(1)
         self.numFevalBox.setValue(self.father.NUMFEVAL)
         grid.addWidget(self.numFevalBox, 2, 1)
+        grid.addWidget(wc.QLabel("# global evaluations:"), 3, 0)
+        self.numGlobalFevalBox = QtWidgets.QSpinBox(self)
+        self.numGlobalFevalBox.setMaximum(10000000)
+        self.numGlobalFevalBox.setMinimum(1)
+        self.numGlobalFevalBox.setValue(self.father.NUMGLOBALFEVAL)
+        self.numGlobalFevalBox.setToolTip("Total number of function evaluations of the global methods")
+        grid.addWidget(self.numGlobalFevalBox, 3, 1)
         cancelButton = QtWidgets.QPushButton("&Cancel")
         cancelButton.clicked.connect(self.closeEvent)
         layout.addWidget(cancelButton, 4, 0)
@@ -2228,6 +2163,7 @@ class PrefWindow(QtWidgets.QWidget):
         self.father.PRECIS = self.precisBox.value()
         self.father.MINMETHOD = self.METHODLIST[self.minmethodBox.currentIndex()]
         self.father.NUMFEVAL = self.numFevalBox.value()
+        self.father.NUMGLOBALFEVAL = self.numGlobalFevalBox.value()
         self.closeEvent()
 
 ##############################################################################
@@ -2348,6 +2284,7 @@ class RelaxParamFrame(AbstractParamFrame):
 
     SINGLENAMES = ['Amplitude', 'Constant']
     MULTINAMES = ['Coefficient', 'T']
+    PARAMRANGES = {'T': (0.0, None)}
     FUNC_LABEL = "Amplitude * (Constant + Coefficient * exp(-x / abs(T)))"
 
     def __init__(self, parent, rootwindow, isMain=True):
@@ -2456,6 +2393,7 @@ class DiffusionParamFrame(AbstractParamFrame):
 
     SINGLENAMES = ['Amplitude', 'Constant']
     MULTINAMES = ['Coefficient', 'D']
+    PARAMRANGES = {'D': (0.0, None)}
     FUNC_LABEL = u"Amplitude * (Constant + Coefficient * exp(-(2 * π * γ * δ * x)² * D * (Δ - δ / 3.0)))"
 
     def __init__(self, parent, rootwindow, isMain=True):
@@ -2641,6 +2579,7 @@ class PeakDeconvParamFrame(AbstractParamFrame):
     FFTSHIFT_AXES = (0,) # Which axes should be transformed after simulation
     SINGLENAMES = ["Offset", "Multiplier"]
     MULTINAMES = ["Position", "Integral", "Lorentz", "Gauss"]
+    PARAMRANGES = {"Lorentz": (0.0, None), "Gauss": (0.0, None)}
 
     def __init__(self, parent, rootwindow, isMain=True):
         """
@@ -2658,6 +2597,7 @@ class PeakDeconvParamFrame(AbstractParamFrame):
         self.fullInt = np.sum(parent.getData1D()) * parent.sw() / float(len(parent.getData1D()))
         self.FITFUNC = simFunc.peakSim
         self.DEFAULTS = {"Offset": [0.0, True], "Multiplier": [1.0, True], "Position": [0.0, False], "Integral": [self.fullInt, False], "Lorentz": [1.0, False], "Gauss": [0.0, True]}
+        self.extraDefaults = {'freqDomain': False}
         super(PeakDeconvParamFrame, self).__init__(parent, rootwindow, isMain)
         self.pickTick = QtWidgets.QCheckBox("Pick")
         self.pickTick.stateChanged.connect(self.togglePick)
@@ -2680,6 +2620,11 @@ class PeakDeconvParamFrame(AbstractParamFrame):
         self.addMultiLabel("Integral", "Integral:")
         self.addMultiLabel("Lorentz", "Lorentz [Hz]:")
         self.addMultiLabel("Gauss", f"Gauss [{self.axUnit}]:")
+        self.freqTick = QtWidgets.QCheckBox("Freq. domain")
+        self.freqTick.setToolTip("Calculate the line shapes directly in the frequency domain")
+        self.freqTick.stateChanged.connect(self.setFreqDomain)
+        self.optframe.addWidget(self.freqTick, 0, 0, QtCore.Qt.AlignTop)
+        self.freqTick.setChecked(self.extraDefaults['freqDomain'])
         self.populates_MULTINAMES_sites()
         self.reset()
 
@@ -2697,6 +2642,39 @@ class PeakDeconvParamFrame(AbstractParamFrame):
     def togglePick(self):
         self.parent.togglePick(self.pickTick.isChecked())
 
+    def setFreqDomain(self, *args):
+        """
+        Switches between the simulation of the peaks in the time domain and the analytic line shapes in the frequency domain.
+        """
+        if self.freqTick.isChecked():
+            self.FITFUNC = simFunc.peakSimFreq
+            self.FFT_AXES = ()
+            self.FFTSHIFT_AXES = ()
+        else:
+            self.FITFUNC = simFunc.peakSim
+            self.FFT_AXES = type(self).FFT_AXES
+            self.FFTSHIFT_AXES = type(self).FFTSHIFT_AXES
+
+    def extraParamToFile(self):
+        """
+        Extra parameters to export.
+        """
+        return ({"Freq. domain": str(self.freqTick.isChecked())}, {})
+
+    def extraFileToParam(self, preParams, postParams):
+        """
+        Extra parameters to import.
+        """
+        if "Freq. domain" in preParams.keys():
+            self.freqTick.setChecked(preParams["Freq. domain"] == "True")
+
+    def getExtraParams(self, out):
+        """
+        Returns the extra parameters of the fit, and selects the line shape model of the fit.
+        """
+        self.setFreqDomain()
+        return (out, [])
+
     def checkResults(self, numExp, struc):
         """
         Sets the Lorentzian and Gaussian broadenings to absolute values.
@@ -2767,7 +2745,8 @@ class CsaDeconvParamFrame(AbstractParamFrame):
     FFT_AXES = (0,)
     SINGLENAMES = ["Offset", "Multiplier", "Spinspeed"]
     MULTINAMES = ["Definition1", "Definition2", "Definition3", "Integral", "Lorentz", "Gauss"]
-    EXTRANAMES = ['spinType', 'angle', 'shiftdef', 'cheng', 'numssb']
+    PARAMRANGES = {"Lorentz": (0.0, None), "Gauss": (0.0, None)}
+    EXTRANAMES = ['spinType', 'angle', 'shiftdef', 'cheng', 'numssb', 'interpolate', 'ssbExact', 'ssbSingle']
     MASTYPES = ["Static", "Finite MAS", "Infinite MAS"]
     DEFTYPES = [u'δ11 - δ22 - δ33',
                 u'δxx - δyy - δzz',
@@ -2794,7 +2773,7 @@ class CsaDeconvParamFrame(AbstractParamFrame):
         self.FITFUNC = simFunc.csaFunc
         self.fullInt = np.sum(parent.getData1D()) * parent.sw() / float(len(parent.getData1D()))
         self.DEFAULTS = {"Offset": [0.0, True], "Multiplier": [1.0, True], "Spinspeed": [10.0, True], "Definition1": [0.0, False], "Definition2": [0.0, False], "Definition3": [0.0, False], "Integral": [self.fullInt, False], "Lorentz": [1.0, False], "Gauss": [0.0, True]}
-        self.extraDefaults = {'cheng': 15, 'shiftdef': 0, 'spinType': 0, 'rotorAngle': "arctan(sqrt(2))", 'numssb': 32, "Spinspeed": '10.0'}
+        self.extraDefaults = {'cheng': 15, 'shiftdef': 0, 'spinType': 0, 'rotorAngle': "arctan(sqrt(2))", 'numssb': 32, "Spinspeed": '10.0', 'interpolate': False, 'ssbExact': False, 'ssbSingle': False}
         super(CsaDeconvParamFrame, self).__init__(parent, rootwindow, isMain)
         self.pickTick = QtWidgets.QCheckBox("Pick")
         self.pickTick.stateChanged.connect(self.togglePick)
@@ -2819,7 +2798,19 @@ class CsaDeconvParamFrame(AbstractParamFrame):
         self.optframe.addWidget(wc.QLabel("Cheng:"), 0, 1)
         self.entries['cheng'].append(QtWidgets.QSpinBox())
         self.entries['cheng'][-1].setAlignment(QtCore.Qt.AlignHCenter)
+        self.entries['cheng'][-1].setSpecialValueText("Auto")
+        self.entries['cheng'][-1].setToolTip("Cheng number of the ZCW angle set, Auto increases it until the lineshape is converged")
         self.optframe.addWidget(self.entries['cheng'][-1], 1, 1)
+        self.entries['interpolate'].append(QtWidgets.QCheckBox("Interpolate"))
+        self.entries['interpolate'][-1].setToolTip("Interpolate the frequencies over a triangulated (ASG) angle set, Cheng then sets the number of divisions of an octant edge")
+        self.optframe.addWidget(self.entries['interpolate'][-1], 5, 0)
+        self.entries['cheng'][-1].valueChanged.connect(self.chengChange)
+        self.entries['ssbExact'].append(QtWidgets.QCheckBox("Exact SSB phases"))
+        self.entries['ssbExact'][-1].setToolTip("Integrate the phases of the spinning sidebands exactly instead of summing the sampled frequencies, which is more accurate for few sidebands")
+        self.optframe.addWidget(self.entries['ssbExact'][-1], 6, 0)
+        self.entries['ssbSingle'].append(QtWidgets.QCheckBox("Single prec. SSB"))
+        self.entries['ssbSingle'][-1].setToolTip("Calculate the spinning sidebands in single precision, which is faster")
+        self.optframe.addWidget(self.entries['ssbSingle'][-1], 6, 1)
         self.shiftDefType = 0  # variable to remember the selected tensor type
         self.optframe.addWidget(wc.QLabel("Definition:"), 2, 0)
         self.entries['shiftdef'].append(QtWidgets.QComboBox())
@@ -2914,6 +2905,8 @@ class CsaDeconvParamFrame(AbstractParamFrame):
             self.spinLabel.setEnabled(True)
             self.entries['numssb'][-1].setEnabled(True)
             self.sidebandLabel.setEnabled(True)
+            self.entries['ssbExact'][-1].setEnabled(True)
+            self.entries['ssbSingle'][-1].setEnabled(True)
         else:
             self.ticks["Spinspeed"][-1].setChecked(True)
             self.entries["Spinspeed"][-1].setEnabled(False)
@@ -2921,12 +2914,28 @@ class CsaDeconvParamFrame(AbstractParamFrame):
             self.spinLabel.setEnabled(False)
             self.entries['numssb'][-1].setEnabled(False)
             self.sidebandLabel.setEnabled(False)
+            self.entries['ssbExact'][-1].setEnabled(False)
+            self.entries['ssbSingle'][-1].setEnabled(False)
+
+    def chengChange(self, cheng):
+        """
+        Disables the interpolated (ASG) powder averaging when the Cheng number is Auto, as the adaptive powder averaging uses ZCW angle sets.
+
+        Parameters
+        ----------
+        cheng : int
+            The Cheng number, 0 is Auto.
+        """
+        self.entries['interpolate'][-1].setEnabled(cheng != 0)
 
     def reset(self):
         """
         Resets all fit parameters to their default values.
         """
         self.entries['cheng'][-1].setValue(self.extraDefaults['cheng'])
+        self.entries['interpolate'][-1].setChecked(self.extraDefaults['interpolate'])
+        self.entries['ssbExact'][-1].setChecked(self.extraDefaults['ssbExact'])
+        self.entries['ssbSingle'][-1].setChecked(self.extraDefaults['ssbSingle'])
         self.entries['shiftdef'][-1].setCurrentIndex(self.extraDefaults['shiftdef'])
         self.shiftDefType = self.extraDefaults['shiftdef']
         self.entries['spinType'][-1].setCurrentIndex(self.extraDefaults['spinType'])
@@ -3047,6 +3056,9 @@ class CsaDeconvParamFrame(AbstractParamFrame):
         extraDict = {"MAS": self.MASTYPES[self.entries['spinType'][0].currentIndex()],
                      "Definition": self.DEFNAMES[self.entries['shiftdef'][0].currentIndex()],
                      "Cheng": self.entries['cheng'][0].text(),
+                     "Interpolate": str(self.entries['interpolate'][0].isChecked()),
+                     "ExactPhases": str(self.entries['ssbExact'][0].isChecked()),
+                     "SinglePrecision": str(self.entries['ssbSingle'][0].isChecked()),
                      "Angle": self.entries['angle'][0].text(),
                      "Sidebands": self.entries['numssb'][0].text()}
         return (extraDict, {})
@@ -3060,8 +3072,14 @@ class CsaDeconvParamFrame(AbstractParamFrame):
             self.entries['spinType'][0].setCurrentIndex(self.MASTYPES.index(preParams["MAS"]))
         if "Definition" in keys:
             self.entries['shiftdef'][0].setCurrentIndex(self.DEFNAMES.index(preParams["Definition"]))
+        if "Interpolate" in keys:
+            self.entries['interpolate'][0].setChecked(preParams["Interpolate"] == "True")
+        if "ExactPhases" in keys:
+            self.entries['ssbExact'][0].setChecked(preParams["ExactPhases"] == "True")
+        if "SinglePrecision" in keys:
+            self.entries['ssbSingle'][0].setChecked(preParams["SinglePrecision"] == "True")
         if "Cheng" in keys:
-            self.entries['cheng'][0].setValue(int(preParams["Cheng"]))
+            self.entries['cheng'][0].setValue(0 if preParams["Cheng"] == "Auto" else int(preParams["Cheng"]))
         if "Angle" in keys:
             self.entries['angle'][0].setText(preParams["Angle"])
         if "Sidebands" in keys:
@@ -3075,12 +3093,17 @@ class CsaDeconvParamFrame(AbstractParamFrame):
         angle = safeEval(self.entries['angle'][-1].text())
         if angle is None:
             raise FittingException("Fitting: Rotor Angle is not valid")
-        cheng = safeEval(self.entries['cheng'][-1].text())
-        alpha, beta, weight = simFunc.zcw_angles(cheng, 2)
-        D2 = simFunc.D2tens(alpha, beta, np.zeros_like(alpha))
+        cheng = self.entries['cheng'][-1].value()
+        if cheng and self.entries['interpolate'][-1].isChecked():
+            D2, _, triangles, weight = simFunc.powderTriangles(cheng, 2)
+            powder = [triangles]
+        else:
+            D2, _, weight = simFunc.powderTensors(cheng or simFunc.ADAPTIVEMINCHENG, 2)
+            powder = [None]
         numssb = self.entries['numssb'][0].value()
         MAStype = self.entries['spinType'][-1].currentIndex()
-        out['extra'] = [shiftdef, numssb, angle, D2, weight, MAStype]
+        carousel = [self.entries['ssbExact'][-1].isChecked(), self.entries['ssbSingle'][-1].isChecked()]
+        out['extra'] = self.setPowderAveraging(simFunc.csaFunc, [shiftdef, numssb, angle, D2, weight, MAStype] + powder + carousel, cheng, 2)
         return (out, out['extra'])
 
     def checkResults(self, numExp, struc):
@@ -3099,6 +3122,17 @@ class CsaDeconvParamFrame(AbstractParamFrame):
                 if self.shiftDefType == 3:
                     self.fitParamList[locList]['Definition3'][i][0] = 1 - abs(abs(self.fitParamList[locList]['Definition3'][i][0] + 1)%4 - 2)
 
+    def getParamRanges(self):
+        """
+        Returns the physical ranges of the parameters, including eta or kappa of the shift definition.
+        """
+        paramRanges = dict(self.PARAMRANGES)
+        if self.shiftDefType == 2:
+            paramRanges['Definition3'] = (0.0, 1.0)
+        elif self.shiftDefType == 3:
+            paramRanges['Definition3'] = (-1.0, 1.0)
+        return paramRanges
+
     def changeAxMult(self, oldAxMult):
         """
         Changing the units of the parameters which depend on the plot units.
@@ -3134,7 +3168,8 @@ class QuadDeconvParamFrame(AbstractParamFrame):
     Ivalues = [1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0, 4.5]
     SINGLENAMES = ["Offset", "Multiplier", "Spinspeed"]
     MULTINAMES = ["Position", "Cq", 'eta', "Integral", "Lorentz", "Gauss", "LorentzST"]
-    EXTRANAMES = ['spinType', 'satBool', 'angle', 'cheng', 'I', 'numssb']
+    PARAMRANGES = {"Cq": (0.0, None), 'eta': (0.0, 1.0), "Lorentz": (0.0, None), "Gauss": (0.0, None), "LorentzST": (0.0, None)}
+    EXTRANAMES = ['spinType', 'satBool', 'angle', 'cheng', 'I', 'numssb', 'interpolate', 'ssbExact', 'ssbSingle']
     MASTYPES = ["Static", "Finite MAS", "Infinite MAS"]
 
     def __init__(self, parent, rootwindow, isMain=True):
@@ -3153,7 +3188,7 @@ class QuadDeconvParamFrame(AbstractParamFrame):
         self.FITFUNC = simFunc.quadFunc
         self.fullInt = np.sum(parent.getData1D()) * parent.sw() / float(len(parent.getData1D()))
         self.DEFAULTS = {"Offset": [0.0, True], "Multiplier": [1.0, True], "Spinspeed": [10.0, True], "Position": [0.0, False], "Cq": [1.0, False], 'eta': [0.0, False], "Integral": [self.fullInt, False], "Lorentz": [1.0, False], "Gauss": [0.0, True], "LorentzST": [1.0, False]}
-        self.extraDefaults = {'I': 1, 'Satellites': False, 'cheng': 15, 'spinType': 0, 'rotorAngle': "arctan(sqrt(2))", 'numssb': 32, "Spinspeed": '10.0'}
+        self.extraDefaults = {'I': 1, 'Satellites': False, 'cheng': 15, 'spinType': 0, 'rotorAngle': "arctan(sqrt(2))", 'numssb': 32, "Spinspeed": '10.0', 'interpolate': False, 'ssbExact': False, 'ssbSingle': False}
         super(QuadDeconvParamFrame, self).__init__(parent, rootwindow, isMain)
         self.optframe.addWidget(wc.QLabel("MAS:"), 2, 0)
         self.entries['spinType'].append(QtWidgets.QComboBox(self))
@@ -3176,7 +3211,19 @@ class QuadDeconvParamFrame(AbstractParamFrame):
         self.optframe.addWidget(wc.QLabel("Cheng:"), 0, 1)
         self.entries['cheng'].append(QtWidgets.QSpinBox())
         self.entries['cheng'][-1].setAlignment(QtCore.Qt.AlignHCenter)
+        self.entries['cheng'][-1].setSpecialValueText("Auto")
+        self.entries['cheng'][-1].setToolTip("Cheng number of the ZCW angle set, Auto increases it until the lineshape is converged")
         self.optframe.addWidget(self.entries['cheng'][-1], 1, 1)
+        self.entries['interpolate'].append(QtWidgets.QCheckBox("Interpolate"))
+        self.entries['interpolate'][-1].setToolTip("Interpolate the frequencies over a triangulated (ASG) angle set, Cheng then sets the number of divisions of an octant edge")
+        self.optframe.addWidget(self.entries['interpolate'][-1], 5, 0)
+        self.entries['cheng'][-1].valueChanged.connect(self.chengChange)
+        self.entries['ssbExact'].append(QtWidgets.QCheckBox("Exact SSB phases"))
+        self.entries['ssbExact'][-1].setToolTip("Integrate the phases of the spinning sidebands exactly instead of summing the sampled frequencies, which is more accurate for few sidebands")
+        self.optframe.addWidget(self.entries['ssbExact'][-1], 6, 0)
+        self.entries['ssbSingle'].append(QtWidgets.QCheckBox("Single prec. SSB"))
+        self.entries['ssbSingle'][-1].setToolTip("Calculate the spinning sidebands in single precision, which is faster")
+        self.optframe.addWidget(self.entries['ssbSingle'][-1], 6, 1)
         self.optframe.addWidget(wc.QLabel("I:"), 0, 0)
         self.entries['I'].append(QtWidgets.QComboBox())
         self.entries['I'][-1].addItems(self.Ioptions)
@@ -3240,6 +3287,8 @@ class QuadDeconvParamFrame(AbstractParamFrame):
             self.spinLabel.setEnabled(True)
             self.entries['numssb'][-1].setEnabled(True)
             self.sidebandLabel.setEnabled(True)
+            self.entries['ssbExact'][-1].setEnabled(True)
+            self.entries['ssbSingle'][-1].setEnabled(True)
         else:
             self.ticks["Spinspeed"][-1].setChecked(True)
             self.entries["Spinspeed"][-1].setEnabled(False)
@@ -3247,12 +3296,28 @@ class QuadDeconvParamFrame(AbstractParamFrame):
             self.spinLabel.setEnabled(False)
             self.entries['numssb'][-1].setEnabled(False)
             self.sidebandLabel.setEnabled(False)
+            self.entries['ssbExact'][-1].setEnabled(False)
+            self.entries['ssbSingle'][-1].setEnabled(False)
+
+    def chengChange(self, cheng):
+        """
+        Disables the interpolated (ASG) powder averaging when the Cheng number is Auto, as the adaptive powder averaging uses ZCW angle sets.
+
+        Parameters
+        ----------
+        cheng : int
+            The Cheng number, 0 is Auto.
+        """
+        self.entries['interpolate'][-1].setEnabled(cheng != 0)
 
     def reset(self):
         """
         Resets all fit parameters to their default values.
         """
         self.entries['cheng'][-1].setValue(self.extraDefaults['cheng'])
+        self.entries['interpolate'][-1].setChecked(self.extraDefaults['interpolate'])
+        self.entries['ssbExact'][-1].setChecked(self.extraDefaults['ssbExact'])
+        self.entries['ssbSingle'][-1].setChecked(self.extraDefaults['ssbSingle'])
         self.entries['spinType'][-1].setCurrentIndex(self.extraDefaults['spinType'])
         self.MASChange(self.extraDefaults['spinType'])
         self.entries['numssb'][-1].setValue(self.extraDefaults['numssb'])
@@ -3270,6 +3335,9 @@ class QuadDeconvParamFrame(AbstractParamFrame):
                      "MAS": self.MASTYPES[self.entries['spinType'][-1].currentIndex()],
                      "Satellites": str(self.entries['satBool'][-1].isChecked()),
                      "Cheng": self.entries['cheng'][-1].text(),
+                     "Interpolate": str(self.entries['interpolate'][-1].isChecked()),
+                     "ExactPhases": str(self.entries['ssbExact'][-1].isChecked()),
+                     "SinglePrecision": str(self.entries['ssbSingle'][-1].isChecked()),
                      "Angle": self.entries['angle'][-1].text(),
                      "Sidebands": self.entries['numssb'][0].text()}
         return (extraDict, {})
@@ -3285,8 +3353,14 @@ class QuadDeconvParamFrame(AbstractParamFrame):
             self.entries['spinType'][0].setCurrentIndex(self.MASTYPES.index(preParams["MAS"]))
         if "Satellites" in keys:
             self.entries['satBool'][0].setChecked(preParams["Satellites"] == "True")
+        if "Interpolate" in keys:
+            self.entries['interpolate'][0].setChecked(preParams["Interpolate"] == "True")
+        if "ExactPhases" in keys:
+            self.entries['ssbExact'][0].setChecked(preParams["ExactPhases"] == "True")
+        if "SinglePrecision" in keys:
+            self.entries['ssbSingle'][0].setChecked(preParams["SinglePrecision"] == "True")
         if "Cheng" in keys:
-            self.entries['cheng'][0].setValue(int(preParams["Cheng"]))
+            self.entries['cheng'][0].setValue(0 if preParams["Cheng"] == "Auto" else int(preParams["Cheng"]))
         if "Angle" in keys:
             self.entries['angle'][0].setText(preParams["Angle"])
         if "Sidebands" in keys:
@@ -3301,13 +3375,17 @@ class QuadDeconvParamFrame(AbstractParamFrame):
         if angle is None:
             raise FittingException("Fitting: Rotor Angle is not valid")
         I = self.entries['I'][-1].currentIndex() * 0.5 + 1
-        cheng = safeEval(self.entries['cheng'][-1].text())
-        alpha, beta, weight = simFunc.zcw_angles(cheng, 2)
-        D2 = simFunc.D2tens(alpha, beta, np.zeros_like(alpha))
-        D4 = simFunc.D4tens(alpha, beta, np.zeros_like(alpha))
+        cheng = self.entries['cheng'][-1].value()
+        if cheng and self.entries['interpolate'][-1].isChecked():
+            D2, D4, triangles, weight = simFunc.powderTriangles(cheng, 2)
+            powder = [triangles]
+        else:
+            D2, D4, weight = simFunc.powderTensors(cheng or simFunc.ADAPTIVEMINCHENG, 2)
+            powder = [None]
         numssb = self.entries['numssb'][-1].value()
         MAStype = self.entries['spinType'][-1].currentIndex()
-        out['extra'] = [satBool, I, numssb, angle, D2, D4, weight, MAStype]
+        carousel = [self.entries['ssbExact'][-1].isChecked(), self.entries['ssbSingle'][-1].isChecked()]
+        out['extra'] = self.setPowderAveraging(simFunc.quadFunc, [satBool, I, numssb, angle, D2, D4, weight, MAStype] + powder + carousel, cheng, 2)
         return (out, out['extra'])
 
     def checkResults(self, numExp, struc):
@@ -3352,7 +3430,8 @@ class QuadCSADeconvParamFrame(AbstractParamFrame):
     Ivalues = [0.5, 1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0, 4.5]
     SINGLENAMES = ["Offset", "Multiplier", "Spinspeed"]
     MULTINAMES = ["Definition1", "Definition2", "Definition3", "Cq", 'eta', "Alpha", "Beta", "Gamma", "Integral", "Lorentz", "Gauss", "LorentzST"]
-    EXTRANAMES = ['spinType', 'satBool', 'angle', 'shiftdef', 'cheng', 'I', 'numssb']
+    PARAMRANGES = {"Cq": (0.0, None), 'eta': (0.0, 1.0), "Lorentz": (0.0, None), "Gauss": (0.0, None), "LorentzST": (0.0, None)}
+    EXTRANAMES = ['spinType', 'satBool', 'angle', 'shiftdef', 'cheng', 'I', 'numssb', 'interpolate', 'ssbExact', 'ssbSingle']
     MASTYPES = ["Static", "Finite MAS", "Infinite MAS"]
     DEFTYPES = [u'δ11 - δ22 - δ33',
                 u'δxx - δyy - δzz',
@@ -3383,7 +3462,7 @@ class QuadCSADeconvParamFrame(AbstractParamFrame):
                          "Cq": [1.0, False], 'eta': [0.0, False], "Integral": [self.fullInt, False],
                          "Lorentz": [1.0, False], "Gauss": [0.0, True], "LorentzST": [1.0, False], "Alpha": [0.0, True],
                          "Beta": [0.0, True], "Gamma": [0.0, True]}
-        self.extraDefaults = {'I': 2, 'Satellites': False, 'cheng': 15, 'spinType': 0, 'shiftdef': 0, 'rotorAngle': "arctan(sqrt(2))", 'numssb': 32, "Spinspeed": '10.0'}
+        self.extraDefaults = {'I': 2, 'Satellites': False, 'cheng': 15, 'spinType': 0, 'shiftdef': 0, 'rotorAngle': "arctan(sqrt(2))", 'numssb': 32, "Spinspeed": '10.0', 'interpolate': False, 'ssbExact': False, 'ssbSingle': False}
         super(QuadCSADeconvParamFrame, self).__init__(parent, rootwindow, isMain)
         self.optframe.addWidget(wc.QLabel("MAS:"), 2, 0)
         self.entries['spinType'].append(QtWidgets.QComboBox(self))
@@ -3406,7 +3485,19 @@ class QuadCSADeconvParamFrame(AbstractParamFrame):
         self.optframe.addWidget(wc.QLabel("Cheng:"), 0, 1)
         self.entries['cheng'].append(QtWidgets.QSpinBox())
         self.entries['cheng'][-1].setAlignment(QtCore.Qt.AlignHCenter)
+        self.entries['cheng'][-1].setSpecialValueText("Auto")
+        self.entries['cheng'][-1].setToolTip("Cheng number of the ZCW angle set, Auto increases it until the lineshape is converged")
         self.optframe.addWidget(self.entries['cheng'][-1], 1, 1)
+        self.entries['interpolate'].append(QtWidgets.QCheckBox("Interpolate"))
+        self.entries['interpolate'][-1].setToolTip("Interpolate the frequencies over a triangulated (ASG) angle set, Cheng then sets the number of divisions of an octant edge")
+        self.optframe.addWidget(self.entries['interpolate'][-1], 6, 1)
+        self.entries['cheng'][-1].valueChanged.connect(self.chengChange)
+        self.entries['ssbExact'].append(QtWidgets.QCheckBox("Exact SSB phases"))
+        self.entries['ssbExact'][-1].setToolTip("Integrate the phases of the spinning sidebands exactly instead of summing the sampled frequencies, which is more accurate for few sidebands")
+        self.optframe.addWidget(self.entries['ssbExact'][-1], 7, 0)
+        self.entries['ssbSingle'].append(QtWidgets.QCheckBox("Single prec. SSB"))
+        self.entries['ssbSingle'][-1].setToolTip("Calculate the spinning sidebands in single precision, which is faster")
+        self.optframe.addWidget(self.entries['ssbSingle'][-1], 7, 1)
         self.optframe.addWidget(wc.QLabel("I:"), 0, 0)
         self.entries['I'].append(QtWidgets.QComboBox())
         self.entries['I'][-1].addItems(self.Ioptions)
@@ -3514,6 +3605,8 @@ class QuadCSADeconvParamFrame(AbstractParamFrame):
             self.spinLabel.setEnabled(True)
             self.entries['numssb'][-1].setEnabled(True)
             self.sidebandLabel.setEnabled(True)
+            self.entries['ssbExact'][-1].setEnabled(True)
+            self.entries['ssbSingle'][-1].setEnabled(True)
         else:
             self.ticks["Spinspeed"][-1].setChecked(True)
             self.entries["Spinspeed"][-1].setEnabled(False)
@@ -3521,12 +3614,28 @@ class QuadCSADeconvParamFrame(AbstractParamFrame):
             self.spinLabel.setEnabled(False)
             self.entries['numssb'][-1].setEnabled(False)
             self.sidebandLabel.setEnabled(False)
+            self.entries['ssbExact'][-1].setEnabled(False)
+            self.entries['ssbSingle'][-1].setEnabled(False)
+
+    def chengChange(self, cheng):
+        """
+        Disables the interpolated (ASG) powder averaging when the Cheng number is Auto, as the adaptive powder averaging uses ZCW angle sets.
+
+        Parameters
+        ----------
+        cheng : int
+            The Cheng number, 0 is Auto.
+        """
+        self.entries['interpolate'][-1].setEnabled(cheng != 0)
 
     def reset(self):
         """
         Resets all fit parameters to their default values.
         """
         self.entries['cheng'][-1].setValue(self.extraDefaults['cheng'])
+        self.entries['interpolate'][-1].setChecked(self.extraDefaults['interpolate'])
+        self.entries['ssbExact'][-1].setChecked(self.extraDefaults['ssbExact'])
+        self.entries['ssbSingle'][-1].setChecked(self.extraDefaults['ssbSingle'])
         self.entries['shiftdef'][-1].setCurrentIndex(self.extraDefaults['shiftdef'])
         self.shiftDefType = self.extraDefaults['shiftdef']
         self.entries['spinType'][-1].setCurrentIndex(self.extraDefaults['spinType'])
@@ -3635,6 +3744,9 @@ class QuadCSADeconvParamFrame(AbstractParamFrame):
                      "MAS": self.MASTYPES[self.entries['spinType'][-1].currentIndex()],
                      "Satellites": str(self.entries['satBool'][-1].isChecked()),
                      "Cheng": self.entries['cheng'][-1].text(),
+                     "Interpolate": str(self.entries['interpolate'][-1].isChecked()),
+                     "ExactPhases": str(self.entries['ssbExact'][-1].isChecked()),
+                     "SinglePrecision": str(self.entries['ssbSingle'][-1].isChecked()),
                      "Angle": self.entries['angle'][-1].text(),
                      "Sidebands": self.entries['numssb'][0].text()}
         return (extraDict, {})
@@ -3652,8 +3764,14 @@ class QuadCSADeconvParamFrame(AbstractParamFrame):
             self.entries['spinType'][0].setCurrentIndex(self.MASTYPES.index(preParams["MAS"]))
         if "Satellites" in keys:
             self.entries['satBool'][0].setChecked(preParams["Satellites"] == "True")
+        if "Interpolate" in keys:
+            self.entries['interpolate'][0].setChecked(preParams["Interpolate"] == "True")
+        if "ExactPhases" in keys:
+            self.entries['ssbExact'][0].setChecked(preParams["ExactPhases"] == "True")
+        if "SinglePrecision" in keys:
+            self.entries['ssbSingle'][0].setChecked(preParams["SinglePrecision"] == "True")
         if "Cheng" in keys:
-            self.entries['cheng'][0].setValue(int(preParams["Cheng"]))
+            self.entries['cheng'][0].setValue(0 if preParams["Cheng"] == "Auto" else int(preParams["Cheng"]))
         if "Angle" in keys:
             self.entries['angle'][0].setText(preParams["Angle"])
         if "Sidebands" in keys:
@@ -3669,13 +3787,17 @@ class QuadCSADeconvParamFrame(AbstractParamFrame):
         if angle is None:
             raise FittingException("Fitting: Rotor Angle is not valid")
         I = self.entries['I'][-1].currentIndex() * 0.5 + 0.5
-        cheng = safeEval(self.entries['cheng'][-1].text())
-        alpha, beta, weight = simFunc.zcw_angles(cheng, 1)
-        D2 = simFunc.D2tens(alpha, beta, np.zeros_like(alpha))
-        D4 = simFunc.D4tens(alpha, beta, np.zeros_like(alpha))
+        cheng = self.entries['cheng'][-1].value()
+        if cheng and self.entries['interpolate'][-1].isChecked():
+            D2, D4, triangles, weight = simFunc.powderTriangles(cheng, 1)
+            powder = [triangles]
+        else:
+            D2, D4, weight = simFunc.powderTensors(cheng or simFunc.ADAPTIVEMINCHENG, 1)
+            powder = [None]
         numssb = self.entries['numssb'][-1].value()
         MAStype = self.entries['spinType'][-1].currentIndex()
-        out['extra'] = [satBool, I, numssb, angle, D2, D4, weight, MAStype, shiftdef]
+        carousel = [self.entries['ssbExact'][-1].isChecked(), self.entries['ssbSingle'][-1].isChecked()]
+        out['extra'] = self.setPowderAveraging(simFunc.quadCSAFunc, [satBool, I, numssb, angle, D2, D4, weight, MAStype, shiftdef] + powder + carousel, cheng, 1)
         return (out, out['extra'])
 
     def checkResults(self, numExp, struc):
@@ -3713,6 +3835,17 @@ class QuadCSADeconvParamFrame(AbstractParamFrame):
                 if self.fitParamList[locList]["Gamma"][i][0] > 90:
                     self.fitParamList[locList]["Gamma"][i][0] = 180 - self.fitParamList[locList]["Gamma"][i][0]
 
+    def getParamRanges(self):
+        """
+        Returns the physical ranges of the parameters, including eta or kappa of the shift definition.
+        """
+        paramRanges = dict(self.PARAMRANGES)
+        if self.shiftDefType == 2:
+            paramRanges['Definition3'] = (0.0, 1.0)
+        elif self.shiftDefType == 3:
+            paramRanges['Definition3'] = (-1.0, 1.0)
+        return paramRanges
+
     def changeAxMult(self, oldAxMult):
         """
         Changing the units of the parameters which depend on the plot units.
@@ -4148,6 +4281,7 @@ class QuadCzjzekParamFrame(AbstractParamFrame):
     FFT_AXES = (0,)
     SINGLENAMES = ["Offset", "Multiplier"]
     MULTINAMES = ["Position", "Sigma", "Cq0", 'eta0', "Integral", "Lorentz", "Gauss"]
+    PARAMRANGES = {"Sigma": (0.0, None), "Cq0": (0.0, None), 'eta0': (0.0, 1.0), "Lorentz": (0.0, None), "Gauss": (0.0, None)}
     EXTRANAMES = ['method', 'd']
     TYPES = ['Normal', 'Extended']
 
@@ -4402,6 +4536,7 @@ class ExternalFitDeconvParamFrame(AbstractParamFrame):
 
     SINGLENAMES = []
     MULTINAMES = []
+    PARAMRANGES = {"Lorentz": (0.0, None), "Gauss": (0.0, None)}
 
     def __init__(self, parent, rootwindow, isMain=True):
         """
@@ -4795,7 +4930,8 @@ class MqmasDeconvParamFrame(AbstractParamFrame):
     MQvalues = [3, 5, 7, 9]
     SINGLENAMES = ["Offset", "Multiplier", "Spinspeed"]
     MULTINAMES = ["Position", "Gauss", "Cq", 'eta', "Integral", "Lorentz", "Lorentz1"] # , "Gauss2", "Gauss1"
-    EXTRANAMES = ['spinType', 'angle', 'numssb', 'cheng', 'I', 'MQ', 'shear', 'scale', 'foldF1']
+    PARAMRANGES = {"Gauss": (0.0, None), "Cq": (0.0, None), 'eta': (0.0, 1.0), "Lorentz": (0.0, None), "Lorentz1": (0.0, None)}
+    EXTRANAMES = ['spinType', 'angle', 'numssb', 'cheng', 'I', 'MQ', 'shear', 'scale', 'foldF1', 'interpolate', 'ssbExact', 'ssbSingle']
     MASTYPES = ["Static", "Finite MAS", "Infinite MAS"]
 
     def __init__(self, parent, rootwindow, isMain=True):
@@ -4818,7 +4954,7 @@ class MqmasDeconvParamFrame(AbstractParamFrame):
                          "Integral": [self.fullInt, False], "Lorentz": [10.0, False],   # "Gauss2": [0.0, True],
                          "Lorentz1": [10.0, False] } # ,"Gauss1": [0.0, True] }
         self.extraDefaults = {'spinType': 2, 'angle': "arctan(sqrt(2))", 'numssb': 32, 'cheng': 15, 'I': 0, 'MQ': 0, 
-                                'shear': '0.0', 'scale': '1.0', 'foldF1': False}
+                                'shear': '0.0', 'scale': '1.0', 'foldF1': False, 'interpolate': False, 'ssbExact': False, 'ssbSingle': False}
         super(MqmasDeconvParamFrame, self).__init__(parent, rootwindow, isMain)
         self.optframe.addWidget(wc.QLabel("MAS:"), 2, 0)
         self.entries['spinType'].append(QtWidgets.QComboBox(self))
@@ -4840,6 +4976,8 @@ class MqmasDeconvParamFrame(AbstractParamFrame):
         self.optframe.addWidget(wc.QLabel("Cheng:"), 4, 0)
         self.entries['cheng'].append(QtWidgets.QSpinBox())
         self.entries['cheng'][-1].setAlignment(QtCore.Qt.AlignHCenter)
+        self.entries['cheng'][-1].setSpecialValueText("Auto")
+        self.entries['cheng'][-1].setToolTip("Cheng number of the ZCW angle set, Auto increases it until the lineshape is converged")
         self.optframe.addWidget(self.entries['cheng'][-1], 5, 0)
         self.optframe.addWidget(wc.QLabel("I:"), 0, 0)
         self.entries['I'].append(QtWidgets.QComboBox())
@@ -4860,6 +4998,15 @@ class MqmasDeconvParamFrame(AbstractParamFrame):
         self.optframe.addWidget(autoButton, 8, 1)
         self.entries['foldF1'].append(QtWidgets.QCheckBox('D1 fold'))
         self.optframe.addWidget(self.entries['foldF1'][-1], 8, 0)
+        self.entries['interpolate'].append(QtWidgets.QCheckBox("Interpolate"))
+        self.entries['interpolate'][-1].setToolTip("Divide the intensity of every frequency linearly over the nearest points, which reduces the discretization noise at low Cheng numbers")
+        self.optframe.addWidget(self.entries['interpolate'][-1], 9, 0)
+        self.entries['ssbExact'].append(QtWidgets.QCheckBox("Exact SSB phases"))
+        self.entries['ssbExact'][-1].setToolTip("Integrate the phases of the spinning sidebands exactly instead of summing the sampled frequencies, which is more accurate for few sidebands")
+        self.optframe.addWidget(self.entries['ssbExact'][-1], 10, 0)
+        self.entries['ssbSingle'].append(QtWidgets.QCheckBox("Single prec. SSB"))
+        self.entries['ssbSingle'][-1].setToolTip("Calculate the spinning sidebands in single precision, which is faster")
+        self.optframe.addWidget(self.entries['ssbSingle'][-1], 10, 1)
 
         self.spinLabel = wc.QLabel("Spin. speed [kHz]:")
         self.frame2.addWidget(self.spinLabel, 0, 0, 1, 2)
@@ -4914,6 +5061,9 @@ class MqmasDeconvParamFrame(AbstractParamFrame):
         self.entries['shear'][-1].setText(self.extraDefaults['shear'])
         self.entries['scale'][-1].setText(self.extraDefaults['scale'])
         self.entries['foldF1'][-1].setChecked(self.extraDefaults['foldF1'])
+        self.entries['interpolate'][-1].setChecked(self.extraDefaults['interpolate'])
+        self.entries['ssbExact'][-1].setChecked(self.extraDefaults['ssbExact'])
+        self.entries['ssbSingle'][-1].setChecked(self.extraDefaults['ssbSingle'])
         self.MASChange(self.extraDefaults['spinType'])
         super(MqmasDeconvParamFrame, self).reset()
 
@@ -4954,6 +5104,8 @@ class MqmasDeconvParamFrame(AbstractParamFrame):
             self.spinLabel.setEnabled(True)
             self.entries['numssb'][-1].setEnabled(True)
             self.sidebandLabel.setEnabled(True)
+            self.entries['ssbExact'][-1].setEnabled(True)
+            self.entries['ssbSingle'][-1].setEnabled(True)
         else:
             self.ticks["Spinspeed"][-1].setChecked(True)
             self.entries["Spinspeed"][-1].setEnabled(False)
@@ -4961,6 +5113,8 @@ class MqmasDeconvParamFrame(AbstractParamFrame):
             self.spinLabel.setEnabled(False)
             self.entries['numssb'][-1].setEnabled(False)
             self.sidebandLabel.setEnabled(False)
+            self.entries['ssbExact'][-1].setEnabled(False)
+            self.entries['ssbSingle'][-1].setEnabled(False)
 
     def extraParamToFile(self):
         """
@@ -4975,6 +5129,9 @@ class MqmasDeconvParamFrame(AbstractParamFrame):
                      "Angle": self.entries['angle'][-1].text(),
                      "Sidebands": self.entries['numssb'][-1].text(),
                      "FoldF1" :  self.entries['foldF1'][-1].isChecked(),
+                     "Interpolate": str(self.entries['interpolate'][-1].isChecked()),
+                     "ExactPhases": str(self.entries['ssbExact'][-1].isChecked()),
+                     "SinglePrecision": str(self.entries['ssbSingle'][-1].isChecked()),
                     }
         return (extraDict, {})
 
@@ -4994,7 +5151,7 @@ class MqmasDeconvParamFrame(AbstractParamFrame):
         if "ScaleSW" in keys:
             self.entries['scale'][0].setText(preParams["ScaleSW"])
         if "Cheng" in keys:
-            self.entries['cheng'][0].setValue(int(preParams["Cheng"]))
+            self.entries['cheng'][0].setValue(0 if preParams["Cheng"] == "Auto" else int(preParams["Cheng"]))
         if "Angle" in keys:
             self.entries['angle'][0].setText(preParams["Angle"])
         if "Sidebands" in keys:
@@ -5005,6 +5162,12 @@ class MqmasDeconvParamFrame(AbstractParamFrame):
             else: 
                 fold = False
             self.entries['foldF1'][0].setChecked(fold)
+        if "Interpolate" in keys:
+            self.entries['interpolate'][0].setChecked(preParams["Interpolate"] == "True")
+        if "ExactPhases" in keys:
+            self.entries['ssbExact'][0].setChecked(preParams["ExactPhases"] == "True")
+        if "SinglePrecision" in keys:
+            self.entries['ssbSingle'][0].setChecked(preParams["SinglePrecision"] == "True")
 
     def getExtraParams(self, out):
         """
@@ -5017,16 +5180,16 @@ class MqmasDeconvParamFrame(AbstractParamFrame):
         MQ = self.MQvalues[self.entries['MQ'][-1].currentIndex()]
         if MQ > (I*2):
             raise RuntimeError("MQ cannot be larger than I")
-        cheng = safeEval(self.entries['cheng'][-1].text())
-        alpha, beta, weight = simFunc.zcw_angles(cheng, 2)
-        D2 = simFunc.D2tens(alpha, beta, np.zeros_like(alpha))
-        D4 = simFunc.D4tens(alpha, beta, np.zeros_like(alpha))
+        cheng = self.entries['cheng'][-1].value()
+        D2, D4, weight = simFunc.powderTensors(cheng or simFunc.ADAPTIVEMINCHENG, 2)
         numssb = self.entries['numssb'][-1].value()
         MAStype = self.entries['spinType'][-1].currentIndex()
         shear = safeEval(self.entries['shear'][-1].text())
         scale = safeEval(self.entries['scale'][-1].text())
         foldF1 = self.entries['foldF1'][-1].isChecked()
-        out['extra'] = [I, MQ, numssb, angle, D2, D4, weight, shear, scale, MAStype, foldF1]
+        interpolate = self.entries['interpolate'][-1].isChecked()
+        carousel = [self.entries['ssbExact'][-1].isChecked(), self.entries['ssbSingle'][-1].isChecked()]
+        out['extra'] = self.setPowderAveraging(simFunc.mqmasFunc, [I, MQ, numssb, angle, D2, D4, weight, shear, scale, MAStype, foldF1, interpolate] + carousel, cheng, 2)
         return (out, out['extra'])
 
     def checkResults(self, numExp, struc):
@@ -5076,6 +5239,7 @@ class MqmasCzjzekParamFrame(AbstractParamFrame):
     MQvalues = [3, 5, 7, 9]
     SINGLENAMES = ["Offset", "Multiplier"]
     MULTINAMES = ["Position", 'Gauss', "Sigma", "Cq0", 'eta0', "Integral", "Lorentz", "Lorentz1"] #, "Gauss2", "Gauss1"]
+    PARAMRANGES = {"Gauss": (0.0, None), "Cq0": (0.0, None), 'eta0': (0.0, 1.0), "Lorentz": (0.0, None), "Lorentz1": (0.0, None)}
     EXTRANAMES = ['method', 'd', 'MQ', 'shear', 'scale']
     TYPES = ['Normal', 'Extended']
 
@@ -77,7 +77,285 @@ def apodize(t, shift=0.0, lor=None, gauss=None, cos2=[None, None], hamming=None,
         x[-1:-(int(len(x) / 2) + 1):-1] = x[:int(len(x) / 2)]
     return x
 
-def lpsvd(fullFid, nPredict, maxFreq, forward=False, L=None):
+BASELINETYPES = ['poly', 'sin/cos', 'spline', 'als']  # Baseline models, 'als' is asymmetric least squares
+ALSASYMMETRY = 0.01  # Weight of the points above the baseline in the asymmetric least squares fit
+ALSITERATIONS = 10  # Number of reweighting steps of the asymmetric least squares fit
+AUTOBASELINETHRESHOLD = 3.0  # Derivatives larger than this many times the noise are considered signal
+AUTOBASELINEWIDENING = 0.01  # Fraction of the points by which the signal regions are widened on both sides
+
+def baselineMatrix(x, degree, type):
+    """
+    Calculates the basis functions of a linear baseline model.
+
+    Parameters
+    ----------
+    x : ndarray
+        The x-axis.
+    degree : int
+        The polynomial degree, the number of sine/cosine orders or the number of interior spline knots.
+    type : str
+        Either 'poly', 'sin/cos' or 'spline' (cubic B-splines).
+
+    Returns
+    -------
+    ndarray
+        The basis functions as columns of a matrix with len(x) rows.
+    """
+    x = np.asarray(x, dtype=float)
+    if type == 'poly':
+        import numpy.polynomial.polynomial as poly
+        # Map the x-axis on [-1, 1] to keep the matrix well conditioned
+        span = np.max(x) - np.min(x)
+        xScaled = 2 * (x - np.min(x)) / span - 1 if span > 0 else x - np.min(x)
+        return poly.polyvander(xScaled, degree)
+    elif type == 'sin/cos':
+        fit = np.ones([len(x), degree * 2 + 1])
+        xFake = np.linspace(0, 2 * np.pi, len(x))  # cos/sine always in 0-->2pi regime
+        for order in range(degree):
+            fit[:, order * 2 + 1] = np.cos((order + 1) * xFake)
+            fit[:, order * 2 + 2] = np.sin((order + 1) * xFake)
+        return fit
+    elif type == 'spline':
+        from scipy.interpolate import BSpline
+        k = 3
+        knots = np.linspace(np.min(x), np.max(x), degree + 2)
+        knots = np.concatenate(([knots[0]] * k, knots, [knots[-1]] * k))
+        numBasis = len(knots) - k - 1
+        return BSpline(knots, np.eye(numBasis), k, extrapolate=True)(x)
+    raise ValueError('Unknown baseline type: ' + str(type))
+
+def alsBaseline(data, bArray, lam, asymmetry=ALSASYMMETRY, iterations=ALSITERATIONS):
+    """
+    Fits an asymmetric least squares baseline (Eilers and Boelens) through a real 1D trace.
+    Points above the baseline get a small weight, such that peaks are ignored without selecting baseline points.
+
+    Parameters
+    ----------
+    data : ndarray
+        The real data.
+    bArray : ndarray
+        Boolean array, points that are False are not used.
+    lam : float
+        The smoothness of the baseline.
+    asymmetry : float, optional
+        The weight of points above the baseline.
+    iterations : int, optional
+        The number of reweighting steps.
+
+    Returns
+    -------
+    ndarray
+        The baseline.
+    """
+    length = len(data)
+    if length < 4:
+        return np.copy(data)
+    # The banded (upper) form of the symmetric penalty lam * D^T D, with D the second difference
+    penalty = np.zeros((3, length))
+    penalty[0, 2:] = lam
+    penalty[1, 1:] = -4 * lam
+    penalty[1, 1] = penalty[1, -1] = -2 * lam
+    penalty[2] = 6 * lam
+    penalty[2, [0, -1]] = lam
+    penalty[2, [1, -2]] = 5 * lam
+    mask = np.asarray(bArray, dtype=float)
+    weight = np.copy(mask)
+    for _ in range(iterations):
+        banded = np.copy(penalty)
+        banded[2] += weight + 1e-12  # keeps the system positive definite
+        baseline = scipy.linalg.solveh_banded(banded, weight * data)
+        weight = mask * np.where(data > baseline, asymmetry, 1 - asymmetry)
+    return baseline
+
+def baselineFit(x, data, bArray, degree, type, axis=-1):
+    """
+    Fits a baseline through all traces of the data at once.
+    For the linear models the pseudo-inverse of the basis functions on the selected points is calculated once
+    and applied to all traces by matrix products.
+
+    Parameters
+    ----------
+    x : ndarray
+        The x-axis along axis.
+    data : ndarray
+        The data, can be complex.
+    bArray : ndarray
+        Boolean array along axis, points that are False are not used for the fit.
+    degree : int
+        The degree of the model (see baselineMatrix). For 'als' the smoothness is 10**degree.
+    type : str
+        The model, one of BASELINETYPES.
+    axis : int, optional
+        The axis of the traces.
+        Defaults to the last dimension.
+
+    Returns
+    -------
+    ndarray
+        The baseline with the same shape as data.
+    """
+    bArray = np.asarray(bArray, dtype=bool)
+    tmpData = np.moveaxis(np.asarray(data), axis, -1)
+    if type == 'als':
+        lam = 10.0**degree
+        flatData = tmpData.reshape(-1, tmpData.shape[-1])
+        result = np.zeros(flatData.shape, dtype=flatData.dtype)
+        for i, trace in enumerate(flatData):
+            result[i] = alsBaseline(np.real(trace), bArray, lam)
+            if np.iscomplexobj(trace):
+                result[i] += 1j * alsBaseline(np.imag(trace), bArray, lam)
+        return np.moveaxis(result.reshape(tmpData.shape), -1, axis)
+    fit = baselineMatrix(x, degree, type)
+    coeff = np.dot(tmpData[..., bArray], np.linalg.pinv(fit[bArray]).T)
+    return np.moveaxis(np.dot(coeff, fit.T), -1, axis)
+
+
+def autoBaselinePoints(data, axis=-1, threshold=AUTOBASELINETHRESHOLD, widening=AUTOBASELINEWIDENING):
+    """
+    Detects the baseline points of spectra from their derivative.
+    The derivative is summed over all traces, so all traces share the same points.
+
+    Parameters
+    ----------
+    data : ndarray
+        The data, of which the real part is used.
+    axis : int, optional
+        The axis of the traces.
+        Defaults to the last dimension.
+    threshold : float, optional
+        Derivatives larger than threshold times the noise level are considered signal.
+    widening : float, optional
+        Fraction of the points by which the signal regions are widened on both sides.
+
+    Returns
+    -------
+    ndarray
+        Boolean array along axis, True for baseline points.
+    """
+    tmpData = np.moveaxis(np.real(np.asarray(data)), axis, -1)
+    length = tmpData.shape[-1]
+    deriv = np.abs(np.diff(tmpData, axis=-1)).reshape(-1, length - 1).sum(axis=0)
+    deriv = np.append(deriv, deriv[-1])
+    # The median of the derivative is a robust measure of the noise
+    noise = np.median(deriv)
+    signal = deriv > threshold * noise
+    width = int(widening * length)
+    if width > 0:
+        signal = np.convolve(signal, np.ones(2 * width + 1), mode='same') > 0
+    bArray = np.logical_not(signal)
+    if np.count_nonzero(bArray) < 2:
+        return np.ones(length, dtype=bool)
+    return bArray
+
+def correlationShift(data, reference, axis=-1):
+    """
+    Determines the shift of traces with respect to a reference trace from the maximum of their cross-correlation.
+    The position of the maximum is refined to a fraction of a point by a parabola through the maximum and its neighbours.
+
+    Parameters
+    ----------
+    data : ndarray
+        The traces, of which the real part is used.
+    reference : ndarray
+        The reference trace along axis.
+    axis : int, optional
+        The axis of the traces.
+        Defaults to the last dimension.
+
+    Returns
+    -------
+    ndarray
+        The number of points each trace should be rolled to align it with the reference.
+        The shape is that of data without axis.
+    """
+    tmpData = np.real(np.moveaxis(data, axis, -1))
+    tmpData = tmpData - np.mean(tmpData, axis=-1, keepdims=True)
+    reference = np.real(reference) - np.mean(np.real(reference))
+    length = tmpData.shape[-1]
+    nfft = 2 * length
+    corr = np.fft.irfft(np.fft.rfft(reference, nfft) * np.conj(np.fft.rfft(tmpData, nfft, axis=-1)), nfft, axis=-1)
+    peak = np.argmax(corr, axis=-1)
+    yMin = np.take_along_axis(corr, np.mod(peak - 1, nfft)[..., np.newaxis], -1)[..., 0]
+    yMax = np.take_along_axis(corr, np.mod(peak + 1, nfft)[..., np.newaxis], -1)[..., 0]
+    y0 = np.take_along_axis(corr, peak[..., np.newaxis], -1)[..., 0]
+    curve = yMin - 2 * y0 + yMax
+    delta = np.zeros(peak.shape)
+    valid = curve < 0
+    delta[valid] = 0.5 * (yMin - yMax)[valid] / curve[valid]
+    peak = np.where(peak >= length, peak - nfft, peak)
+    return peak + delta
+
+LPSVDOVERSAMPLE = 10  # Extra random vectors of the randomized SVD
+LPSVDPOWERITER = 2    # Number of power iterations of the randomized SVD
+LPSVDSEED = 0         # Seed of the random vectors, such that the prediction is reproducible
+LPSVDNOISE = 3.0      # Singular values below this factor times the noise level are not used by the fast LPSVD
+
+def hankelProduct(c, numRows, vec):
+    """
+    Multiplies a Hankel matrix with a set of vectors, without forming the matrix.
+    The product is calculated as a correlation using FFTs.
+
+    Parameters
+    ----------
+    c : ndarray
+        The values of the Hankel matrix, H[i, j] = c[i + j].
+    numRows : int
+        The number of rows of the Hankel matrix.
+        The number of columns is len(c) - numRows + 1.
+    vec : ndarray
+        The vectors as columns of a 2D array.
+
+    Returns
+    -------
+    ndarray
+        The product, with numRows rows.
+    """
+    numCols = len(c) - numRows + 1
+    nfft = 2**int(np.ceil(np.log2(len(c) + numCols - 1)))
+    prod = np.fft.ifft(np.fft.fft(c, nfft)[:, np.newaxis] * np.fft.fft(vec[::-1], nfft, axis=0), axis=0)
+    return prod[numCols - 1:numCols - 1 + numRows]
+
+def hankelSvd(c, numRows, rank):
+    """
+    Calculates the largest singular values and vectors of a Hankel matrix with a randomized SVD.
+    The matrix is only used via FFT based products (see hankelProduct).
+    The method follows: N. Halko, P. G. Martinsson, J. A. Tropp SIAM Review 53, 217-288, 2011.
+
+    Parameters
+    ----------
+    c : ndarray
+        The values of the Hankel matrix, H[i, j] = c[i + j].
+    numRows : int
+        The number of rows of the Hankel matrix.
+    rank : int
+        The number of singular values to calculate.
+
+    Returns
+    -------
+    ndarray
+        The left singular vectors as columns.
+    ndarray
+        The singular values in descending order.
+    ndarray
+        The right singular vectors as rows.
+    """
+    numCols = len(c) - numRows + 1
+    size = min(rank + LPSVDOVERSAMPLE, numRows, numCols)
+    if size == min(numRows, numCols):
+        U, S, Vh = np.linalg.svd(scipy.linalg.hankel(c[:numRows], c[numRows - 1:]), full_matrices=False)
+        return U[:, :rank], S[:rank], Vh[:rank]
+    cConj = np.conj(c)
+    rng = np.random.default_rng(LPSVDSEED)
+    Q = hankelProduct(c, numRows, rng.standard_normal((numCols, size)) + 1j * rng.standard_normal((numCols, size)))
+    Q = np.linalg.qr(Q)[0]
+    for _ in range(LPSVDPOWERITER):
+        Q = np.linalg.qr(hankelProduct(cConj, numCols, Q))[0]
+        Q = np.linalg.qr(hankelProduct(c, numRows, Q))[0]
+    B = np.conj(hankelProduct(cConj, numCols, Q)).T  # Q^H H
+    Ub, S, Vh = np.linalg.svd(B, full_matrices=False)
+    return np.dot(Q, Ub[:, :rank]), S[:rank], Vh[:rank]
+
+def lpsvd(fullFid, nPredict, maxFreq, forward=False, L=None, fast=False):
     """
     Performs a LPSVD (Linear Predictive Singular Value Decomposition) on a given FID.
     Both forward and backward prediction are available.
@@ -100,6 +378,12 @@ def lpsvd(fullFid, nPredict, maxFreq, forward=False, L=None):
     L : int, optional
         Number of datapoints from the beginning of the FID to use in the prediction of the frequency components.
         By default all datapoints from fullFid are used.
+    fast : bool, optional
+        If True, only the maxFreq largest singular values are calculated with a randomized SVD (see hankelSvd),
+        singular values at the noise level are discarded (see LPSVDNOISE),
+        and the frequencies follow from the shift invariance of the right singular vectors instead of the roots of the prediction polynomial.
+        The time then scales with the number of frequencies instead of the cube of the number of points.
+        False by default.
 
     Returns
     -------
@@ -109,18 +393,27 @@ def lpsvd(fullFid, nPredict, maxFreq, forward=False, L=None):
     fid = fullFid[:L]
     N = len(fid)
     M = int(np.floor(N * 3 / 4.0))
-    H = scipy.linalg.hankel(fid[1:N-M+1], fid[N-M:])
-    U, S, Vh = np.linalg.svd(H, full_matrices=1)
-    sigVal = len(S[S > (S[0]*1e-6)]) # Number of significant singular values
-    if sigVal > maxFreq:
-        sigVal = maxFreq
-    bias = np.mean(S[sigVal:])
-    S = S[:sigVal] - bias
-    U = U[:, :sigVal]
-    Sinv = np.diag(1.0/S)
-    Vh = Vh[:sigVal]
-    q = np.dot(np.dot(np.conj(Vh.T), np.dot(Sinv, np.conj(U.T))), fid[:(N-M)])
-    s = np.roots(np.append(-q[::-1], 1)) # Find the roots of the polynomial
+    if fast:
+        _, S, Vh = hankelSvd(fid[1:], N - M, maxFreq)
+        # The noise level is the RMS of the neglected singular values, which follows from the norm of the Hankel matrix
+        count = np.minimum(np.minimum(np.arange(1, N), np.arange(N - 1, 0, -1)), min(N - M, M))
+        rest = np.sum(count * np.abs(fid[1:])**2) - np.sum(S**2)
+        noise = np.sqrt(max(rest, 0.0) / max(min(N - M, M) - len(S), 1))
+        Vh = Vh[S > max(S[0]*1e-6, LPSVDNOISE * noise)] # Only the significant singular values
+        s = np.linalg.eigvals(np.linalg.lstsq(Vh[:, :-1].T, Vh[:, 1:].T, rcond=None)[0])
+    else:
+        H = scipy.linalg.hankel(fid[1:N-M+1], fid[N-M:])
+        U, S, Vh = np.linalg.svd(H, full_matrices=1)
+        sigVal = len(S[S > (S[0]*1e-6)]) # Number of significant singular values
+        if sigVal > maxFreq:
+            sigVal = maxFreq
+        bias = np.mean(S[sigVal:])
+        S = S[:sigVal] - bias
+        U = U[:, :sigVal]
+        Sinv = np.diag(1.0/S)
+        Vh = Vh[:sigVal]
+        q = np.dot(np.dot(np.conj(Vh.T), np.dot(Sinv, np.conj(U.T))), fid[:(N-M)])
+        s = np.roots(np.append(-q[::-1], 1)) # Find the roots of the polynomial
     s = s[np.abs(s) < 1.0] # Accept only values within the unit circle
     sLog = np.log(s)
     freq = np.imag(sLog)
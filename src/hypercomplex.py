@@ -17,8 +17,20 @@
 # You should have received a copy of the GNU General Public License
 # along with ssNake. If not, see <http://www.gnu.org/licenses/>.
 
+import os
+import multiprocessing
 import warnings
 import numpy as np
+import scipy.sparse
+try:
+    import scipy.fft as scipyFft
+except ImportError:  # scipy.fft requires scipy >= 1.4
+    scipyFft = None
+try:
+    import pyfftw
+    import pyfftw.interfaces.numpy_fft as pyfftwFft
+except ImportError:
+    pyfftw = None
 
 def parity(x):
     # Find the parity of an integer
@@ -30,10 +42,477 @@ def parity(x):
         x = x & (x - 1)
     return int(parity)
 
+def hyperValues(mask):
+    # All hyper values (combinations of the bits in mask) of a set of hypercomplex dimensions, sorted
+    return np.array([idim for idim in range(mask + 1) if idim & mask == idim])
+
 
 class HComplexException(Exception):
     pass
 
+
+SINGLETYPES = (np.float32, np.complex64)  # Data of these types is stored in single precision
+
+
+def complexType(data):
+    """
+    Returns the complex type in which HComplexData stores data.
+
+    Parameters
+    ----------
+    data : array_like
+        The data.
+
+    Returns
+    -------
+    dtype
+        complex64 for single precision data (see SINGLETYPES), complex128 otherwise.
+    """
+    if getattr(data, 'dtype', None) in SINGLETYPES:
+        return np.dtype(np.complex64)
+    return np.dtype(np.complex128)
+
+#########################################################################
+# the FFT backend
+
+FFTBACKENDS = ['numpy'] + ['scipy'] * (scipyFft is not None) + ['pyfftw'] * (pyfftw is not None)  # Available FFT libraries
+FFTCONFIG = {'backend': 'scipy' if scipyFft is not None else 'numpy',  # The FFT library used by all transforms
+             'workers': os.cpu_count() or 1}                           # The number of threads used by the transforms, see fftWorkers
+FFTWKEEPALIVE = 60.0  # Seconds that pyFFTW keeps unused plans in its cache
+NUMPYFFTOUT = int(np.__version__.split('.')[0]) >= 2  # numpy.fft supports the out argument
+
+
+def setFftBackend(backend, workers=None):
+    """
+    Selects the library that is used for all Fourier transforms.
+
+    Parameters
+    ----------
+    backend : str
+        The name of the library, should be in FFTBACKENDS.
+        'numpy' is always single threaded, 'scipy' and 'pyfftw' can use multiple threads.
+    workers : int, optional
+        The number of threads.
+        0 or a negative value uses all cores.
+        By default the number of threads is not changed.
+
+    Raises
+    ------
+    HComplexException
+        When the library is not available.
+    """
+    if backend not in FFTBACKENDS:
+        raise HComplexException('FFT backend ' + str(backend) + ' is not available')
+    FFTCONFIG['backend'] = backend
+    if workers is not None:
+        FFTCONFIG['workers'] = int(workers) if workers > 0 else (os.cpu_count() or 1)
+    if backend == 'pyfftw':
+        # Keeps the FFTW plans, such that repeated transforms of the same shape are not planned again
+        pyfftw.interfaces.cache.enable()
+        pyfftw.interfaces.cache.set_keepalive_time(FFTWKEEPALIVE)
+
+
+def fftWorkers():
+    """
+    Returns the number of threads of a transform.
+    The workers of a multiprocessing pool (e.g. the global fits and the LPSVD) are daemon processes, which already run on all cores.
+    They use a single thread, as threads in every worker would oversubscribe the cores.
+
+    Returns
+    -------
+    int
+        The number of threads.
+    """
+    if multiprocessing.current_process().daemon:
+        return 1
+    return FFTCONFIG['workers']
+
+
+def shiftModulation(shape, axes, inverse=False):
+    """
+    Returns the factor exp(2*pi*i*s*n/N) along the given axes, with s = N//2 the size of the fftshift.
+    Multiplying the input of an FFT by this factor equals an fftshift of the output,
+    multiplying the output of an inverse FFT by the conjugate factor equals an ifftshift of its input.
+    For an even length the factor is (-1)**n, which is exact.
+
+    Parameters
+    ----------
+    shape : tuple of ints
+        The shape of the data.
+    axes : tuple of ints
+        The axes for which the factor is calculated.
+    inverse : bool, optional
+        If True, the factor for the inverse transform is returned.
+        False by default.
+
+    Returns
+    -------
+    ndarray
+        The factor, which can be broadcast to shape.
+    """
+    ndim = len(shape)
+    mod = np.ones([1] * ndim, dtype=np.int8)
+    for axis in axes:
+        length = shape[axis]
+        if length % 2 == 0:
+            sign = np.ones(length, dtype=np.int8)
+            sign[1::2] = -1
+        else:
+            # The phase is calculated from the index modulo the length to keep it accurate for long axes
+            index = (np.arange(length) * (length // 2)) % length
+            sign = np.exp((-2j if inverse else 2j) * np.pi * index / length)
+        mod = mod * sign.reshape([-1 if i == axis % ndim else 1 for i in range(ndim)])
+    return mod
+
+
+def applyModulation(data, mod, overwrite):
+    """
+    Multiplies data by a modulation factor, in place when allowed and possible.
+
+    Parameters
+    ----------
+    data : ndarray
+        The data.
+    mod : ndarray
+        The factor, see shiftModulation.
+    overwrite : bool
+        If True, data can be overwritten with the result.
+
+    Returns
+    -------
+    ndarray
+        The modulated data.
+    """
+    if np.iscomplexobj(data):
+        # Keep the precision of the data
+        mod = mod.astype(data.dtype, copy=False)
+    if overwrite and np.result_type(data, mod) == data.dtype:
+        data *= mod
+        return data
+    return data * mod
+
+
+def fftn(data, axes, inverse=False, shift=(), overwrite=False):
+    """
+    Performs a (inverse) Fast Fourier Transform with the selected backend (see setFftBackend).
+    An fftshift of the output (or an ifftshift of the input for the inverse transform) along a transformed axis is applied by modulation, without an additional copy of the data.
+    With overwrite=True the transform is done in the memory of the input whenever the backend allows it.
+
+    Parameters
+    ----------
+    data : array_like
+        The data to transform.
+    axes : tuple of ints
+        The axes over which the transform is performed.
+    inverse : bool, optional
+        If True, the inverse transform is performed.
+        False by default.
+    shift : tuple of ints, optional
+        The axes along which the output is fftshifted (or the input is ifftshifted for the inverse transform).
+    overwrite : bool, optional
+        If True, the input data can be used as workspace and is destroyed.
+        False by default.
+
+    Returns
+    -------
+    ndarray
+        The transformed data.
+    """
+    data = np.asarray(data)
+    axes = tuple(axis % data.ndim for axis in axes)
+    shift = tuple(axis % data.ndim for axis in shift)
+    # The shifts of transformed axes are applied by modulation, other axes are shifted explicitly
+    modShift = tuple(axis for axis in shift if axis in axes)
+    rollShift = tuple(axis for axis in shift if axis not in axes)
+    if modShift and not inverse:
+        data = applyModulation(data, shiftModulation(data.shape, modShift), overwrite)
+        overwrite = True
+    if rollShift and inverse:
+        data = np.fft.ifftshift(data, axes=rollShift)
+        overwrite = True
+    backend = FFTCONFIG['backend']
+    if not axes:
+        result = data if overwrite else np.copy(data)
+    elif backend == 'scipy':
+        func = scipyFft.ifftn if inverse else scipyFft.fftn
+        result = func(data, axes=axes, overwrite_x=overwrite, workers=fftWorkers())
+    elif backend == 'pyfftw':
+        func = pyfftwFft.ifftn if inverse else pyfftwFft.fftn
+        result = func(data, axes=axes, overwrite_input=overwrite, threads=fftWorkers())
+    elif overwrite and NUMPYFFTOUT and len(axes) == 1 and np.iscomplexobj(data):
+        # numpy >= 2 can write a one dimensional transform into its input
+        func = np.fft.ifft if inverse else np.fft.fft
+        result = func(data, axis=axes[0], out=data)
+    else:
+        func = np.fft.ifftn if inverse else np.fft.fftn
+        result = func(data, axes=axes)
+    if modShift and inverse:
+        result = applyModulation(result, shiftModulation(result.shape, modShift, True), True)
+    if rollShift and not inverse:
+        result = np.fft.fftshift(result, axes=rollShift)
+    return result
+
+
+def fft(data, axis=-1, shift=False, overwrite=False):
+    """
+    Performs a Fast Fourier Transform along a given axis with the selected backend (see fftn).
+
+    Parameters
+    ----------
+    data : array_like
+        The data to transform.
+    axis : int, optional
+        The axis over which the transform is performed.
+        Defaults to the last dimension.
+    shift : bool, optional
+        If True, the output is fftshifted.
+        False by default.
+    overwrite : bool, optional
+        If True, the input data can be used as workspace and is destroyed.
+        False by default.
+
+    Returns
+    -------
+    ndarray
+        The transformed data.
+    """
+    return fftn(data, (axis, ), False, (axis, ) if shift else (), overwrite)
+
+
+def ifft(data, axis=-1, shift=False, overwrite=False):
+    """
+    Performs an inverse Fast Fourier Transform along a given axis with the selected backend (see fftn).
+
+    Parameters
+    ----------
+    data : array_like
+        The data to transform.
+    axis : int, optional
+        The axis over which the transform is performed.
+        Defaults to the last dimension.
+    shift : bool, optional
+        If True, the input is ifftshifted before the transform.
+        False by default.
+    overwrite : bool, optional
+        If True, the input data can be used as workspace and is destroyed.
+        False by default.
+
+    Returns
+    -------
+    ndarray
+        The transformed data.
+    """
+    return fftn(data, (axis, ), True, (axis, ) if shift else (), overwrite)
+
+
+def ifftn(data, axes, shift=(), overwrite=False):
+    """
+    Performs an inverse Fast Fourier Transform with the selected backend (see fftn).
+    """
+    return fftn(data, axes, True, shift, overwrite)
+
+def resizeData(data, size, pos, axis=-1):
+    """
+    Resizes an array along a specified axis, see HComplexData.resize.
+
+    Parameters
+    ----------
+    data : ndarray
+        The data.
+    size : int
+        The new size of the data along axis.
+    pos : int
+        The position where zeros should be added or datapoints should be removed.
+    axis : int, optional
+        The axis along which the data is resized.
+        Defaults to the last dimension.
+
+    Returns
+    -------
+    ndarray
+        The resized data, which can share memory with the input.
+    """
+    axis = axis % data.ndim
+    oldSize = data.shape[axis]
+    if size > oldSize:
+        slicing1 = (slice(None), ) * axis + (slice(None, pos), )
+        slicing2 = (slice(None), ) * axis + (slice(pos, None), )
+        zeroShape = np.array(data.shape)
+        zeroShape[axis] = size - oldSize
+        tmpData = np.concatenate((data[slicing1], np.zeros(zeroShape, dtype=data.dtype), data[slicing2]), axis=axis)
+    else:
+        difference = oldSize - size
+        removeBegin = int(np.floor(difference / 2))
+        removeEnd = difference - removeBegin
+        if pos < removeBegin:
+            slicing = (slice(None), ) * axis + (slice(difference, None), )
+            tmpData = data[slicing]
+        elif oldSize - pos < removeEnd:
+            slicing = (slice(None), ) * axis + (slice(None, size), )
+            tmpData = data[slicing]
+        else:
+            slicing1 = (slice(None), ) * axis + (slice(None, pos - removeBegin), )
+            slicing2 = (slice(None), ) * axis + (slice(pos + removeEnd, None), )
+            tmpData = np.append(data[slicing1], data[slicing2], axis=axis)
+    return tmpData
+
+
+def rollData(data, shift, axis=-1):
+    """
+    Rolls the traces of an array along a specified axis, each by its own number of points.
+    All traces are rolled with a single gather.
+
+    Parameters
+    ----------
+    data : ndarray
+        The data.
+    shift : int or array_like of ints
+        The number of places to roll each trace.
+        The shape should broadcast to the shape of the data without axis.
+    axis : int, optional
+        The axis along which the data is rolled.
+        Defaults to the last dimension.
+
+    Returns
+    -------
+    ndarray
+        A copy of the rolled data.
+    """
+    tmpData = np.moveaxis(data, axis, -1)
+    length = tmpData.shape[-1]
+    index = np.mod(np.arange(length) - np.asarray(shift, dtype=int)[..., np.newaxis], length)
+    index = index.reshape((1, ) * (tmpData.ndim - index.ndim) + index.shape)
+    return np.moveaxis(np.take_along_axis(tmpData, index, -1), -1, axis)
+
+
+def fourierRollData(data, shift, axis=-1):
+    """
+    Rolls the traces of an array along a specified axis by a non-integer number of points.
+    The roll is applied as a linear phase ramp in the Fourier domain of axis, the data is treated as periodic.
+
+    Parameters
+    ----------
+    data : ndarray
+        The data.
+    shift : float or array_like of floats
+        The number of places to roll each trace.
+        The shape should broadcast to the shape of the data without axis.
+    axis : int, optional
+        The axis along which the data is rolled.
+        Defaults to the last dimension.
+
+    Returns
+    -------
+    ndarray
+        A copy of the rolled data.
+    """
+    tmpData = np.moveaxis(data, axis, -1)
+    ramp = np.exp(-2j * np.pi * np.fft.fftfreq(tmpData.shape[-1]) * np.asarray(shift, dtype=float)[..., np.newaxis])
+    tmpData = fftn(tmpData, (-1, ))
+    tmpData *= ramp.astype(tmpData.dtype)
+    return np.moveaxis(fftn(tmpData, (-1, ), inverse=True, overwrite=True), -1, axis)
+
+REGRIDMETHODS = ['linear', 'cubic', 'sinc']  # Interpolation methods of regridData
+REGRIDSINCTAPS = 8  # Number of points on each side used by the windowed sinc interpolation
+REGRIDSINCBETA = 8.0  # Shape of the Kaiser window of the sinc interpolation
+
+
+def regridWeights(newX, oldX, method='linear'):
+    """
+    Calculates the indices and weights of the points that are combined by an interpolation.
+    The interpolation is done on the index of oldX, such that linear interpolation is exact for any oldX.
+    The cubic (Keys cubic convolution) and sinc (Kaiser windowed sinc) methods assume equally spaced oldX.
+    Indices beyond the data are clamped to the first or last point.
+
+    Parameters
+    ----------
+    newX : array_like
+        A 1-D array with the new x-values.
+    oldX : array_like
+        A 1-D array with the old x-values.
+    method : str, optional
+        The interpolation method, one of REGRIDMETHODS.
+        Defaults to 'linear'.
+
+    Returns
+    -------
+    ndarray
+        The indices in oldX, with shape (len(newX), number of points per value).
+    ndarray
+        The weights of these points.
+        New x-values outside the range of oldX have zero weights.
+
+    Raises
+    ------
+    HComplexException
+        When the method is unknown.
+    """
+    newX = np.asarray(newX, dtype=float)
+    oldX = np.asarray(oldX, dtype=float)
+    order = np.argsort(oldX, kind='stable')
+    sortX = oldX[order]
+    pos = np.interp(newX, sortX, np.arange(len(sortX)))
+    start = np.floor(pos)
+    if method == 'linear':
+        offsets = np.arange(2)
+    elif method == 'cubic':
+        offsets = np.arange(-1, 3)
+    elif method == 'sinc':
+        offsets = np.arange(-REGRIDSINCTAPS + 1, REGRIDSINCTAPS + 1)
+    else:
+        raise HComplexException('Unknown regrid method: ' + str(method))
+    index = start[:, np.newaxis] + offsets
+    dist = np.abs(pos[:, np.newaxis] - index)
+    if method == 'linear':
+        weights = np.maximum(1 - dist, 0)
+    elif method == 'cubic':
+        a = -0.5
+        weights = np.where(dist <= 1, (a + 2) * dist**3 - (a + 3) * dist**2 + 1,
+                           np.where(dist < 2, a * dist**3 - 5 * a * dist**2 + 8 * a * dist - 4 * a, 0))
+    else:
+        window = np.i0(REGRIDSINCBETA * np.sqrt(np.maximum(1 - (dist / REGRIDSINCTAPS)**2, 0))) / np.i0(REGRIDSINCBETA)
+        weights = np.sinc(dist) * window
+        weights[dist >= REGRIDSINCTAPS] = 0
+        weights /= np.sum(weights, axis=1, keepdims=True)  # The windowed sinc does not preserve a constant exactly
+    weights[(newX < sortX[0]) | (newX > sortX[-1])] = 0
+    index = order[np.clip(index, 0, len(sortX) - 1).astype(int)]
+    return index, weights
+
+
+def regridData(data, newX, oldX, axis=-1, method='linear'):
+    """
+    Interpolates an array from specified x-values to new x-values along an axis.
+    The indices and weights are calculated once (see regridWeights) and applied to all traces as a single sparse matrix product.
+
+    Parameters
+    ----------
+    data : ndarray
+        The data.
+    newX : array_like
+        A 1-D array with the new x-values.
+    oldX : array_like
+        A 1-D array with the old x-values. It should have the same length as the data along axis.
+    axis : int, optional
+        The axis along which the interpolation is applied.
+        Defaults to the last dimension.
+    method : str, optional
+        The interpolation method, one of REGRIDMETHODS.
+        Defaults to 'linear'.
+
+    Returns
+    -------
+    ndarray
+        The interpolated data, values outside the range of oldX are 0.
+    """
+    index, weights = regridWeights(newX, oldX, method)
+    weights = weights.astype(np.real(np.zeros(1, dtype=data.dtype)).dtype)
+    rows = np.repeat(np.arange(len(index)), index.shape[1])
+    matrix = scipy.sparse.csr_matrix((weights.ravel(), (rows, index.ravel())), shape=(len(index), len(oldX)))
+    tmpData = np.moveaxis(data, axis, -1)
+    shape = tmpData.shape[:-1] + (len(index), )
+    result = np.asarray(tmpData.reshape(-1, len(oldX)) @ matrix.T)
+    return np.moveaxis(result.reshape(shape), -1, axis)
+
 #########################################################################
 # the hyper complex data class
 
@@ -51,9 +530,14 @@ class HComplexData(object):
     self.data[2] is real in the first dimension and imaginary in the second,
     self.data[3] is imaginary in both first and second dimension.
     self.data contains complex values, the imaginary values are from the last dimension which is always complex and is not listed in self.hyper.
+    Matrices which are zero everywhere do not have to be stored, except for the real matrix (hyper 0).
+    Assignments (__setitem__) and icomplexReorder do not add such matrices.
+    For example, self.hyper = [0,1,3] is valid and the matrix with hyper 2 is zero.
+    self.hyper is always sorted, so self.data[0] is the real matrix,
+    and every hypercomplex dimension has at least one stored matrix which is imaginary along that dimension.
     """
 
-    def __init__(self, data=None, hyper=None):
+    def __init__(self, data=None, hyper=None, dtype=None):
         """
         Initializes the HComplexData
 
@@ -67,19 +551,24 @@ class HComplexData(object):
             Is used as the hyper list of the hypercomplex data
             If hyper is None, data is assumed to be regular complex data and an additional dimension
             is added to hold the hypercomplex information.
+        dtype : dtype, optional
+            The complex type used to store the data, either complex128 or complex64.
+            By default single precision data (float32 or complex64) is stored as complex64 and all other data as complex128.
         """
+        if dtype is None:
+            dtype = complexType(data)
         if data is None:
-            self.data = np.array([], dtype=complex)
+            self.data = np.array([], dtype=dtype)
             self.hyper = np.array([])
         else:
             if hyper is None:
                 # Data is not hypercomplex
-                self.data = np.array([data], dtype=complex)
+                self.data = np.array([data], dtype=dtype)
                 self.hyper = np.array([0])
             else:
                 if len(hyper) != len(data):
                     raise HComplexException('Length of hyper and data mismatch')
-                self.data = np.array(data, dtype=complex)
+                self.data = np.array(data, dtype=dtype)
                 self.hyper = np.array(hyper)
 
     def ndim(self):
@@ -93,6 +582,33 @@ class HComplexData(object):
         """
         return self.data.ndim - 1
 
+    def dtype(self):
+        """
+        The complex type in which the data is stored.
+
+        Returns
+        -------
+        dtype
+            Either complex128 or complex64.
+        """
+        return self.data.dtype
+
+    def astype(self, dtype):
+        """
+        Returns the data stored with a different precision.
+
+        Parameters
+        ----------
+        dtype : dtype
+            The new complex type, either complex128 or complex64.
+
+        Returns
+        -------
+        HComplexData
+            A copy of the data with the new type.
+        """
+        return HComplexData(self.data, np.copy(self.hyper), dtype)
+
     def shape(self):
         """
         Shape of the hypercomplex data, which does not include the first dimension of self.data.
@@ -117,8 +633,23 @@ class HComplexData(object):
         -------
         ndarray
             Complex data corresponding to hyperValue.
+            When this matrix is not stored, an array of zeros is returned.
+        """
+        select = hyperVal == self.hyper
+        if not np.any(select):
+            return np.zeros(self.data.shape[1:], dtype=self.data.dtype)
+        return self.data[select][0]
+
+    def hyperMask(self):
         """
-        return self.data[hyperVal == self.hyper][0]
+        Returns the bits of all hypercomplex dimensions.
+
+        Returns
+        -------
+        int
+            The bitwise or of all values in self.hyper.
+        """
+        return int(np.bitwise_or.reduce(self.hyper)) if len(self.hyper) else 0
 
     def __repr__(self, *args):
         return self.__class__.__name__ + '(' + repr(self.data) + ', ' + repr(self.hyper) + ')'
@@ -157,7 +688,7 @@ class HComplexData(object):
         if isinstance(other, HComplexData):
             tmpHyper = np.unique(np.concatenate((self.hyper, other.hyper)))
             tmpHyper.sort()
-            tmpData = np.zeros((len(tmpHyper),) + np.broadcast(self.data[0], other.data[0]).shape, dtype=complex)
+            tmpData = np.zeros((len(tmpHyper),) + np.broadcast(self.data[0], other.data[0]).shape, dtype=self.data.dtype)
             for i in self.hyper:
                 tmpData[i == tmpHyper] = self.data[i == self.hyper]
             for i in other.hyper:
@@ -196,7 +727,7 @@ class HComplexData(object):
                 tmpHyper = np.concatenate((tmpHyper, xorHyper))
             tmpHyper = np.unique(tmpHyper)
             tmpHyper.sort()
-            tmpData = np.zeros((len(tmpHyper),) + np.broadcast(self.data[0], other.data[0]).shape, dtype=complex)
+            tmpData = np.zeros((len(tmpHyper),) + np.broadcast(self.data[0], other.data[0]).shape, dtype=self.data.dtype)
             for i, idim in enumerate(self.hyper):
                 for j, jdim in enumerate(other.hyper):
                     if parity(idim & jdim):
@@ -273,10 +804,14 @@ class HComplexData(object):
         if isinstance(value, HComplexData):
             self.data[(slice(None), ) + key] = 0
             diffList = np.setdiff1d(value.hyper, self.hyper, assume_unique=True)
+            # Matrices which are zero in value do not have to be added
+            diffList = np.array([i for i in diffList if np.any(value.data[value.hyper == i])], dtype=self.hyper.dtype)
             insertOrder = np.searchsorted(self.hyper, diffList)
             self.data = np.insert(self.data, insertOrder, 0, axis=0)
             self.hyper = np.insert(self.hyper, insertOrder, diffList)
-            self.data[(np.in1d(self.hyper, value.hyper), ) + key] = value.data
+            for i, idim in enumerate(value.hyper):
+                if idim in self.hyper:
+                    self.data[(np.flatnonzero(self.hyper == idim)[0], ) + key] = value.data[i]
         else:
             self.data[(slice(0, 1),) + key] = value
             self.data[(slice(1, None),) + key] = 0
@@ -410,7 +945,7 @@ class HComplexData(object):
             True means the data along axis is hypercomplex.
             This excludes the last dimension.
         """
-        return bool(np.max(self.hyper) & (2**axis))
+        return bool(self.hyperMask() & (2**axis))
 
     def real(self, axis=-1):
         """
@@ -434,8 +969,8 @@ class HComplexData(object):
         if not self.isHyperComplex(axis):
             return HComplexData(np.real(self.data), np.copy(self.hyper))
         bit = 2**axis
-        select = np.logical_not(self.hyper & bit)
-        return HComplexData(self.data[select], self.hyper[select])
+        tmpHyper = hyperValues(self.hyperMask() & ~bit)
+        return HComplexData([self.getHyperData(idim) for idim in tmpHyper], tmpHyper)
 
     def imag(self, axis=-1):
         """
@@ -459,8 +994,8 @@ class HComplexData(object):
         if not self.isHyperComplex(axis):
             return HComplexData(np.imag(self.data), np.copy(self.hyper))
         bit = 2**axis
-        select = np.array(self.hyper & bit, dtype=bool)
-        return HComplexData(self.data[select], self.hyper[select]-bit)
+        tmpHyper = hyperValues(self.hyperMask() & ~bit)
+        return HComplexData([self.getHyperData(idim + bit) for idim in tmpHyper], tmpHyper)
 
     def abs(self, axis=-1):
         """
@@ -488,15 +1023,15 @@ class HComplexData(object):
         tmpHyper = np.concatenate((self.hyper[np.logical_not(bArray)], self.hyper[bArray] - bit))
         tmpHyper = np.unique(tmpHyper)
         tmpHyper.sort()
-        tmpData = np.zeros((len(tmpHyper),) + self.data[0].shape, dtype=complex)
+        tmpData = np.zeros((len(tmpHyper),) + self.data[0].shape, dtype=self.data.dtype)
         for i, idim in enumerate(tmpHyper):
             if idim in self.hyper and (idim+bit) in self.hyper:
                 tmpData[i] += np.sqrt(np.real(self.data[idim == self.hyper][0])**2 + np.real(self.data[(idim+bit) == self.hyper][0])**2)
                 tmpData[i] += 1j * np.sqrt(np.imag(self.data[idim == self.hyper][0])**2 + np.imag(self.data[(idim+bit) == self.hyper][0])**2)
             elif idim in self.hyper:
-                tmpData[i] = self.data[idim == self.hyper]
+                tmpData[i] = np.abs(np.real(self.data[idim == self.hyper][0])) + 1j * np.abs(np.imag(self.data[idim == self.hyper][0]))
             elif idim + bit in self.hyper:
-                tmpData[i] = self.data[idim == self.hyper]
+                tmpData[i] = np.abs(np.real(self.data[(idim+bit) == self.hyper][0])) + 1j * np.abs(np.imag(self.data[(idim+bit) == self.hyper][0]))
         return HComplexData(tmpData, tmpHyper)
 
     def complexReorder(self, axis=0):
@@ -540,15 +1075,37 @@ class HComplexData(object):
             return self
         bit = 2**axis
         bArray = np.array(self.hyper & bit, dtype=bool)
-        tmpHyper = np.concatenate((self.hyper, self.hyper[bArray] - bit, self.hyper[np.logical_not(bArray)] + bit))
-        tmpHyper = np.unique(tmpHyper)
-        tmpHyper.sort()
-        tmpData = np.zeros((len(tmpHyper),) + self.data[0].shape, dtype=complex)
-        tmpBArray = np.array(self.hyper & bit, dtype=bool)
-        tmpData[np.logical_not(tmpBArray)] = np.real(self.data[np.logical_not(bArray)]) + 1j*np.real(self.data[bArray])
-        tmpData[tmpBArray] = np.imag(self.data[np.logical_not(bArray)]) + 1j*np.imag(self.data[bArray])
-        self.data = tmpData
-        self.hyper = tmpHyper
+        realIndex = np.flatnonzero(np.logical_not(bArray))
+        imagIndex = np.flatnonzero(bArray)
+        if np.array_equal(self.hyper[realIndex] + bit, self.hyper[imagIndex]):
+            # Every matrix has its partner along axis, so the planes are swapped without new arrays
+            for i, j in zip(realIndex, imagIndex):
+                tmpPlane = np.copy(self.data[i].imag)
+                self.data[i].imag = self.data[j].real
+                self.data[j].real = tmpPlane
+            return self
+        # Matrices without a partner are paired with zeros, only the matrices that become nonzero are stored
+        realHyper = np.unique(self.hyper & ~bit)
+        tmpHyper = []
+        tmpData = []
+        for idim in realHyper:
+            realPart = self.getHyperData(idim)
+            imagPart = self.getHyperData(idim + bit)
+            first = realPart.real + 1j * imagPart.real
+            second = realPart.imag + 1j * imagPart.imag
+            if idim == 0 or np.any(first):
+                tmpHyper.append(idim)
+                tmpData.append(first)
+            if np.any(second):
+                tmpHyper.append(idim + bit)
+                tmpData.append(second)
+        if not np.any(np.array(tmpHyper) & bit):
+            # Keep the dimension hypercomplex
+            tmpHyper.append(realHyper[0] + bit)
+            tmpData.append(np.zeros_like(tmpData[0]))
+        order = np.argsort(tmpHyper)
+        self.data = np.array(tmpData)[order]
+        self.hyper = np.array(tmpHyper)[order]
         return self
 
     def moveaxis(self, axis1, axis2):
@@ -985,12 +1542,12 @@ class HComplexData(object):
         # ifft, zeros in time domain and fft required for nmr spectra
         # this results in conjugated spectrum
         tmpData = np.conjugate(scipy.signal.hilbert(np.real(self.data), axis=axis))
-        return HComplexData(tmpData, np.copy(self.hyper))
+        return HComplexData(tmpData, np.copy(self.hyper), self.data.dtype)
 
-    def regrid(self, newX, oldX, axis=-1):
+    def regrid(self, newX, oldX, axis=-1, method='linear'):
         """
         Regrid the data from specified x-values to new x-values.
-        The interpolation is done using the interp1d function from scipy.interpolate.
+        The interpolation is done using regridData.
 
         Parameters
         ----------
@@ -1001,17 +1558,19 @@ class HComplexData(object):
         axis : int, optional
             The axis along which the interpolation is applied.
             Defaults to the last dimension.
+        method : str, optional
+            The interpolation method, one of REGRIDMETHODS.
+            Defaults to 'linear'.
 
         Returns
         -------
         HComplexData
             A copy of the data which has been regrid.
         """
-        from scipy import interpolate as intp
         if axis >= 0:
             axis += 1
-        tmpData = np.apply_along_axis(lambda data, newX, oldX: intp.interp1d(oldX, data, fill_value=0, bounds_error=False)(newX), axis, self.data, newX, oldX)
-        return HComplexData(tmpData, np.copy(self.hyper))
+        tmpData = regridData(self.data, newX, oldX, axis, method)
+        return HComplexData(tmpData, np.copy(self.hyper), self.data.dtype)
 
     def resize(self, size, pos, axis=-1):
         """
@@ -1036,28 +1595,7 @@ class HComplexData(object):
         """
         if axis >= 0:
             axis += 1
-        oldSize = self.data.shape[axis]
-        if size > oldSize:
-            slicing1 = (slice(None), ) * axis + (slice(None, pos), )
-            slicing2 = (slice(None), ) * axis + (slice(pos, None), )
-            zeroShape = np.array(self.data.shape)
-            zeroShape[axis] = size - oldSize
-            tmpData = np.concatenate((self.data[slicing1], np.zeros(zeroShape), self.data[slicing2]), axis=axis)
-        else:
-            difference = oldSize - size
-            removeBegin = int(np.floor(difference / 2))
-            removeEnd = difference - removeBegin
-            if pos < removeBegin:
-                slicing = (slice(None), ) * axis + (slice(difference, None), )
-                tmpData = self.data[slicing]
-            elif oldSize - pos < removeEnd:
-                slicing = (slice(None), ) * axis + (slice(None, size), )
-                tmpData = self.data[slicing]
-            else:
-                slicing1 = (slice(None), ) * axis + (slice(None, pos - removeBegin), )
-                slicing2 = (slice(None), ) * axis + (slice(pos + removeEnd, None), )
-                tmpData = np.append(self.data[slicing1], self.data[slicing2], axis=axis)
-        return HComplexData(tmpData, np.copy(self.hyper))
+        return HComplexData(resizeData(self.data, size, pos, axis), np.copy(self.hyper))
 
     def reorder(self, pos, newLength=None, axis=-1):
         """
@@ -1088,9 +1626,8 @@ class HComplexData(object):
             raise HComplexException("Positions out of bounds in reorder")
         newShape = np.array(self.data.shape)
         newShape[axis] = newLength
-        tmpData = np.zeros(newShape, dtype=complex)
         slicing = (slice(None), ) * axis + (pos, )
-        tmpData = np.zeros(newShape, dtype=complex)
+        tmpData = np.zeros(newShape, dtype=self.data.dtype)
         tmpData[slicing] = self.data
         return HComplexData(tmpData, np.copy(self.hyper))
 
@@ -1114,7 +1651,7 @@ class HComplexData(object):
         if axis >= 0:
             axis += 1
         tmpData = np.apply_along_axis(func, axis, self.data, *args, **kwargs)
-        return HComplexData(tmpData, np.copy(self.hyper))
+        return HComplexData(tmpData, np.copy(self.hyper), self.data.dtype)
 
     def roll(self, shift, axis=-1):
         """
@@ -1122,8 +1659,9 @@ class HComplexData(object):
 
         Parameters
         ----------
-        shift : int
+        shift : int or array_like of ints
             Number of places to roll the data.
+            An array gives the shift of every trace and should broadcast to the shape of the data without axis (see rollData).
         axis : int, optional
             The axis along which the data is rolled.
             Defaults to the last dimension.
@@ -1135,9 +1673,11 @@ class HComplexData(object):
         """
         if axis >= 0:
             axis += 1
-        return HComplexData(np.roll(self.data, shift, axis=axis), np.copy(self.hyper))
+        if np.ndim(shift) == 0:
+            return HComplexData(np.roll(self.data, shift, axis=axis), np.copy(self.hyper), self.data.dtype)
+        return HComplexData(rollData(self.data, np.asarray(shift)[np.newaxis], axis), np.copy(self.hyper), self.data.dtype)
 
-    def fft(self, axis=-1):
+    def fft(self, axis=-1, shift=False, inplace=False):
         """
         Performs a Fast Fourier Transform on the data along a given axis.
 
@@ -1146,17 +1686,26 @@ class HComplexData(object):
         axis : int, optional
             The axis over which the Fourier transform is performed.
             Defaults to the last dimension.
+        shift : bool, optional
+            If True, the result is fftshifted in the same step.
+            False by default.
+        inplace : bool, optional
+            If True, the data is transformed in its own memory and self is returned.
+            False by default.
 
         Returns
         -------
         HComplexData
-            A copy of the data which has been Fourier transformed.
+            The data which has been Fourier transformed.
         """
         if axis >= 0:
             axis += 1
-        return HComplexData(np.fft.fft(self.data, axis=axis), np.copy(self.hyper))
+        if inplace:
+            self.data = fft(self.data, axis, shift, overwrite=True)
+            return self
+        return HComplexData(fft(self.data, axis, shift), np.copy(self.hyper))
 
-    def ifft(self, axis=-1):
+    def ifft(self, axis=-1, shift=False, inplace=False):
         """
         Performs a inverse Fast Fourier Transform on the data along a given axis.
 
@@ -1165,15 +1714,24 @@ class HComplexData(object):
         axis : int, optional
             The axis over which the inverse Fourier transform is performed.
             Defaults to the last dimension.
+        shift : bool, optional
+            If True, the data is ifftshifted in the same step.
+            False by default.
+        inplace : bool, optional
+            If True, the data is transformed in its own memory and self is returned.
+            False by default.
 
         Returns
         -------
         HComplexData
-            A copy of the data which has been inverse Fourier transformed.
+            The data which has been inverse Fourier transformed.
         """
         if axis >= 0:
             axis += 1
-        return HComplexData(np.fft.ifft(self.data, axis=axis), np.copy(self.hyper))
+        if inplace:
+            self.data = ifft(self.data, axis, shift, overwrite=True)
+            return self
+        return HComplexData(ifft(self.data, axis, shift), np.copy(self.hyper))
 
     def fftshift(self, axis=-1):
         """
@@ -20,6 +20,7 @@
 import numpy as np
 import scipy.optimize
 import scipy.signal
+import hypercomplex as hc
 
 
 def ent_ffm(missingPoints, fid, posArray):
@@ -40,8 +41,8 @@ def ent_ffm(missingPoints, fid, posArray):
 
     """
     fid[posArray] = missingPoints[:len(posArray)] + 1j * missingPoints[len(posArray):]
-    spec = np.fft.fft(fid)
-    zn = np.fft.fft((np.imag(spec) + 1j * np.real(spec)) / np.abs(spec))
+    spec = hc.fft(fid)
+    zn = hc.fft((np.imag(spec) + 1j * np.real(spec)) / np.abs(spec), overwrite=True)
     return (np.sum(np.abs(spec)), np.append(np.imag(zn[posArray]), np.real(zn[posArray])))
 
 
@@ -67,7 +68,7 @@ def ffm(inp):
                                   args=inp,
                                   jac=True)
     inp[0][inp[1]] = res['x'][:l] + 1j * res['x'][l:]
-    return np.fft.fftshift(np.fft.fft(inp[0]))
+    return hc.fft(inp[0], shift=True)
 
 
 def clean(inp):
@@ -135,7 +136,7 @@ def ist(inp):  # Iterative soft thresholding
     result = np.zeros_like(data, dtype=complex)
     data[0] = data[0] * 0.5
     for itt in range(ittnum):
-        spectrum = np.real(np.fft.fft(data, axis=0))
+        spectrum = np.real(hc.fft(data, 0))
         signmatrix = np.sign(spectrum)
         height = np.max(np.abs(spectrum))
         if height < NDmax * tracelimit:  # exit loop if lower limit is reached
@@ -146,7 +147,7 @@ def ist(inp):  # Iterative soft thresholding
         result += tmpspectrum
         spectrum -= tmpspectrum
         spectrum = np.conj(scipy.signal.hilbert(spectrum, axis=0))
-        data = np.fft.ifft(spectrum, axis=0)
+        data = hc.ifft(spectrum, 0, overwrite=True)
         data[posList] = 0
     result = np.real(result + spectrum)
     result = np.fft.fftshift(result, axes=0)
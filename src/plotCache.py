@@ -0,0 +1,956 @@
+#!/usr/bin/env python3
+
+# Copyright 2016 - 2024 Bas van Meerten and Wouter Franssen
+
+# This file is part of ssNake.
+#
+# ssNake is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ssNake is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ssNake. If not, see <http://www.gnu.org/licenses/>.
+
+# Display caches of the plots.
+# The data shown in a plot is reduced to the resolution of the canvas,
+# and the results are cached with the data version of the spectrum as part of the key.
+
+import collections
+import concurrent.futures
+import threading
+import numpy as np
+from matplotlib.lines import Line2D
+from matplotlib.collections import LineCollection
+try:
+    import contourpy
+except ImportError:  # contourpy is included with matplotlib >= 3.6
+    contourpy = None
+
+CONTOURTILESIZE = 256           # Points per side of a contour tile
+CONTOURPOINTSPERPIXEL = 1.0     # Minimum number of data points per canvas pixel of a pyramid level
+CONTOURSYNCPOINTS = 2**20       # Maximum number of points that is contoured before drawing, larger views are computed in the background
+CONTOURCACHETILES = 4096        # Number of contour tiles kept in the cache
+PYRAMIDCACHESIZE = 4            # Number of data pyramids kept in the cache
+BACKGROUNDINTERVAL = 100        # Interval in ms at which the background computation is checked
+LINEMINPOINTS = 8192            # Lines with fewer points are never decimated
+LINEPOINTSPERPIXEL = 1.0        # Number of min/max pairs per canvas pixel of a decimated line
+LINEMARGIN = 1.0                # Part of the view width that is decimated on both sides, so that panning does not require a new decimation
+SUMMARYCACHESIZE = 64           # Number of data summaries (extrema, projections, noise levels) kept in the cache
+PROJECTIONS = {'sum': np.sum, 'max': np.max, 'min': np.min}
+
+
+def poolData(data, factor, axis, func):
+    """
+    Reduces the data along an axis by combining blocks of points.
+
+    Parameters
+    ----------
+    data : ndarray
+        The data.
+    factor : int
+        The number of points per block, the last block can be smaller.
+    axis : int
+        The axis along which to reduce.
+    func : ufunc
+        The ufunc which combines the points, for example np.maximum or np.add.
+
+    Returns
+    -------
+    ndarray
+        The reduced data.
+    """
+    if factor == 1:
+        return data
+    data = np.moveaxis(data, axis, 0)
+    numBlocks = data.shape[0] // factor
+    # Combining the points of the whole blocks one by one is much faster than reduceat or reducing along a short axis
+    blocks = data[:numBlocks * factor].reshape((numBlocks, factor) + data.shape[1:])
+    result = np.copy(blocks[:, 0])
+    for i in range(1, factor):
+        func(result, blocks[:, i], out=result)
+    if data.shape[0] > numBlocks * factor:
+        result = np.concatenate((result, func.reduce(data[numBlocks * factor:], axis=0, keepdims=True)))
+    return np.moveaxis(result, 0, axis)
+
+
+def poolMean(data, factor, axis):
+    """
+    Reduces the data along an axis to the mean of blocks of points.
+
+    Parameters
+    ----------
+    data : ndarray
+        The data.
+    factor : int
+        The number of points per block, the last block can be smaller.
+    axis : int
+        The axis along which to reduce.
+
+    Returns
+    -------
+    ndarray
+        The reduced data.
+    """
+    if factor == 1:
+        return data
+    length = data.shape[axis]
+    counts = np.diff(np.append(np.arange(0, length, factor), length))
+    counts = counts.reshape((-1, ) + (1, ) * (data.ndim - axis % data.ndim - 1))
+    return poolData(data, factor, axis, np.add) / counts
+
+
+def poolAxis(axis, factor):
+    """
+    Returns the positions of the blocks of poolData, as the mean position of the points in a block.
+
+    Parameters
+    ----------
+    axis : ndarray
+        The positions of the points.
+    factor : int
+        The number of points per block.
+
+    Returns
+    -------
+    ndarray
+        The position of every block.
+    """
+    return poolMean(axis, factor, 0)
+
+
+def levelFactor(numPoints, pixels):
+    """
+    Returns the reduction factor of an axis for a number of canvas pixels.
+    This is the largest power of two that keeps at least CONTOURPOINTSPERPIXEL points per pixel.
+
+    Parameters
+    ----------
+    numPoints : int
+        The number of data points in view.
+    pixels : float
+        The number of canvas pixels of the view.
+
+    Returns
+    -------
+    int
+        The reduction factor.
+    """
+    ratio = numPoints / max(pixels * CONTOURPOINTSPERPIXEL, 1.0)
+    if ratio < 2:
+        return 1
+    return 2**int(np.floor(np.log2(ratio)))
+
+
+def viewRange(axis, limits):
+    """
+    Returns the index range of the points of an axis that are in view, including one point outside on both sides.
+
+    Parameters
+    ----------
+    axis : ndarray
+        The positions of the points.
+    limits : tuple
+        The limits of the view, in any order.
+
+    Returns
+    -------
+    int
+        The first index.
+    int
+        The index after the last point.
+    """
+    index = np.nonzero((axis >= min(limits)) & (axis <= max(limits)))[0]
+    if index.size == 0:
+        return 0, 0
+    return max(index[0] - 1, 0), min(index[-1] + 2, len(axis))
+
+
+def minMaxDecimate(x, y, factor):
+    """
+    Reduces a line to the minimum and the maximum of every block of points.
+    The two points of a block are kept in their original order, so the envelope of the line is drawn exactly.
+    Several lines of the same length can be decimated at once, along the last axis.
+
+    Parameters
+    ----------
+    x : ndarray
+        The x positions, with the same shape as y.
+    y : ndarray
+        The y values.
+    factor : int
+        The number of points per block.
+
+    Returns
+    -------
+    ndarray
+        The x positions of the decimated line.
+    ndarray
+        The y values of the decimated line.
+    """
+    length = y.shape[-1]
+    numBlocks = length // factor
+    if factor < 3 or numBlocks == 0:
+        return x, y
+    blocks = y[..., :numBlocks * factor].reshape(y.shape[:-1] + (numBlocks, factor))
+    first = np.argmin(blocks, axis=-1)
+    second = np.argmax(blocks, axis=-1)
+    index = np.sort(np.stack((first, second), axis=-1), axis=-1) + factor * np.arange(numBlocks)[:, np.newaxis]
+    index = index.reshape(y.shape[:-1] + (2 * numBlocks, ))
+    index = np.concatenate((index, np.broadcast_to(np.arange(numBlocks * factor, length), y.shape[:-1] + (length - numBlocks * factor, ))), axis=-1)
+    return np.take_along_axis(x, index, -1), np.take_along_axis(y, index, -1)
+
+
+class DecimatedLine(Line2D):
+    """
+    A line that draws a min/max decimation of its data, sized to the pixel width of the axes (see minMaxDecimate).
+    The decimation is made lazily when drawing, and only when the zoom or the visible range has changed.
+    The full data is kept in fullX and fullY.
+    """
+
+    def __init__(self, x, y, **kwargs):
+        """
+        Initializes the line.
+
+        Parameters
+        ----------
+        x : ndarray
+            The x positions.
+        y : ndarray
+            The y values.
+        **kwargs
+            The properties of the Line2D.
+        """
+        self.fullX = np.asarray(x)
+        self.fullY = np.asarray(y)
+        self.decimation = None  # The factor and index range of the data that is set
+        self.fullResolution = False
+        # Start with a coarse decimation, so adding the line to the axes does not process all points
+        factor = 1
+        if len(self.fullY) >= LINEMINPOINTS:
+            factor = 2**int(np.log2(len(self.fullY) / LINEMINPOINTS) + 1)
+        super(DecimatedLine, self).__init__(*minMaxDecimate(self.fullX, self.fullY, factor), **kwargs)
+
+    def setFullData(self, x, y):
+        """
+        Replaces the data of the line.
+        The decimation is made when the line is drawn.
+
+        Parameters
+        ----------
+        x : ndarray
+            The x positions.
+        y : ndarray
+            The y values.
+        """
+        self.fullX = np.asarray(x)
+        self.fullY = np.asarray(y)
+        self.decimation = None
+        self.stale = True
+
+    def setFullResolution(self, full):
+        """
+        Draws the full data (for example for saving a figure) or the decimation.
+
+        Parameters
+        ----------
+        full : bool
+            True for the full data.
+        """
+        self.fullResolution = full
+        self.stale = True
+
+    def updateDecimation(self):
+        """
+        Sets the decimation of the data for the current view, if it changed.
+        """
+        length = len(self.fullY)
+        if self.fullResolution or length < LINEMINPOINTS or self.axes is None:
+            decimation = (1, 0, length)
+        else:
+            start, stop = viewRange(self.fullX, self.axes.get_xlim())
+            ratio = (stop - start) / max(self.axes.get_window_extent().width * LINEPOINTSPERPIXEL, 1.0)
+            factor = 1 if ratio < 2 else 2**int(np.log2(ratio))
+            if self.decimation is not None and self.decimation[0] == factor and self.decimation[1] <= start and stop <= self.decimation[2]:
+                return
+            margin = int(LINEMARGIN * (stop - start))
+            start = (max(start - margin, 0) // factor) * factor  # Blocks start at a multiple of the factor, so panning gives the same blocks
+            stop = min(stop + margin, length)
+            decimation = (factor, start, stop)
+        if decimation == self.decimation:
+            return
+        self.decimation = decimation
+        factor, start, stop = decimation
+        self.set_data(*minMaxDecimate(self.fullX[start:stop], self.fullY[start:stop], factor))
+
+    def draw(self, renderer):
+        self.updateDecimation()
+        super(DecimatedLine, self).draw(renderer)
+
+
+def setLineData(line, x, y):
+    """
+    Replaces the data of a Line2D, which can be a DecimatedLine.
+
+    Parameters
+    ----------
+    line : Line2D
+        The line.
+    x : ndarray
+        The x positions.
+    y : ndarray
+        The y values.
+    """
+    if isinstance(line, DecimatedLine):
+        line.setFullData(x, y)
+    else:
+        line.set_data(x, y)
+
+
+class DecimatedLineCollection(LineCollection):
+    """
+    A LineCollection of traces with the same number of points, which draws a min/max decimation of every trace (see minMaxDecimate).
+    The decimation is sized to the pixel width of the axes, and is made lazily when drawing.
+    Segment i of the collection is always trace i, also for hidden traces (see splitTrace).
+    """
+
+    def __init__(self, x, y, **kwargs):
+        """
+        Initializes the collection.
+
+        Parameters
+        ----------
+        x : ndarray
+            The x positions, shared by all traces (1-D) or per trace (2-D).
+        y : ndarray
+            The y values of the traces (2-D).
+        **kwargs
+            The properties of the LineCollection.
+        """
+        self.fullResolution = False
+        self.sharedX = np.ndim(x) == 1
+        self.fullX, self.fullY = np.broadcast_arrays(x, y)
+        self.hidden = np.zeros(len(self.fullY), dtype=bool)
+        self.decimation = None  # The factor and index range of the data that is set
+        super(DecimatedLineCollection, self).__init__(self.decimatedSegments(self.initialFactor(), 0, self.fullY.shape[-1]), **kwargs)
+
+    def setFullData(self, x, y):
+        """
+        Replaces the data of the traces.
+        The decimation is made when the collection is drawn.
+
+        Parameters
+        ----------
+        x : ndarray
+            The x positions, shared by all traces (1-D) or per trace (2-D).
+        y : ndarray
+            The y values of the traces (2-D).
+        """
+        self.sharedX = np.ndim(x) == 1
+        self.fullX, self.fullY = np.broadcast_arrays(x, y)
+        if len(self.hidden) != len(self.fullY):
+            self.hidden = np.zeros(len(self.fullY), dtype=bool)
+        self.decimation = None
+        self.stale = True
+
+    def setFullResolution(self, full):
+        """
+        Draws the full data (for example for saving a figure) or the decimation.
+
+        Parameters
+        ----------
+        full : bool
+            True for the full data.
+        """
+        self.fullResolution = full
+        self.stale = True
+
+    def initialFactor(self):
+        """
+        Returns a coarse decimation factor, so adding the collection to the axes does not process all points.
+        """
+        if self.fullY.shape[-1] < LINEMINPOINTS:
+            return 1
+        return 2**int(np.log2(self.fullY.shape[-1] / LINEMINPOINTS) + 1)
+
+    def decimatedSegments(self, factor, start, stop):
+        """
+        Returns the segments of the decimated traces.
+
+        Parameters
+        ----------
+        factor : int
+            The number of points per block.
+        start : int
+            The first index of the points.
+        stop : int
+            The index after the last point.
+
+        Returns
+        -------
+        ndarray or list
+            The segments, with an empty segment for each hidden trace.
+        """
+        x, y = minMaxDecimate(self.fullX[:, start:stop], self.fullY[:, start:stop], factor)
+        segments = np.stack((x, y), axis=-1)
+        if not np.any(self.hidden):
+            return segments
+        return [np.zeros((0, 2)) if hide else segment for hide, segment in zip(self.hidden, segments)]
+
+    def updateDecimation(self):
+        """
+        Sets the decimation of the traces for the current view, if it changed.
+        The number of points per pixel is based on the first trace, as all traces have the same number of points.
+        """
+        length = self.fullY.shape[-1]
+        if self.fullResolution or self.fullY.size < LINEMINPOINTS or self.axes is None or length < 2:
+            decimation = (1, 0, length)
+        else:
+            limits = self.axes.get_xlim()
+            span = abs(self.fullX[0, -1] - self.fullX[0, 0])
+            ratio = length * abs(limits[1] - limits[0]) / max(span * self.axes.get_window_extent().width * LINEPOINTSPERPIXEL, 1e-300)
+            factor = 1 if ratio < 2 else 2**int(np.log2(ratio))
+            start, stop = 0, length
+            if self.sharedX:  # Only the points in view are drawn
+                start, stop = viewRange(self.fullX[0], limits)
+                if self.decimation is not None and self.decimation[0] == factor and self.decimation[1] <= start and stop <= self.decimation[2]:
+                    return
+                margin = int(LINEMARGIN * (stop - start))
+                start = (max(start - margin, 0) // factor) * factor
+                stop = min(stop + margin, length)
+            decimation = (factor, start, stop)
+        if decimation == self.decimation:
+            return
+        self.decimation = decimation
+        self.set_segments(self.decimatedSegments(*decimation))
+
+    def splitTrace(self, index):
+        """
+        Moves a trace to a separate line in the same axes, for example to edit its style on its own.
+        The trace is hidden in the collection.
+
+        Parameters
+        ----------
+        index : int
+            The index of the trace.
+
+        Returns
+        -------
+        DecimatedLine
+            The line of the trace.
+        """
+        colors = self.get_colors()
+        linewidths = self.get_linewidths()
+        dashes = self.get_linestyles()[index % len(self.get_linestyles())]
+        line = DecimatedLine(self.fullX[index], self.fullY[index], color=colors[index % len(colors)], linewidth=linewidths[index % len(linewidths)],
+                             linestyle='-' if dashes[1] is None else dashes, label=self.get_label(), picker=True)
+        self.axes.add_line(line)
+        self.hidden[index] = True
+        self.decimation = None
+        self.stale = True
+        return line
+
+    def draw(self, renderer):
+        self.updateDecimation()
+        super(DecimatedLineCollection, self).draw(renderer)
+
+
+class DataPyramid(object):
+    """
+    A resolution pyramid of a 2D plane.
+    Every level is reduced by a power of two along each axis (which can be different per axis).
+    The levels keep the maximum and the minimum of every block, so peaks do not disappear at low resolution.
+    For images, levels with the mean of every block are kept separately.
+    The levels are made when they are first used.
+    """
+
+    def __init__(self, x, y, z):
+        """
+        Initializes the pyramid.
+
+        Parameters
+        ----------
+        x : ndarray
+            The x-axis (last dimension of z).
+        y : ndarray
+            The y-axis (first dimension of z).
+        z : ndarray
+            The 2D data.
+        """
+        self.x = np.asarray(x)
+        self.y = np.asarray(y)
+        self.z = np.asarray(z)
+        self.levels = {(1, 1): (self.x, self.y, self.z, self.z)}
+        self.means = {(1, 1): self.z}
+        self.zAbsMax = None
+        self.lock = threading.Lock()
+
+    def level(self, factor):
+        """
+        Returns a level of the pyramid.
+
+        Parameters
+        ----------
+        factor : tuple of int
+            The reduction factor along y and x.
+
+        Returns
+        -------
+        tuple
+            The x-axis, y-axis, the maxima, and the minima of the level.
+        """
+        with self.lock:
+            if factor not in self.levels:
+                # Start from the smallest level that has been made and can be reduced to this level
+                base = min((key for key in self.levels if factor[0] % key[0] == 0 and factor[1] % key[1] == 0), key=lambda key: self.levels[key][2].size)
+                _, _, zMax, zMin = self.levels[base]
+                step = (factor[0] // base[0], factor[1] // base[1])
+                zMax = poolData(poolData(zMax, step[0], 0, np.maximum), step[1], 1, np.maximum)
+                zMin = poolData(poolData(zMin, step[0], 0, np.minimum), step[1], 1, np.minimum)
+                self.levels[factor] = (poolAxis(self.x, factor[1]), poolAxis(self.y, factor[0]), zMax, zMin)
+            return self.levels[factor]
+
+    def meanLevel(self, factor):
+        """
+        Returns the mean of the blocks of a level of the pyramid.
+
+        Parameters
+        ----------
+        factor : tuple of int
+            The reduction factor along y and x.
+
+        Returns
+        -------
+        ndarray
+            The mean of every block.
+        """
+        with self.lock:
+            if factor not in self.means:
+                base = min((key for key in self.means if factor[0] % key[0] == 0 and factor[1] % key[1] == 0), key=lambda key: self.means[key].size)
+                step = (factor[0] // base[0], factor[1] // base[1])
+                self.means[factor] = poolMean(poolMean(self.means[base], step[0], 0), step[1], 1)
+            return self.means[factor]
+
+    def absMax(self):
+        """
+        Returns the maximum of the absolute value of the data.
+        """
+        if self.zAbsMax is None:
+            self.zAbsMax = np.max(np.abs(self.z))
+        return self.zAbsMax
+
+    def image(self, factor, tiles):
+        """
+        Returns the mean level of the pyramid for a set of tiles, to draw as an image.
+        The full data is drawn as an image that spans from the first to the last point of the axes, with equal pixels.
+
+        Parameters
+        ----------
+        factor : tuple of int
+            The reduction factor along y and x.
+        tiles : list of tuples
+            The (row, column) index of the tiles.
+
+        Returns
+        -------
+        ndarray
+            The image of the rectangle that contains the tiles, with the first row at the bottom.
+        list
+            The extent of the image (left, right, bottom, top).
+        """
+        z = self.meanLevel(factor)
+        rows = [tile[0] for tile in tiles]
+        columns = [tile[1] for tile in tiles]
+        row0, row1 = min(rows) * CONTOURTILESIZE, min((max(rows) + 1) * CONTOURTILESIZE, z.shape[0])
+        column0, column1 = min(columns) * CONTOURTILESIZE, min((max(columns) + 1) * CONTOURTILESIZE, z.shape[1])
+        xStep = (self.x[-1] - self.x[0]) / len(self.x)
+        yStep = (self.y[-1] - self.y[0]) / len(self.y)
+        extent = [self.x[0] + column0 * factor[1] * xStep, self.x[0] + min(column1 * factor[1], len(self.x)) * xStep,
+                  self.y[0] + row0 * factor[0] * yStep, self.y[0] + min(row1 * factor[0], len(self.y)) * yStep]
+        return z[row0:row1, column0:column1], extent
+
+    def maxFactor(self):
+        """
+        Returns the factor of the coarsest useful level, which still has two points along both axes.
+        """
+        return (max(2**int(np.log2(max(len(self.y) // 2, 1))), 1), max(2**int(np.log2(max(len(self.x) // 2, 1))), 1))
+
+    def plan(self, xLimits, yLimits, pixels, maxPoints=None):
+        """
+        Determines the level and the tiles needed to draw a view.
+
+        Parameters
+        ----------
+        xLimits : tuple
+            The x limits of the view.
+        yLimits : tuple
+            The y limits of the view.
+        pixels : tuple
+            The width and height of the view in canvas pixels.
+        maxPoints : int, optional
+            When given, the level is reduced further until the view has at most this number of points.
+
+        Returns
+        -------
+        tuple of int
+            The reduction factor along y and x.
+        list of tuples
+            The (row, column) index of the tiles.
+        """
+        x0, x1 = viewRange(self.x, xLimits)
+        y0, y1 = viewRange(self.y, yLimits)
+        maxFactor = self.maxFactor()
+        factor = [min(levelFactor(y1 - y0, pixels[1]), maxFactor[0]), min(levelFactor(x1 - x0, pixels[0]), maxFactor[1])]
+        if maxPoints is not None:
+            while ((y1 - y0) // factor[0]) * ((x1 - x0) // factor[1]) > maxPoints and tuple(factor) != maxFactor:
+                if factor[0] < maxFactor[0] and (factor[0] <= factor[1] or factor[1] == maxFactor[1]):
+                    factor[0] *= 2
+                else:
+                    factor[1] *= 2
+        factor = tuple(factor)
+        rows = range((y0 // factor[0]) // CONTOURTILESIZE, max((y1 - 1) // factor[0], 0) // CONTOURTILESIZE + 1)
+        columns = range((x0 // factor[1]) // CONTOURTILESIZE, max((x1 - 1) // factor[1], 0) // CONTOURTILESIZE + 1)
+        return factor, [(row, column) for row in rows for column in columns]
+
+    def planPoints(self, factor, tiles):
+        """
+        Returns the number of points of a level that are contoured for a set of tiles.
+        """
+        shape = self.levels[factor][2].shape if factor in self.levels else (-(-len(self.y) // factor[0]), -(-len(self.x) // factor[1]))
+        return sum(min(CONTOURTILESIZE, shape[0] - row * CONTOURTILESIZE) * min(CONTOURTILESIZE, shape[1] - column * CONTOURTILESIZE) for row, column in tiles)
+
+    def contourTile(self, factor, tile, levels, signs):
+        """
+        Calculates the contour lines of a single tile.
+        Neighbouring tiles share one row or column, so that the lines connect.
+
+        Parameters
+        ----------
+        factor : tuple of int
+            The reduction factor of the level.
+        tile : tuple of int
+            The (row, column) index of the tile.
+        levels : ndarray
+            The positive contour levels, in increasing order.
+        signs : tuple of bool
+            Whether the positive and the negative contours are calculated.
+
+        Returns
+        -------
+        list of ndarrays
+            The lines, as (n, 2) arrays with the x and y positions.
+        ndarray
+            The contour level of every line.
+        """
+        x, y, zMax, zMin = self.level(factor)
+        rows = slice(tile[0] * CONTOURTILESIZE, (tile[0] + 1) * CONTOURTILESIZE + 1)
+        columns = slice(tile[1] * CONTOURTILESIZE, (tile[1] + 1) * CONTOURTILESIZE + 1)
+        lines = []
+        lineLevels = []
+        if len(x[columns]) < 2 or len(y[rows]) < 2:
+            return lines, np.array(lineLevels)
+        for z, sign, tileLevels in ((zMax, signs[0], levels), (zMin, signs[1], -levels[::-1])):
+            if not sign:
+                continue
+            zTile = z[rows, columns]
+            low = np.nanmin(zTile)
+            high = np.nanmax(zTile)
+            generator = None
+            for level in tileLevels:
+                if not low <= level <= high:  # A tile without this level has no lines
+                    continue
+                if generator is None:
+                    generator = contourpy.contour_generator(x[columns], y[rows], zTile, line_type='Separate')
+                levelLines = generator.lines(level)
+                lines += levelLines
+                lineLevels += [level] * len(levelLines)
+        return lines, np.array(lineLevels)
+
+
+class ContourCache(object):
+    """
+    Cache of the contour lines of data pyramids.
+    The lines are stored per (data key, level, contour levels, tile), so redrawing the same view, another zoom, or other colours reuses them.
+    Tiles that are not cached can be calculated in a background thread.
+    """
+
+    def __init__(self):
+        self.pyramids = collections.OrderedDict()
+        self.tiles = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.executor = None
+        self.futures = []
+
+    def pyramid(self, key, x, y, z):
+        """
+        Returns the pyramid of a 2D plane.
+
+        Parameters
+        ----------
+        key : hashable or None
+            The key of the data, which should change whenever the data changes.
+            When None the pyramid is not cached.
+        x : ndarray
+            The x-axis.
+        y : ndarray
+            The y-axis.
+        z : ndarray
+            The 2D data.
+
+        Returns
+        -------
+        DataPyramid
+            The pyramid.
+        """
+        if key is None:
+            return DataPyramid(x, y, z)
+        if key in self.pyramids:
+            pyramid = self.pyramids.pop(key)
+            # The axes can change (e.g. other units) without a change of the data
+            if len(pyramid.x) == len(x) and len(pyramid.y) == len(y) and np.array_equal(pyramid.x, x) and np.array_equal(pyramid.y, y):
+                self.pyramids[key] = pyramid
+                return pyramid
+            self.clearKey(key)
+        pyramid = DataPyramid(x, y, z)
+        self.pyramids[key] = pyramid
+        while len(self.pyramids) > PYRAMIDCACHESIZE:
+            self.clearKey(next(iter(self.pyramids)))
+        return pyramid
+
+    def clearKey(self, key):
+        """
+        Removes a pyramid and its contour lines from the cache.
+        """
+        self.pyramids.pop(key, None)
+        with self.lock:
+            for tileKey in [tileKey for tileKey in self.tiles if tileKey[0] == key]:
+                del self.tiles[tileKey]
+
+    def tileKey(self, key, factor, tile, levels, signs):
+        return (key, factor, tile, levels.tobytes(), signs)
+
+    def missing(self, key, factor, tiles, levels, signs):
+        """
+        Returns the tiles that are not in the cache.
+        """
+        if key is None:
+            return list(tiles)
+        with self.lock:
+            return [tile for tile in tiles if self.tileKey(key, factor, tile, levels, signs) not in self.tiles]
+
+    def lines(self, key, pyramid, factor, tiles, levels, signs):
+        """
+        Returns the contour lines of a set of tiles, calculating the tiles that are not cached.
+
+        Parameters
+        ----------
+        key : hashable or None
+            The key of the pyramid, None if the lines should not be cached.
+        pyramid : DataPyramid
+            The pyramid.
+        factor : tuple of int
+            The reduction factor of the level.
+        tiles : list of tuples
+            The tiles.
+        levels : ndarray
+            The positive contour levels.
+        signs : tuple of bool
+            Whether the positive and the negative contours are included.
+
+        Returns
+        -------
+        list of ndarrays
+            The lines.
+        ndarray
+            The contour level of every line.
+        """
+        lines = []
+        lineLevels = []
+        for tile in tiles:
+            tileKey = self.tileKey(key, factor, tile, levels, signs)
+            with self.lock:
+                result = self.tiles.get(tileKey) if key is not None else None
+                if result is not None:
+                    self.tiles.move_to_end(tileKey)
+            if result is None:
+                result = pyramid.contourTile(factor, tile, levels, signs)
+                if key is not None:
+                    with self.lock:
+                        self.tiles[tileKey] = result
+                        while len(self.tiles) > CONTOURCACHETILES:
+                            self.tiles.popitem(last=False)
+            lines += result[0]
+            lineLevels.append(result[1])
+        if not lineLevels:
+            return lines, np.array([])
+        return lines, np.concatenate(lineLevels)
+
+    def submit(self, key, pyramid, factor, tiles, levels, signs):
+        """
+        Calculates and caches the contour lines of a set of tiles in a background thread.
+
+        Returns
+        -------
+        Future
+            The job.
+        """
+        if self.executor is None:
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        future = self.executor.submit(self.lines, key, pyramid, factor, tiles, levels, signs)
+        self.futures.append(future)
+        return future
+
+    def busy(self):
+        """
+        Returns True when a background job is still running.
+        """
+        self.futures = [future for future in self.futures if not future.done()]
+        return bool(self.futures)
+
+    def cancel(self):
+        """
+        Cancels the background jobs that have not yet started.
+        """
+        for future in self.futures:
+            future.cancel()
+        self.futures = [future for future in self.futures if not future.done()]
+
+    def shutdown(self):
+        """
+        Stops the background thread.
+        """
+        self.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+
+def dataArray(data):
+    """
+    Returns the data of a summary, calling data when it is a function.
+    """
+    return data() if callable(data) else data
+
+
+class SummaryCache(object):
+    """
+    Cache of summaries of the data of spectra: the largest absolute value, the projections, and the noise level.
+    The summaries are stored per (data key, summary, arguments), where the data key contains the data version of the spectrum,
+    so redrawing or reslicing unchanged data does not scan the data again.
+    The cached results should not be changed.
+    """
+
+    def __init__(self):
+        self.items = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, func, *args):
+        """
+        Returns a cached summary, which is calculated when it is not in the cache.
+
+        Parameters
+        ----------
+        key : hashable or None
+            The key of the summary, which should change whenever the data changes.
+            When None the summary is not cached.
+        func : callable
+            The function which calculates the summary.
+        *args
+            The arguments of func.
+
+        Returns
+        -------
+        object
+            The summary.
+        """
+        if key is None:
+            return func(*args)
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                return self.items[key]
+        result = func(*args)
+        with self.lock:
+            self.items[key] = result
+            while len(self.items) > SUMMARYCACHESIZE:
+                self.items.popitem(last=False)
+        return result
+
+    def absMax(self, key, data):
+        """
+        Returns the largest absolute value of the data.
+
+        Parameters
+        ----------
+        key : hashable or None
+            The key of the data, None if the result should not be cached.
+        data : ndarray or callable
+            The data, or a function that returns the data, which is only called when the result is not cached.
+
+        Returns
+        -------
+        float
+            The largest absolute value.
+        """
+        return self.get(None if key is None else (key, 'absMax'), lambda: np.max(np.abs(dataArray(data))))
+
+    def projection(self, key, data, kind, axis, limits=None):
+        """
+        Returns the projection of 2D data along an axis.
+
+        Parameters
+        ----------
+        key : hashable or None
+            The key of the data, None if the result should not be cached.
+        data : ndarray or callable
+            The 2D data, or a function that returns the data.
+        kind : str
+            The projection, see PROJECTIONS: 'sum', or the skyline projections 'max' and 'min'.
+        axis : int
+            The axis along which is projected.
+        limits : tuple of int, optional
+            The first and the last index along axis that are included.
+            By default all data is included.
+
+        Returns
+        -------
+        ndarray
+            The projection.
+        """
+        def calculate():
+            values = dataArray(data)
+            select = [slice(None)] * values.ndim
+            if limits is not None:
+                select[axis] = slice(min(limits), max(limits) + 1)
+            return PROJECTIONS[kind](values[tuple(select)], axis=axis)
+        return self.get(None if key is None else (key, 'projection', kind, axis, limits), calculate)
+
+    def noise(self, key, data, start, stop):
+        """
+        Returns the noise level of a region of 1D data, as the standard deviation.
+
+        Parameters
+        ----------
+        key : hashable or None
+            The key of the data, None if the result should not be cached.
+        data : ndarray or callable
+            The 1D data, or a function that returns the data.
+        start : int
+            The first index of the region.
+        stop : int
+            The index after the region.
+
+        Returns
+        -------
+        float
+            The noise level.
+        """
+        return self.get(None if key is None else (key, 'noise', start, stop), lambda: np.std(dataArray(data)[start:stop]))
+
+
+SUMMARIES = SummaryCache()  # Shared by all views, so views of the same data use the same summaries
@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+
+# Copyright 2016 - 2024 Bas van Meerten and Wouter Franssen
+
+# This file is part of ssNake.
+#
+# ssNake is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ssNake is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ssNake. If not, see <http://www.gnu.org/licenses/>.
+
+import copy
+import inspect
+import numpy as np
+import hypercomplex as hc
+import functions as func
+import spectrum as sc
+
+FUSABLE = ('apodize', 'resize', 'complexFourier', 'phase', 'baselineCorrection')  # Steps that act on each trace separately
+COPYUNDO = ('apodize', 'resize')  # Fusable steps whose own undo information is a copy of the spectrum
+CHAINBLOCKSIZE = 2**23  # Number of bytes per block of traces in a fused pass
+METADATA = ('freq', 'sw', 'spec', 'wholeEcho', 'xaxArray', 'customXax', 'ref', 'history')  # Spectrum attributes changed by the steps
+
+
+def stepArguments(name, args):
+    """
+    Binds the arguments of a step to the parameter names of the Spectrum method.
+
+    Parameters
+    ----------
+    name : str
+        The name of the Spectrum method.
+    args : tuple
+        The positional arguments of the step.
+
+    Returns
+    -------
+    dict
+        The value of every parameter, including the defaults.
+    """
+    bound = inspect.signature(getattr(sc.Spectrum, name)).bind(None, *args)
+    bound.apply_defaults()
+    return bound.arguments
+
+
+def isFullSelect(select):
+    """
+    Returns True when select selects all data.
+    """
+    return isinstance(select, slice) and select == slice(None)
+
+
+def metaCopy(spec, data):
+    """
+    Returns a copy of a Spectrum with other data, without copying the data of the Spectrum.
+
+    Parameters
+    ----------
+    spec : Spectrum
+        The spectrum to copy.
+    data : HComplexData
+        The data of the copy.
+
+    Returns
+    -------
+    Spectrum
+        The copy.
+    """
+    oldData = spec.data
+    spec.data = data
+    try:
+        newSpec = copy.deepcopy(spec)
+    finally:
+        spec.data = oldData
+    newSpec.undoList = []
+    newSpec.redoList = []
+    newSpec.noUndo = True
+    return newSpec
+
+
+def simplifyKernel(kernel):
+    """
+    Removes Fourier transforms that are directly undone and combines consecutive elementwise operations.
+
+    Parameters
+    ----------
+    kernel : list
+        The operations, each either ['fft', inverse], ['resize', size, pos] or ['affine', mult, add].
+        mult and add are 1-D arrays or None.
+
+    Returns
+    -------
+    list
+        The simplified operations.
+    """
+    out = []
+    for op in kernel:
+        if out and op[0] == 'fft' and out[-1][0] == 'fft' and op[1] != out[-1][1]:
+            out.pop()
+        elif out and op[0] == 'affine' and out[-1][0] == 'affine':
+            # a2 * (a1 * x + b1) + b2
+            mult1, add1 = out[-1][1:]
+            mult2, add2 = op[1:]
+            mult = mult1 if mult2 is None else (mult2 if mult1 is None else mult1 * mult2)
+            if add1 is not None and mult2 is not None:
+                add1 = add1 * mult2
+            add = add1 if add2 is None else (add2 if add1 is None else add1 + add2)
+            out[-1] = ['affine', mult, add]
+        else:
+            out.append(op)
+    return out
+
+
+def applyKernel(data, kernel):
+    """
+    Applies the operations of a kernel to a block of traces.
+
+    Parameters
+    ----------
+    data : ndarray
+        The traces, with the processed dimension last.
+        This array is used as workspace.
+    kernel : list
+        The operations, see simplifyKernel.
+
+    Returns
+    -------
+    ndarray
+        The processed traces.
+    """
+    for op in kernel:
+        if op[0] == 'affine':
+            if op[1] is not None:
+                data *= op[1]
+            if op[2] is not None:
+                data += op[2]
+        elif op[0] == 'fft':
+            data = hc.fftn(data, (-1, ), op[1], (-1, ), overwrite=True)
+        elif op[0] == 'resize':
+            data = hc.resizeData(data, op[1], op[2], -1)
+    return data
+
+
+class ProcessChain(object):
+    """
+    A chain of processing steps which is recorded first and executed later.
+    The steps use the macro format [name, args], where name is a method of Spectrum.
+    Consecutive steps along the same dimension that act on each trace separately (see FUSABLE) are executed in a single pass over the data,
+    block by block, with their elementwise operations (apodization, first point scaling, phasing, baseline) combined into one multiplication.
+    Other steps are executed as usual.
+    """
+
+    def __init__(self, steps=None):
+        """
+        Initializes the chain.
+
+        Parameters
+        ----------
+        steps : list of lists, optional
+            The steps in macro format.
+        """
+        self.steps = []
+        if steps is not None:
+            for step in steps:
+                self.add(step[0], *step[1])
+
+    def add(self, name, *args):
+        """
+        Appends a step to the chain.
+
+        Parameters
+        ----------
+        name : str
+            The name of the Spectrum method.
+        *args
+            The arguments of the method.
+
+        Returns
+        -------
+        ProcessChain
+            A pointer to self
+
+        Raises
+        ------
+        SpectrumException
+            When Spectrum has no method with that name.
+        """
+        if not callable(getattr(sc.Spectrum, name, None)):
+            raise sc.SpectrumException('Unknown processing step: ' + str(name))
+        self.steps.append([name, tuple(args)])
+        return self
+
+    def run(self, spec):
+        """
+        Executes the chain on a spectrum in place.
+        When undo is enabled and none of the steps stores a copy for its own undo (see COPYUNDO),
+        the steps are executed one by one with their own undo information, which does not copy the data.
+        Otherwise the chain is fused (see runFused).
+
+        Parameters
+        ----------
+        spec : Spectrum
+            The spectrum to process.
+        """
+        if not spec.noUndo and not any(name in COPYUNDO for name, _ in self.steps):
+            self.runSteps(spec)
+        else:
+            self.runFused(spec)
+
+    def runSteps(self, spec):
+        """
+        Executes the steps of the chain one by one on a spectrum in place, without fusing them.
+        Every step is a separate undo step.
+
+        Parameters
+        ----------
+        spec : Spectrum
+            The spectrum to process.
+        """
+        for name, args in self.steps:
+            getattr(spec, name)(*args)
+
+    def runFused(self, spec):
+        """
+        Executes the fused chain on a spectrum in place.
+        The whole chain is a single undo step, with one copy of the spectrum instead of one per step.
+        When a step fails, the spectrum is restored to its state before the chain.
+
+        Parameters
+        ----------
+        spec : Spectrum
+            The spectrum to process.
+        """
+        noUndo = spec.noUndo
+        for name, args in self.steps:
+            if name == 'setNoUndo':
+                noUndo = bool(args[0])
+        chain = ProcessChain(self.steps)
+        copyData = None
+        if not spec.noUndo:
+            copyData = copy.deepcopy(spec)
+        spec.noUndo = True
+        try:
+            self.execute(spec, spec)
+        except Exception:
+            if copyData is not None:
+                spec.restoreData(copyData, None)
+                spec.undoList = copyData.undoList
+                spec.history = copyData.history
+            raise
+        finally:
+            spec.setNoUndo(noUndo)
+        spec.redoList = []
+        if not spec.noUndo and copyData is not None:
+            message = 'Processing chain of ' + str(len(self.steps)) + ' steps'
+
+            def undoChain(self):
+                self.restoreData(copyData, lambda self: chain.runFused(self))
+                # Spectrum.undo removes the restore message and the message of the undone step
+                self.history = copyData.history + [message, self.history[-1]]
+
+            spec.undoList.append(undoChain)
+
+    def apply(self, spec):
+        """
+        Returns the result of the chain on a spectrum, which is not changed.
+        The raw data is read block by block, so rerunning a modified chain on the same data does not copy the data first.
+
+        Parameters
+        ----------
+        spec : Spectrum
+            The spectrum to process.
+
+        Returns
+        -------
+        Spectrum
+            The processed spectrum.
+        """
+        result = metaCopy(spec, hc.HComplexData())
+        self.execute(spec, result)
+        result.noUndo = spec.noUndo
+        return result
+
+    def execute(self, source, target):
+        """
+        Executes the steps without undo information.
+
+        Parameters
+        ----------
+        source : Spectrum
+            The spectrum from which the data is read.
+        target : Spectrum
+            The spectrum in which the result is stored.
+            This can be source itself, otherwise it should be a metadata copy of source.
+        """
+        data = source.data
+        start = 0
+        while start < len(self.steps):
+            stop, axis = self.segment(start, data)
+            if stop == start:
+                if target.data is not data:
+                    target.data = data.copy()
+                name, args = self.steps[start]
+                getattr(target, name)(*args)
+                data = target.data
+                stop += 1
+            else:
+                self.executeSegment(data, target, self.steps[start:stop], axis)
+                data = target.data
+            start = stop
+        if target.data is not data:
+            target.data = data.copy()
+
+    def segment(self, start, data):
+        """
+        Finds the consecutive steps from start that can be fused.
+
+        Parameters
+        ----------
+        start : int
+            The index of the first step.
+        data : HComplexData
+            The data before the first step.
+
+        Returns
+        -------
+        int
+            The index after the last step that can be fused.
+        int
+            The dimension of these steps.
+        """
+        axis = None
+        stop = start
+        for name, args in self.steps[start:]:
+            if name not in FUSABLE:
+                break
+            params = stepArguments(name, args)
+            stepAxis = params['axis'] + data.ndim() if params['axis'] < 0 else params['axis']
+            if not 0 <= stepAxis < data.ndim():
+                break
+            if axis is None:
+                if data.isHyperComplex(stepAxis):
+                    break
+                axis = stepAxis
+            elif stepAxis != axis:
+                break
+            if 'select' in params and not isFullSelect(params['select']):
+                break
+            if name == 'apodize' and ((params['shifting'] != 0.0 and params['shiftingAxis'] is not None) or params['preview']):
+                break
+            if name == 'baselineCorrection' and np.ndim(params['baseline']) != 1:
+                break
+            stop += 1
+        return stop, axis
+
+    def executeSegment(self, data, target, steps, axis):
+        """
+        Executes fusable steps along one dimension in a single pass per block of traces.
+
+        Parameters
+        ----------
+        data : HComplexData
+            The input data, which is not changed.
+        target : Spectrum
+            The spectrum in which the result and the new metadata are stored.
+        steps : list
+            The steps in macro format.
+        axis : int
+            The dimension of the steps.
+        """
+        # The metadata is updated by running the steps on a single trace
+        traceSelect = tuple(slice(None) if i == axis else slice(0, 1) for i in range(data.ndim()))
+        shadow = metaCopy(target, data[traceSelect])
+        kernel = []
+        maxLength = shadow.shape()[axis]
+        for name, args in steps:
+            params = stepArguments(name, args)
+            length = shadow.shape()[axis]
+            spec = shadow.spec[axis] > 0
+            if name == 'apodize':
+                t = np.arange(length) / shadow.sw[axis]
+                window = func.apodize(t, params['shift'], params['lor'], params['gauss'], params['cos2'], params['hamming'], shadow.wholeEcho[axis])
+                ops = [['affine', window, None]]
+                if spec:
+                    ops = [['fft', True]] + ops + [['fft', False]]
+            elif name == 'resize':
+                ops = [['resize', params['size'], params['pos']]]
+                if spec:
+                    ops = [['fft', True]] + ops + [['fft', False]]
+                maxLength = max(maxLength, params['size'])
+            elif name == 'complexFourier':
+                scale = np.ones(length)
+                if spec:
+                    scale[0] = 1.0 if shadow.wholeEcho[axis] else 2.0
+                    ops = [['fft', True], ['affine', scale, None]]
+                else:
+                    scale[0] = 1.0 if shadow.wholeEcho[axis] else 0.5
+                    ops = [['affine', scale, None], ['fft', False]]
+            elif name == 'phase':
+                offset = params['offset']
+                if offset is None:
+                    offset = 0 if shadow.ref[axis] is None else shadow.freq[axis] - shadow.ref[axis]
+                ops = [['affine', shadow.phaseVector(params['phase0'], params['phase1'], params['phase2'], offset, axis), None]]
+                if not spec:
+                    ops = [['fft', False]] + ops + [['fft', True]]
+            elif name == 'baselineCorrection':
+                ops = [['affine', None, -np.ravel(params['baseline'])]]
+            kernel += ops
+            getattr(shadow, name)(*args)
+        kernel = simplifyKernel(kernel)
+        inData = np.moveaxis(data.data, axis + 1, -1)
+        outShape = list(data.data.shape)
+        outShape[axis + 1] = shadow.shape()[axis]
+        out = np.empty(outShape, dtype=data.data.dtype)
+        outData = np.moveaxis(out, axis + 1, -1)
+        batchShape = inData.shape[:-1]
+        numTraces = int(np.prod(batchShape))
+        blockSize = max(1, CHAINBLOCKSIZE // (maxLength * out.itemsize))
+        for blockStart in range(0, numTraces, blockSize):
+            index = np.unravel_index(np.arange(blockStart, min(blockStart + blockSize, numTraces)), batchShape)
+            outData[index] = applyKernel(inData[index], kernel)
+        newData = hc.HComplexData()
+        newData.data = out
+        newData.hyper = np.copy(data.hyper)
+        target.data = newData
+        for attr in METADATA:
+            setattr(target, attr, getattr(shadow, attr))
+        target.bumpVersion()
@@ -24,6 +24,7 @@ import matplotlib
 matplotlib.rc('svg', fonttype='none')
 from matplotlib.colors import colorConverter
 import widgetClasses as wc
+import plotCache
 from safeEval import safeEval
 from ssNake import QtGui, QtCore, QtWidgets, FigureCanvas
 
@@ -205,6 +206,7 @@ class SaveFigureWindow(QtWidgets.QWidget):
         self.ytickFontSizeEntry.valueChanged.connect(self.updatePlot)
         self.ytickFontSizeEntry.hide()
         self.fontFrame.addWidget(self.ytickFontSizeEntry, 6, 1)
+        self.legendLines = self.ax.get_legend_handles_labels()[0]  # The lines and collections in the legend
         self.legend = self.ax.legend()
         if self.legend is not None:              # Fix for matplotlib 2.0, were for contour self.legend becomes None
             if not self.legend.get_texts():
@@ -339,7 +341,7 @@ class SaveFigureWindow(QtWidgets.QWidget):
         if self.legend is None:
             return
         if self.legendGroup.isChecked():
-            orderedLines = [self.ax.lines[x] for x in self.legendOrder]
+            orderedLines = [self.legendLines[x] for x in self.legendOrder]
             orderedLegendText = [self.legendTextList[x] for x in self.legendOrder]
             if self.fontDetailsCheck.checkState():  # If details checked
                 size = self.legendFontSizeEntry.value()
@@ -431,6 +433,8 @@ class SaveFigureWindow(QtWidgets.QWidget):
         if pickEvent.mouseevent.dblclick and (pickEvent.mouseevent.button == 1):
             if isinstance(pickEvent.artist, matplotlib.lines.Line2D):
                 EditLineWindow(self, pickEvent.artist)
+            elif isinstance(pickEvent.artist, plotCache.DecimatedLineCollection):  # A trace of a stack plot
+                EditLineWindow(self, pickEvent.artist.splitTrace(pickEvent.ind[0]))
 
     def get_mainWindow(self):
         """Returns the mainwindow that has been replaced by the save figure window."""
@@ -465,7 +469,11 @@ class SaveFigureWindow(QtWidgets.QWidget):
             dpi = self.dpiEntry.value()
             if dpi is None:
                 dpi = self.fig.dpi
-            self.fig.savefig(f, format=self.fileOptions[self.filetypeEntry.currentIndex()], dpi=dpi)
+            self.oldMainWindow.current.setFullResolution(True)  # Save the data itself, not the display resolution
+            try:
+                self.fig.savefig(f, format=self.fileOptions[self.filetypeEntry.currentIndex()], dpi=dpi)
+            finally:
+                self.oldMainWindow.current.setFullResolution(False)
             if self.fileOptions[self.filetypeEntry.currentIndex()] == 'svg':
                 with open(f) as fd:  # workarround for stroke miter limit
                     s = fd.read()
@@ -585,7 +593,7 @@ class LegendWindow(QtWidgets.QWidget):
             inp = eval(self.posEntry.text(), env)
         except Exception:
             inp = self.posEntry.text()
-        orderedLines = [self.father.ax.lines[x] for x in order]
+        orderedLines = [self.father.legendLines[x] for x in order]
         orderedLegendText = [tmp[x] for x in order]
         self.father.ax.legend(orderedLines, orderedLegendText, loc=inp)
         try:
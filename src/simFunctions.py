@@ -18,13 +18,16 @@
 # along with ssNake. If not, see <http://www.gnu.org/licenses/>.
 
 import tempfile
+import functools
 import os
 import shutil
 import subprocess
 import numpy as np
+from scipy.special import wofz
 from safeEval import safeEval
 import functions as func
 import specIO as io
+import hypercomplex as hc
 import Czjzek
 
 class SimException(Exception):
@@ -541,6 +544,113 @@ def zcw_angles(m, symm=0):
     weight = np.ones(samples) / samples
     return phi, theta, weight
 
+@functools.lru_cache(maxsize=32)
+def powderTensors(cheng, symm):
+    """
+    Returns the (cached) Wigner matrices and weights of a ZCW angle set.
+
+    Parameters
+    ----------
+    cheng : int
+        The Cheng number.
+    symm : {0, 1, 2}
+        The symmetry of the angle set (see zcw_angles).
+
+    Returns
+    -------
+    ndarray
+        The second rank wigner rotation matrices.
+    ndarray
+        The fourth rank wigner rotation matrices.
+    ndarray
+        The weights of the orientations.
+    """
+    alpha, beta, weight = zcw_angles(cheng, symm)
+    D2 = D2tens(alpha, beta, np.zeros_like(alpha))
+    D4 = D4tens(alpha, beta, np.zeros_like(alpha))
+    for item in (D2, D4, weight):
+        item.flags.writeable = False
+    return D2, D4, weight
+
+def asg_angles(m, symm=0):
+    """
+    Calculates a triangulated angle set for interpolated powder averaging.
+    The set is based on the tiling of the octahedron used in the method of Alderman, Solum, and Grant (ASG).
+    Every edge of an octant is divided in m parts, and the resulting m**2 triangles are projected on the unit sphere.
+
+    Parameters
+    ----------
+    m : int
+        The number of divisions of every edge of an octant.
+    symm : {0, 1, 2}, optional
+        The symmetry of the problem. When 0 the orientations run over the entire sphere, when 1 the orientations run over a hemispere, and when 2 the orientations run over and octant.
+
+    Returns
+    -------
+    ndarray
+        The phi angles of the vertices.
+    ndarray
+        The theta angles of the vertices.
+    ndarray
+        The indices of the three vertices of every triangle.
+    ndarray
+        The weights of the triangles (their normalized solid angles).
+    """
+    m = max(int(m), 1)
+    i, j = np.nonzero(np.add.outer(np.arange(m + 1), np.arange(m + 1)) <= m)
+    octant = np.array([i, j, m - i - j], dtype=float).T
+    octant /= np.linalg.norm(octant, axis=1)[:, np.newaxis]
+    index = np.full((m + 1, m + 1), -1)
+    index[i, j] = np.arange(len(i))
+    up = (i + j) < m
+    down = (i + j) < (m - 1)
+    triangles = np.concatenate((np.array([index[i[up], j[up]], index[i[up] + 1, j[up]], index[i[up], j[up] + 1]]).T,
+                                np.array([index[i[down] + 1, j[down]], index[i[down] + 1, j[down] + 1], index[i[down], j[down] + 1]]).T))
+    if symm == 0:
+        signs = [(sx, sy, sz) for sz in (1, -1) for sy in (1, -1) for sx in (1, -1)]
+    elif symm == 1:
+        signs = [(sx, sy, 1) for sy in (1, -1) for sx in (1, -1)]
+    else:
+        signs = [(1, 1, 1)]
+    xyz = np.concatenate([octant * sign for sign in signs])
+    triangles = np.concatenate([triangles + n * len(octant) for n in range(len(signs))])
+    phi = np.mod(np.arctan2(xyz[:, 1], xyz[:, 0]), 2 * np.pi)
+    theta = np.arccos(np.clip(xyz[:, 2], -1.0, 1.0))
+    a, b, c = xyz[triangles[:, 0]], xyz[triangles[:, 1]], xyz[triangles[:, 2]]
+    weight = 2 * np.arctan2(np.abs(np.sum(a * np.cross(b, c), axis=1)), 1 + np.sum(a * b + b * c + c * a, axis=1))
+    weight /= np.sum(weight)
+    return phi, theta, triangles, weight
+
+@functools.lru_cache(maxsize=32)
+def powderTriangles(m, symm):
+    """
+    Returns the (cached) Wigner matrices, triangles, and weights of an ASG angle set.
+
+    Parameters
+    ----------
+    m : int
+        The number of divisions of every edge of an octant.
+    symm : {0, 1, 2}
+        The symmetry of the angle set (see asg_angles).
+
+    Returns
+    -------
+    ndarray
+        The second rank wigner rotation matrices of the vertices.
+    ndarray
+        The fourth rank wigner rotation matrices of the vertices.
+    ndarray
+        The indices of the three vertices of every triangle.
+    ndarray
+        The weights of the triangles.
+    """
+    alpha, beta, triangles, weight = asg_angles(m, symm)
+    D2 = D2tens(alpha, beta, np.zeros_like(alpha))
+    D4 = D4tens(alpha, beta, np.zeros_like(alpha))
+    for item in (D2, D4, triangles, weight):
+        item.flags.writeable = False
+    return D2, D4, triangles, weight
+
 def peakSim(x, freq, sw, axMult, extra, bgrnd, mult, pos, amp, lor, gauss):
     """
     Simulates an FID with Lorentzian and Gaussian broadening.
@@ -588,7 +698,329 @@ def peakSim(x, freq, sw, axMult, extra, bgrnd, mult, pos, amp, lor, gauss):
     t = np.fft.fftfreq(length, sw[-1]/float(length))
     return float(mult) * float(amp) / abs(sw[-1]) * np.exp(2j * np.pi * (pos - x[length//2]) * t - np.pi * np.abs(lor * t) - ((np.pi * np.abs(gauss) * t)**2) / (4 * np.log(2)))
 
-def makeSpectrum(x, sw, v, gauss, lor, weight):
+@functools.lru_cache(maxsize=16)
+def peakTime(length, sw):
+    """
+    Returns the (cached) non-negative half of the time axis used for the simulation of peaks.
+
+    Parameters
+    ----------
+    length : int
+        The number of points.
+    sw : float
+        The spectral width in Hz.
+
+    Returns
+    -------
+    ndarray
+        The time values of the first length//2 + 1 points in fft order.
+    """
+    t = np.arange(length//2 + 1) / float(sw)
+    t.flags.writeable = False
+    return t
+
+def peakSimMulti(x, freq, sw, axMult, extra, bgrnd, mult, pos, amp, lor, gauss):
+    """
+    Simulates the sum of the FIDs of several peaks with Lorentzian and Gaussian broadening.
+    This gives the same result as the sum of peakSim over all peaks, but evaluates all peaks at once.
+    As the FID at negative times is the complex conjugate of the FID at positive times, only half of the points are calculated.
+
+    Parameters
+    ----------
+    x : list of ndarray
+        A list of axes values for the simulation.
+        As this is a 1-D method only the last array in the list is used.
+    freq : list of float
+        The list of frequency per dimension in Hz (not used).
+    sw : list of float
+        The list of spectral width per dimension in Hz.
+        The last value is used to determine the dwell time.
+    axMult : float
+        The multiplier of the x-axis.
+    extra : list
+        The extra parameters of the function (not used).
+    bgrnd : float
+        The offset value added to the FID.
+    mult : float
+        The value by which the FID is multiplied.
+    pos : array_like
+        The frequencies of the peaks (in Hz*axMult).
+    amp : array_like
+        The amplitudes of the peaks.
+    lor : array_like
+        The Lorentzian broadening of the peaks.
+    gauss : array_like
+        The Gaussian broadening of the peaks (in Hz*axMult).
+
+    Returns
+    -------
+    ndarray
+        The simulated FID
+    """
+    x = x[-1]
+    pos = np.asarray(pos, dtype=float) / axMult
+    gauss = np.abs(np.asarray(gauss, dtype=float) / axMult)
+    lor = np.abs(np.asarray(lor, dtype=float))
+    amp = np.asarray(amp, dtype=float) * (pos >= np.min(x)) * (pos <= np.max(x))
+    length = len(x)
+    t = peakTime(length, abs(sw[-1])) * np.sign(sw[-1])
+    exponent = (2j * np.pi * (pos - x[length//2]))[:, np.newaxis] * t - np.pi * np.abs(lor[:, np.newaxis] * t) - ((np.pi * gauss[:, np.newaxis] * t)**2) / (4 * np.log(2))
+    half = float(mult) / abs(sw[-1]) * np.dot(amp, np.exp(exponent))
+    fid = np.empty(length, dtype=complex)
+    fid[:(length + 1)//2] = half[:(length + 1)//2]
+    fid[(length + 1)//2:] = np.conj(half[length//2:0:-1])
+    return fid
+
+def voigtLine(x, lor, gauss):
+    """
+    Calculates area normalized Voigt line shapes with the Faddeeva function.
+    A line without any broadening has no finite height and is returned as zero.
+
+    Parameters
+    ----------
+    x : array_like
+        The frequency offsets from the centre of the line in Hz.
+    lor : array_like
+        The full width at half maximum of the Lorentzian part in Hz.
+    gauss : array_like
+        The full width at half maximum of the Gaussian part in Hz.
+
+    Returns
+    -------
+    ndarray
+        The line shape at the offsets in x, broadcast over lor and gauss.
+    """
+    x, gamma, sigma = np.broadcast_arrays(x, np.abs(lor) / 2.0, np.abs(gauss) / (2 * np.sqrt(2 * np.log(2))))
+    line = np.zeros(x.shape)
+    sel = sigma > 0
+    line[sel] = np.real(wofz((x[sel] + 1j * gamma[sel]) / (sigma[sel] * np.sqrt(2)))) / (sigma[sel] * np.sqrt(2 * np.pi))
+    sel = (sigma == 0) & (gamma > 0)
+    line[sel] = gamma[sel] / (np.pi * (x[sel]**2 + gamma[sel]**2))
+    return line
+
+def peakSimFreq(x, freq, sw, axMult, extra, bgrnd, mult, pos, amp, lor, gauss):
+    """
+    Simulates a spectrum with Lorentzian and Gaussian broadening directly in the frequency domain.
+    The line shape is consistent with the Fourier transform of the FID of peakSim, apart from the folding of the spectrum.
+    As no Fourier transform is needed, the spectrum can be evaluated on any set of x-values.
+
+    Parameters
+    ----------
+    x : list of ndarray
+        A list of axes values for the simulation.
+        As this is a 1-D method only the last array in the list is used.
+    freq : list of float
+        The list of frequency per dimension in Hz (not used).
+    sw : list of float
+        The list of spectral width per dimension in Hz (not used).
+    axMult : float
+        The multiplier of the x-axis.
+    extra : list
+        The extra parameters of the function (not used).
+    bgrnd : float
+        The offset value added to the spectrum.
+    mult : float
+        The value by which the spectrum is multiplied.
+    pos : float
+        The frequency of the peak (in Hz*axMult).
+    amp : float
+        The amplitude of the peak.
+    lor : float
+        The Lorentzian broadening of the peak.
+    gauss : float
+        The Gaussian broadening of the peak (in Hz*axMult), corresponding to CS distribution.
+
+    Returns
+    -------
+    ndarray
+        The simulated spectrum
+    """
+    return float(mult) * float(amp) * voigtLine(x[-1] - pos / axMult, lor, gauss / axMult)
+
+def peakSimFreqMulti(x, freq, sw, axMult, extra, bgrnd, mult, pos, amp, lor, gauss):
+    """
+    Simulates the sum of the spectra of several peaks directly in the frequency domain.
+    This gives the same result as the sum of peakSimFreq over all peaks.
+
+    Parameters
+    ----------
+    x : list of ndarray
+        A list of axes values for the simulation.
+        As this is a 1-D method only the last array in the list is used.
+    freq : list of float
+        The list of frequency per dimension in Hz (not used).
+    sw : list of float
+        The list of spectral width per dimension in Hz (not used).
+    axMult : float
+        The multiplier of the x-axis.
+    extra : list
+        The extra parameters of the function (not used).
+    bgrnd : float
+        The offset value added to the spectrum.
+    mult : float
+        The value by which the spectrum is multiplied.
+    pos : array_like
+        The frequencies of the peaks (in Hz*axMult).
+    amp : array_like
+        The amplitudes of the peaks.
+    lor : array_like
+        The Lorentzian broadening of the peaks.
+    gauss : array_like
+        The Gaussian broadening of the peaks (in Hz*axMult).
+
+    Returns
+    -------
+    ndarray
+        The simulated spectrum
+    """
+    pos = np.asarray(pos, dtype=float)[:, np.newaxis] / axMult
+    gauss = np.asarray(gauss, dtype=float)[:, np.newaxis] / axMult
+    lor = np.asarray(lor, dtype=float)[:, np.newaxis]
+    return float(mult) * np.dot(np.asarray(amp, dtype=float), voigtLine(x[-1] - pos, lor, gauss))
+
+def binFrequencies(v, weight, length, limits, interpolate=False):
+    """
+    Bins frequencies with corresponding weights on a uniform grid.
+    The bin indices are computed directly, which makes this faster than np.histogram or np.histogram2d with uniform bins.
+
+    Parameters
+    ----------
+    v : list of ndarray
+        The frequencies for every dimension of the grid.
+        All arrays should have the same shape.
+    weight : ndarray
+        The weights corresponding to the frequencies.
+        Can be real or complex and should be broadcastable to the shape of the frequencies.
+    length : list of int
+        The number of bins for every dimension.
+    limits : list of tuple
+        The (minimum, maximum) frequency of the grid for every dimension.
+        Frequencies outside these limits, or which are not finite, are discarded.
+    interpolate : bool, optional
+        If True, the weight of every frequency is divided linearly over the nearest bin centres, which reduces the discretization noise.
+        False by default.
+
+    Returns
+    -------
+    ndarray
+        The binned weights with shape length.
+    """
+    weight = np.broadcast_to(weight, np.shape(v[0])).ravel()
+    size = int(np.prod(length))
+    corners = [(0, None, False)]  # Flat bin index, interpolation fraction, and out of range for every corner
+    for freqs, num, (low, high) in zip(v, length, limits):
+        pos = (np.ravel(freqs) - low) * (num / float(high - low))
+        invalid = ~np.isfinite(pos)     # NaN or infinite frequencies are out of range
+        if np.any(invalid):
+            pos[invalid] = 0
+        if interpolate:
+            pos -= 0.5
+            ind = np.floor(pos)
+            fracUp = pos - ind
+            steps = ((ind, 1 - fracUp), (ind + 1, fracUp))
+        else:
+            steps = ((pos, None),)
+        newCorners = []
+        for flat, frac, out in corners:
+            for ind, fracStep in steps:
+                # Truncation equals flooring, as the negative positions are out of range anyway
+                newFlat = flat * num + ind.astype(np.intp)
+                newOut = out | invalid | (ind < 0) | (ind >= num)
+                if fracStep is None:
+                    newFrac = frac
+                elif frac is None:
+                    newFrac = fracStep
+                else:
+                    newFrac = frac * fracStep
+                newCorners.append((newFlat, newFrac, newOut))
+        corners = newCorners
+    final = np.zeros(size, dtype=np.result_type(weight, float))
+    for flat, frac, out in corners:
+        flat[out] = size                 # Collect the frequencies out of range in an extra bin
+        cornerWeight = weight if frac is None else weight * frac
+        if np.iscomplexobj(cornerWeight):
+            final += np.bincount(flat, np.real(cornerWeight), minlength=size + 1)[:size]
+            final += 1j * np.bincount(flat, np.imag(cornerWeight), minlength=size + 1)[:size]
+        else:
+            final += np.bincount(flat, cornerWeight, minlength=size + 1)[:size]
+    return final.reshape(length)
+
+def triangleCdf(pos, edge):
+    """
+    Calculates the cumulative distribution of triangular line shapes at given positions.
+    A triangle with corner frequencies a <= b <= c is the line shape of a linear interpolation of the frequency over a triangle of orientations.
+
+    Parameters
+    ----------
+    pos : ndarray
+        The sorted corner frequencies with shape (N, 3).
+    edge : ndarray
+        The positions at which to evaluate the distributions, with length N.
+
+    Returns
+    -------
+    ndarray
+        The fraction of every triangle below the corresponding position.
+    """
+    a, b, c = pos[:, 0], pos[:, 1], pos[:, 2]
+    lowDenom = (c - a) * (b - a)
+    highDenom = (c - a) * (c - b)
+    low = (edge - a)**2 / np.where(lowDenom > 0, lowDenom, 1.0)
+    high = 1 - (c - edge)**2 / np.where(highDenom > 0, highDenom, 1.0)
+    return np.where(edge <= a, 0.0, np.where(edge >= c, 1.0, np.where(edge <= b, low, high)))
+
+def binTriangles(v, weight, triangles, area, length, limits):
+    """
+    Bins the interpolated frequencies of a triangulated angle set on a uniform grid.
+    The frequency is interpolated linearly over every triangle, which gives a triangular line shape that is integrated exactly over the bins.
+    This gives smooth line shapes from far less orientations than binning the frequencies of the orientations directly.
+
+    Parameters
+    ----------
+    v : ndarray
+        The frequencies at the vertices of the angle set.
+        The first dimension runs over the vertices, additional dimensions (e.g. sidebands) are binned as separate sets of triangles.
+    weight : ndarray
+        The intensities at the vertices, should be broadcastable to the shape of v.
+        The intensity of a triangle is the mean of the intensities at its vertices.
+    triangles : ndarray
+        The indices of the three vertices of every triangle.
+    area : ndarray
+        The weights of the triangles.
+    length : int
+        The number of bins.
+    limits : tuple
+        The (minimum, maximum) frequency of the grid.
+
+    Returns
+    -------
+    ndarray
+        The binned intensities with the given length.
+    """
+    v = np.asarray(v)
+    weight = np.broadcast_to(weight, v.shape)
+    low, high = limits
+    pos = np.moveaxis((v[triangles] - low) * (length / float(high - low)), 1, -1).reshape(-1, 3)
+    pos.sort(axis=1)
+    inten = np.mean(weight[triangles], axis=1) * area.reshape((-1,) + (1,) * (v.ndim - 1))
+    inten = inten.ravel()
+    keep = (pos[:, 2] >= 0) & (pos[:, 0] < length) & (inten != 0)
+    pos = pos[keep]
+    inten = inten[keep]
+    first = np.clip(np.floor(pos[:, 0]), 0, length - 1).astype(np.intp)
+    counts = np.clip(np.floor(pos[:, 2]), 0, length - 1).astype(np.intp) - first + 1
+    tri = np.repeat(np.arange(len(pos)), counts)
+    bins = np.arange(len(tri)) - np.repeat(np.cumsum(counts) - counts - first, counts)
+    frac = triangleCdf(pos[tri], bins + 1.0) - triangleCdf(pos[tri], bins)
+    final = np.zeros(length, dtype=np.result_type(inten, float))
+    if np.iscomplexobj(inten):
+        final += np.bincount(bins, frac * np.real(inten)[tri], minlength=length)
+        final += 1j * np.bincount(bins, frac * np.imag(inten)[tri], minlength=length)
+    else:
+        final += np.bincount(bins, frac * inten[tri], minlength=length)
+    return final
+
+def makeSpectrum(x, sw, v, gauss, lor, weight, triangles=None, area=None):
     """
     Creates an FID from a list of frequencies with corresponding weights.
     Also applies Lorentzian and Gaussian broadening.
@@ -608,6 +1040,11 @@ def makeSpectrum(x, sw, v, gauss, lor, weight):
         Lorentzian broadening in Hz.
     weight : ndarray
         The weights corresponding to the frequencies. Should have the same length as v.
+    triangles : ndarray, optional
+        The vertex indices of the triangles of an ASG angle set (see asg_angles).
+        If given, v and weight contain the values at the vertices, and the frequencies are interpolated over the triangles (see binTriangles).
+    area : ndarray, optional
+        The weights of the triangles. Required when triangles is given.
 
     Returns
     -------
@@ -617,13 +1054,16 @@ def makeSpectrum(x, sw, v, gauss, lor, weight):
     length = len(x)
     t = np.abs(np.fft.fftfreq(length, sw / float(length)))
     diff = (x[1] - x[0]) * 0.5
-    final, _ = np.histogram(v, length, range=[x[0]-diff, x[-1]+diff], weights=weight)
+    if triangles is None:
+        final = binFrequencies([v], weight, [length], [(x[0]-diff, x[-1]+diff)])
+    else:
+        final = binTriangles(v, weight, triangles, area, length, (x[0]-diff, x[-1]+diff))
     apod = np.exp(-np.pi * np.abs(lor) * t - ((np.pi * np.abs(gauss) * t)**2) / (4 * np.log(2)))
-    inten = np.fft.ifft(final) * apod
+    inten = hc.ifft(final, overwrite=True) * apod
     inten *= len(inten)  / abs(sw)
     return inten
 
-def makeMQMASSpectrum(x, sw, v, gauss, lor, weight, slope, fold_D1=True):
+def makeMQMASSpectrum(x, sw, v, gauss, lor, weight, slope, fold_D1=True, interpolate=False):
     """
     Creates an 2D FID from a list of frequencies with corresponding weights.
     Also applies Lorentzian and Gaussian broadening.
@@ -652,6 +1092,9 @@ def makeMQMASSpectrum(x, sw, v, gauss, lor, weight, slope, fold_D1=True):
         if fold_D1 is True, calculates a folded spectrum: any frequency that falls outside the 
         spectrum window is folded in.
         if fold_D1 is False, only retains frequencies that are within spetrum window.
+    interpolate : bool, optional
+        If True, the frequencies are linearly interpolated between the grid points (see binFrequencies).
+        False by default.
 
     Returns
     -------
@@ -711,14 +1154,14 @@ def makeMQMASSpectrum(x, sw, v, gauss, lor, weight, slope, fold_D1=True):
         minD2, maxD2 = maxD2, minD2
         v[1] *= -1
 
-    final, _, _ = np.histogram2d(v[0], v[1], [length1, length2], range=[[minD1, maxD1], [minD2, maxD2]], weights=weight)
+    final = binFrequencies([v[0], v[1]], weight, [length1, length2], [(minD1, maxD1), (minD2, maxD2)], interpolate)
 #    print(f"histogram shape is {final.shape}")
     final = final.reshape(split_len, length_final1, length2)
 #    print(f"histogram reshape is {final.shape}")
     final = final.sum(axis=0)
 #    print(f"histogram final shape is {final.shape}")
     
-    final = np.fft.ifftn(final)
+    final = hc.ifftn(final, (0, 1), overwrite=True)
     apod2 = np.exp(-np.pi * np.abs(lor[1] * t2) - 
                    ((np.pi * np.abs(gauss[1]) * (t2 + t1*slope))**2) / (4 * np.log(2)))
     apod1 = np.exp(-np.pi * np.abs(lor[0] * t1) - 
@@ -726,39 +1169,101 @@ def makeMQMASSpectrum(x, sw, v, gauss, lor, weight, slope, fold_D1=True):
     final *= apod1 * apod2 * length_final1 / sw1 * length2 / abs(sw[-1])
     return final
 
-def carouselAveraging(spinspeed, v, weight, vConstant):
+@functools.lru_cache(maxsize=64)
+def gammaTables(angle, numssb, rank):
+    """
+    Returns the (cached) tables that rotate the Fourier components of an interaction over a full rotor period.
+
+    Parameters
+    ----------
+    angle : float
+        The spinning angle in radians.
+    numssb : int
+        The number of gamma angles.
+    rank : {2, 4}
+        The rank of the interaction.
+
+    Returns
+    -------
+    ndarray
+        The frequency table, with the rotor components exp(1j*m*gamma)*d_m0(angle) for m=-rank..rank.
+    ndarray
+        The phase table, the integral of the frequency table over gamma (exp(1j*m*gamma)*d_m0(angle)/(1j*m)).
+        The row of m=0 is zero.
+    """
+    if rank == 2:
+        d = d2tens(np.array([angle]))[0, :, 2]
+    else:
+        d = d4tens(np.array([angle]))[0, :, 4]
+    m = np.arange(-rank, rank + 1)
+    gval = np.arange(numssb) * 2 * np.pi / numssb
+    spin = np.exp(1j * m[:, np.newaxis] * gval) * d[:, np.newaxis]
+    phase = np.zeros_like(spin)
+    phase[m != 0] = spin[m != 0] / (1j * m[m != 0, np.newaxis])
+    spin.flags.writeable = False
+    phase.flags.writeable = False
+    return spin, phase
+
+def carouselAveraging(spinspeed, v, weight, vConstant, phase=False, single=False, chunk=None):
     """
     Performs carousel averaging for finite spinning samples.
+    The orientations are processed in chunks, such that the temporary arrays stay small.
 
     Parameters
     ----------
     spinspeed : float
         The spinning speed in Hz.
     v : 2-D ndarray
-        The anisotropic part of the frequency.
+        The anisotropic part of the frequency, or the phase in radians when phase is True.
         The first dimension contains the contributions of different alpha and beta angles.
         The second dimension contains a full rotation over gamma.
     weight : array_like
-        Gaussian broadening in Hz for the first and second dimension.
-    vConstant : float
-        The offset frequency (isotropic value).
+        The weights of the orientations.
+    vConstant : ndarray
+        The offset frequency (isotropic value) of the orientations.
+    phase : bool, optional
+        If True, v contains the phase as calculated analytically from the Fourier components (see csaFreqBase).
+        Otherwise the phase is obtained by a cumulative sum over the frequencies.
+        False by default.
+    single : bool, optional
+        If True, the calculation uses single precision (complex64).
+        False by default.
+    chunk : int, optional
+        The number of orientations per chunk.
+        CAROUSELCHUNK by default.
 
     Returns
     -------
     ndarray
-        The 2D FID. Has a shape of (len(x[-2]), len(x[-1])).
+        The frequencies of the sidebands with shape v.shape.
+    ndarray
+        The intensities of the sidebands with shape v.shape.
     """
     numssb = v.shape[1]
-    dt = 1.0 / spinspeed / numssb
-    prod = np.exp(1j * np.cumsum(v * dt * 2 * np.pi, axis=1))
-    tot = np.fft.fft(prod, axis=1)
-    tot *= np.conj(tot)
-    weight2 = weight[:, np.newaxis] / numssb**2
-    tot *= weight2
+    numOrient = v.shape[0]
+    if chunk is None:
+        chunk = CAROUSELCHUNK
+    step = 2 * np.pi / spinspeed / numssb
+    tot = np.empty(v.shape, dtype=np.float32 if single else float)
+    work = np.empty((min(chunk, numOrient), numssb), dtype=np.complex64 if single else complex)
+    for start in range(0, numOrient, chunk):
+        stop = min(start + chunk, numOrient)
+        prod = work[:stop - start]
+        part = tot[start:stop]       # Holds the phases until the intensities are known
+        if phase:
+            part[...] = v[start:stop]
+        else:
+            np.cumsum(np.real(v[start:stop]), axis=1, dtype=part.dtype, out=part)
+            part *= step
+        np.cos(part, out=prod.real)
+        np.sin(part, out=prod.imag)
+        np.abs(hc.fft(prod, 1, overwrite=True), out=part)
+        part *= part
+    tot *= np.asarray(weight)[:, np.newaxis] / numssb**2
     v = np.fft.fftfreq(numssb, 1.0 / numssb) * spinspeed
     return v + vConstant[:, np.newaxis], tot
 
-def csaFreqBase(angle, tensor, D2, spinspeed, numssb):
+def csaFreqBase(angle, tensor, D2, spinspeed, numssb, phase=False):
     """
     Calculates the CSA frequencies for given alpha and beta angles and over a full circle over gamma.
 
@@ -775,11 +1280,15 @@ def csaFreqBase(angle, tensor, D2, spinspeed, numssb):
         The spinning frequency in Hz.
     numssb : int
         The number of alpha angles to calculate.
+    phase : bool, optional
+        If True, the phase (in radians) accumulated over the rotor period is returned instead of the frequencies for finite spinning.
+        The phase is calculated analytically from the Fourier components of the frequency.
+        False by default.
 
     Returns
     -------
     ndarray
-        The array with frequencies. Has the same length as D2.
+        The array with frequencies (or phases). Has the same length as D2.
     float
         The isotropic frequency.
     """
@@ -796,31 +1305,32 @@ def csaFreqBase(angle, tensor, D2, spinspeed, numssb):
     elif spinspeed == 0.0:
         v = np.real(dat2[:, 2] + dat0)
     else:
-        gammastep = 2 * np.pi / numssb
-        gval = np.arange(numssb) * gammastep
-        spinD2 = np.exp(1j * np.arange(-2, 3)[:, np.newaxis] * gval) * d2[:, np.newaxis]
+        spinD2, phaseD2 = gammaTables(angle, numssb, 2)
         vConstant = np.real(dat0 + dat2[:, 2] * factor2) 
         dat2[:, 2] = 0
-        v = np.matmul(dat2, spinD2)
+        if phase:
+            v = np.real(np.matmul(dat2, phaseD2)) / spinspeed
+        else:
+            v = np.matmul(dat2, spinD2)
     return v, vConstant
 
 def csaFunc(x, freq, sw, axMult, extra, bgrnd, mult, spinspeed, t11, t22, t33, amp, lor, gauss):
     """
     Uses the quadCSAFunc function for the specific case where the quadrupole interaction is zero.
     """
-    shiftdef, numssb, angle, D2, weight, MAStype = extra
-    extra = [False, 0.5, numssb, angle, D2, None, weight, MAStype, shiftdef]
+    shiftdef, numssb, angle, D2, weight, MAStype = extra[:6]
+    extra = [False, 0.5, numssb, angle, D2, None, weight, MAStype, shiftdef] + list(extra[6:])
     return quadCSAFunc(x, freq, sw, axMult, extra, bgrnd, mult, spinspeed, t11, t22, t33, 0.0, 0.0, 0.0, 0.0, 0.0, amp, lor, gauss, 0)
 
 def quadFunc(x, freq, sw, axMult, extra, bgrnd, mult, spinspeed, pos, cq, eta, amp, lor, gauss, lorST):
     """
     Uses the quadCSAFunc function for the specific case where the CSA interaction is zero.
     """
-    satBool, I, numssb, angle, D2, D4, weight, MAStype = extra
-    extra = [satBool, I, numssb, angle, D2, D4, weight, MAStype, 0]
+    satBool, I, numssb, angle, D2, D4, weight, MAStype = extra[:8]
+    extra = [satBool, I, numssb, angle, D2, D4, weight, MAStype, 0] + list(extra[8:])
     return quadCSAFunc(x, freq, sw, axMult, extra, bgrnd, mult, spinspeed, pos, pos, pos, cq, eta, 0.0, 0.0, 0.0, amp, lor, gauss, lorST)
 
-def quadFreqBase(I, m1, m2, cq, eta, freq, angle, D2, D4, numssb, spinspeed):
+def quadFreqBase(I, m1, m2, cq, eta, freq, angle, D2, D4, numssb, spinspeed, phase=False):
     """
     Calculates the quadrupole frequencies for given alpha and beta angles and over a full circle over gamma.
 
@@ -849,11 +1359,14 @@ def quadFreqBase(I, m1, m2, cq, eta, freq, angle, D2, D4, numssb, spinspeed):
         The number of alpha angles to calculate.
     spinspeed : float
         The spinning frequency in Hz.
+    phase : bool, optional
+        If True, the phase (in radians) accumulated over the rotor period is returned instead of the frequencies for finite spinning (see csaFreqBase).
+        False by default.
 
     Returns
     -------
     ndarray
-        The array with frequencies. Has the same length as D2 and D4.
+        The array with frequencies (or phases). Has the same length as D2 and D4.
     float
         The isotropic frequency.
     """
@@ -883,14 +1396,15 @@ def quadFreqBase(I, m1, m2, cq, eta, freq, angle, D2, D4, numssb, spinspeed):
     elif spinspeed == 0.0:
         v = np.real(dat4[:, 4]  + dat2[:, 2] + dat0)
     else:
-        gammastep = 2 * np.pi / numssb
-        gval = np.arange(numssb) * gammastep
-        spinD2 = np.exp(1j * np.arange(-2, 3)[:, np.newaxis] * gval) * d2[:, np.newaxis]
-        spinD4 = np.exp(1j * np.arange(-4, 5)[:, np.newaxis] * gval) * d4[:, np.newaxis]
+        spinD2, phaseD2 = gammaTables(angle, numssb, 2)
+        spinD4, phaseD4 = gammaTables(angle, numssb, 4)
         vConstant = np.real(dat0 + dat2[:, 2] * factor2 + dat4[:, 4] * factor4)
         dat4[:, 4] = 0
         dat2[:, 2] = 0
-        v = np.matmul(dat2, spinD2) + np.matmul(dat4, spinD4)
+        if phase:
+            v = np.real(np.matmul(dat2, phaseD2) + np.matmul(dat4, phaseD4)) / spinspeed
+        else:
+            v = np.matmul(dat2, spinD2) + np.matmul(dat4, spinD4)
     return v, vConstant
 
 def quadCSAFunc(x, freq, sw, axMult, extra, bgrnd, mult, spinspeed, t11, t22, t33, cq, eta, alphaCSA, betaCSA, gammaCSA, amp, lor, gauss, lorST):
@@ -920,6 +1434,10 @@ def quadCSAFunc(x, freq, sw, axMult, extra, bgrnd, mult, spinspeed, t11, t22, t3
         weight are the weights corresponding to the orientations of D2 and D4.
         MAStype=0 performs a static simulation, MAStype=1 performs a finite spinning simulation, and MAStype=2 performs an infinite spinning simulation.
         shiftdef is the definition in which t11, t22, and t33 are given (see shiftConversion).
+        An optional tenth element with the triangles of an ASG angle set (see asg_angles) enables the interpolated powder averaging.
+        D2 and D4 then belong to the vertices and weight to the triangles. None uses the regular powder averaging.
+        Two optional booleans after that select the exact sideband phases and single precision of the carousel averaging
+        (the phase and single arguments of carouselAveraging), both False if not given.
     bgrnd : float
         The offset value added to the FID.
     mult : float
@@ -952,7 +1470,9 @@ def quadCSAFunc(x, freq, sw, axMult, extra, bgrnd, mult, spinspeed, t11, t22, t3
     betaCSA *= np.pi / 180.0    # Degrees to radians
     gammaCSA *= np.pi / 180.0   # Degrees to radians
     x = x[-1]
-    satBool, I, numssb, angle, D2, D4, weight, MAStype, shiftdef = extra
+    satBool, I, numssb, angle, D2, D4, weight, MAStype, shiftdef = extra[:9]
+    triangles = extra[9] if len(extra) > 9 else None
+    exact, single = extra[10:12] if len(extra) > 11 else (False, False)
     if MAStype == 0:
         spinspeed = 0.0
     elif MAStype == 2:
@@ -977,7 +1497,7 @@ def quadCSAFunc(x, freq, sw, axMult, extra, bgrnd, mult, spinspeed, t11, t22, t3
         mList = [-0.5]
     spectrum = np.zeros(len(x), dtype=complex)
     relativeD2 = D2tens(np.array([alphaCSA]), np.array([betaCSA]), np.array([gammaCSA]))
-    vCSA, vConstantCSA = csaFreqBase(angle, tensor, np.matmul(relativeD2, D2), spinspeed, numssb)
+    vCSA, vConstantCSA = csaFreqBase(angle, tensor, np.matmul(relativeD2, D2), spinspeed, numssb, exact)
     for m in mList:
         eff = I**2 + I - m * (m + 1)
         eff /= totalEff
@@ -985,17 +1505,22 @@ def quadCSAFunc(x, freq, sw, axMult, extra, bgrnd, mult, spinspeed, t11, t22, t3
             v = vCSA
             vConstant = vConstantCSA
         else:
-            v, vConstant = quadFreqBase(I, m, m+1, cq, eta, freq, angle, D2, D4, numssb, spinspeed)
+            v, vConstant = quadFreqBase(I, m, m+1, cq, eta, freq, angle, D2, D4, numssb, spinspeed, exact)
             v += vCSA
             vConstant += vConstantCSA
-        tot = weight
-        if spinspeed not in (0.0, np.inf):
-            v, tot = carouselAveraging(spinspeed, v, weight, vConstant)
+        if triangles is None:
+            tot = weight
+            if spinspeed not in (0.0, np.inf):
+                v, tot = carouselAveraging(spinspeed, v, weight, vConstant, exact, single)
+        else:
+            tot = 1.0                    # The weights of the triangles are applied in binTriangles
+            if spinspeed not in (0.0, np.inf):
+                v, tot = carouselAveraging(spinspeed, v, np.ones(len(v)), vConstant, exact, single)
         if m == -0.5:
             lb = lor
         else:
             lb = lorST
-        spectrum += eff * makeSpectrum(x, sw, v, gauss, lb, tot)
+        spectrum += eff * makeSpectrum(x, sw, v, gauss, lb, tot, triangles=triangles, area=weight)
     return mult * amp * spectrum
 
 def quadCzjzekFunc(x, freq, sw, axMult, extra, bgrnd, mult, pos, sigma, cq0, eta0, amp, lor, gauss):
@@ -1080,7 +1605,7 @@ def mqmasFunc(x, freq, sw, axMult, extra, bgrnd, mult, spinspeed, pos, sigmaCS,
     axMult : float
         The multiplier of the x-axis.
     extra : list
-        The extra parameters defined as [I, mq, numssb, angle, D2, D4, weight, shear, scale, MAStype].
+        The extra parameters defined as [I, mq, numssb, angle, D2, D4, weight, shear, scale, MAStype, foldF1, interpolate].
         I is the spin quantum number.
         mq is the multiple quantum transition that is used in the indirect dimension.
         numssb is the number of sidebands to be simulated.
@@ -1092,6 +1617,9 @@ def mqmasFunc(x, freq, sw, axMult, extra, bgrnd, mult, spinspeed, pos, sigmaCS,
         scale is the scaling factor of the indirect axis.
         MAStype=0 performs a static simulation, MAStype=1 performs a finite spinning simulation, and MAStype=2 performs an infinite spinning simulation.
         foldF1 (bool): calculates a folded spectrum in F1 if True
+        interpolate (bool, optional): divides the weight of every frequency linearly over the nearest points (see binFrequencies), False if not given.
+        exact, single (bool, optional): select the exact sideband phases and single precision of the carousel averaging
+        (the phase and single arguments of carouselAveraging), False if not given.
     bgrnd : float
         The offset value added to the FID.
     mult : float
@@ -1124,7 +1652,9 @@ def mqmasFunc(x, freq, sw, axMult, extra, bgrnd, mult, spinspeed, pos, sigmaCS,
     """
     freq1 = freq[-2]
     freq2 = freq[-1]
-    I, mq, numssb, angle, D2, D4, weight, shear, scale, MAStype, foldF1 = extra
+    I, mq, numssb, angle, D2, D4, weight, shear, scale, MAStype, foldF1 = extra[:11]
+    interpolate = extra[11] if len(extra) > 11 else False
+    exact, single = extra[12:14] if len(extra) > 13 else (False, False)
     if MAStype == 0:
         spinspeed = 0.0
     elif MAStype == 2:
@@ -1135,17 +1665,17 @@ def mqmasFunc(x, freq, sw, axMult, extra, bgrnd, mult, spinspeed, pos, sigmaCS,
     cq *= 1e6
     eta = 1 - abs(abs(eta)%2 - 1)
     tot = weight
-    v2, vConstant2 = quadFreqBase(I, -0.5, 0.5, cq, eta, freq2, angle, D2, D4, numssb, spinspeed)
-    v1, vConstant1 = quadFreqBase(I, -0.5*mq, 0.5*mq, cq, eta, freq2, angle, D2, D4, numssb, spinspeed)
+    v2, vConstant2 = quadFreqBase(I, -0.5, 0.5, cq, eta, freq2, angle, D2, D4, numssb, spinspeed, exact)
+    v1, vConstant1 = quadFreqBase(I, -0.5*mq, 0.5*mq, cq, eta, freq2, angle, D2, D4, numssb, spinspeed, exact)
     if spinspeed not in (0.0, np.inf):
-        v2, tot2 = carouselAveraging(spinspeed, v2, weight, vConstant2)
-        v1, tot1 = carouselAveraging(spinspeed, v1, np.ones_like(weight), vConstant1)
+        v2, tot2 = carouselAveraging(spinspeed, v2, weight, vConstant2, exact, single)
+        v1, tot1 = carouselAveraging(spinspeed, v1, np.ones_like(weight), vConstant1, exact, single)
         tot = tot1*tot2
     v2 += pos
     v1 += mq*pos - v2 * shear
     v1 *= scale
     slope = (mq-shear)*scale  # t1/t2 slope along which to apply CS gaussian distribution
-    return mult * amp * makeMQMASSpectrum(x, sw, [np.real(v1.flatten()), np.real(v2.flatten())], [0, sigmaCS], [lor1, lor2], np.real(tot).flatten(), slope, foldF1)
+    return mult * amp * makeMQMASSpectrum(x, sw, [np.real(v1.flatten()), np.real(v2.flatten())], [0, sigmaCS], [lor1, lor2], np.real(tot).flatten(), slope, foldF1, interpolate)
 
 def mqmasCzjzekFunc(x, freq, sw, axMult, extra, bgrnd, mult, pos, sigmaCS, sigma, cq0, eta0, amp, lor2, lor1, gauss2=0, gauss1=0):
     """
@@ -1236,7 +1766,7 @@ def mqmasCzjzekFunc(x, freq, sw, axMult, extra, bgrnd, mult, pos, sigmaCS, sigma
     fid = np.zeros((length1, length2), dtype=complex)
     for i, _ in enumerate(ind):
         fid[ind[i]-1] += newLib[i]
-    fid = np.fft.ifft(fid, axis=0)
+    fid = hc.ifft(fid, 0, overwrite=True)
     posIndirect = pos * (mq - shearFactor) * scale
     offsetMat = np.exp(2j * np.pi * (posIndirect * t1 + (pos - x[-1][length2//2])*t2))
     shiftGauss = np.exp(-((np.pi * np.abs(sigmaCS) * (t2 + t1*(mq-shearFactor)*scale))**2) / (4 * np.log(2)))
@@ -1246,9 +1776,83 @@ def mqmasCzjzekFunc(x, freq, sw, axMult, extra, bgrnd, mult, pos, sigmaCS, sigma
     apod1 = np.exp(-np.pi * np.abs(lor1 * t1) )
     fid *= offsetMat * apod1 * apod2 * shiftGauss
     shearMat = np.exp((shearFactor-shear) * 2j * np.pi * t1 * x[-1])
-    fid = np.fft.fft(fid, axis=1) * shearMat
+    fid = hc.fft(fid, 1, overwrite=True) * shearMat
     return mult * amp * fid * length1 / length2
 
+def powderExtra(func, extra, cheng, symm):
+    """
+    Replaces the orientations in the extra parameters of a powder function by a ZCW angle set.
+
+    Parameters
+    ----------
+    func : function
+        The powder function, should be a key of POWDERSLOTS.
+    extra : list
+        The extra parameters of func.
+    cheng : int
+        The Cheng number of the angle set.
+    symm : {0, 1, 2}
+        The symmetry of the angle set (see zcw_angles).
+
+    Returns
+    -------
+    list
+        The extra parameters with the new angle set.
+    """
+    extra = list(extra)
+    for index, value in zip(POWDERSLOTS[func], powderTensors(cheng, symm)):
+        if index is not None:
+            extra[index] = value
+    return extra
+
+def adaptivePowderFunc(x, freq, sw, axMult, extra, *parameters):
+    """
+    Simulates a powder FID with the smallest ZCW angle set for which the lineshape is converged.
+    The Cheng number is increased until the relative change of the FID is below the tolerance.
+    The chosen Cheng number is cached for the region of the parameters (rounded to two significant digits), such that later simulations with similar parameters only need a single simulation.
+
+    Parameters
+    ----------
+    x : list of ndarray
+        A list of axes values for the simulation.
+    freq : list of float
+        The list of frequency per dimension in Hz.
+    sw : list of float
+        The list of spectral width per dimension in Hz.
+    axMult : float
+        The multiplier of the x-axis.
+    extra : list
+        The extra parameters defined as [func, funcExtra, symm, tol, maxCheng].
+        func is the powder function to use, should be a key of POWDERSLOTS.
+        funcExtra are the extra parameters of func, the orientations in it are replaced.
+        symm is the symmetry of the ZCW angle set (see zcw_angles).
+        tol is the relative tolerance of the convergence.
+        maxCheng is the largest Cheng number that is used.
+    *parameters
+        The parameters of func.
+
+    Returns
+    -------
+    ndarray
+        The simulated FID
+    """
+    func, funcExtra, symm, tol, maxCheng = extra
+    key = (func.__name__, symm, tol, maxCheng, tuple(len(item) for item in x),
+           tuple(item for item in funcExtra if isinstance(item, (bool, int, float))),
+           tuple(float('%.2g' % item) for item in parameters))
+    if key in POWDERCACHE:
+        return func(x, freq, sw, axMult, powderExtra(func, funcExtra, POWDERCACHE[key], symm), *parameters)
+    previous = None
+    for cheng in range(ADAPTIVEMINCHENG, max(ADAPTIVEMINCHENG, maxCheng) + 1):
+        fid = func(x, freq, sw, axMult, powderExtra(func, funcExtra, cheng, symm), *parameters)
+        if previous is not None and np.linalg.norm(fid - previous) <= tol * np.linalg.norm(fid):
+            break
+        previous = fid
+    if len(POWDERCACHE) >= ADAPTIVECACHESIZE:
+        POWDERCACHE.clear()
+    POWDERCACHE[key] = cheng
+    return fid
+
 def genLib(length, minCq, maxCq, minEta, maxEta, numCq, numEta, extra, freq, sw, spinspeed):
     """
     Generate a library of FIDs for Czjzek distribution fitting.
@@ -1287,3 +1891,16 @@ def genLib(length, minCq, maxCq, minEta, maxEta, numCq, numEta, extra, freq, sw,
     for i, (cqi, etai) in enumerate(zip(cq, eta)):
         lib[i] = quadFunc([x], [freq], [sw], 1.0, extra, 0.0, 1.0, spinspeed, 0.0, cqi, etai, 1.0, 0.0, 0.0, 0.0)
     return lib, cq*1e6, eta
+
+MULTISITEFUNCS = {peakSim: peakSimMulti, peakSimFreq: peakSimFreqMulti}  # Functions that can simulate all sites in a single call
+POINTWISEFUNCS = {relaxationFunc, diffusionFunc, peakSimFreq}             # Functions that can be evaluated on any subset of the x-values
+POWDERSLOTS = {csaFunc: (3, None, 4),                                      # Indices of D2, D4, and weight in the extra parameters
+               quadFunc: (4, 5, 6),
+               quadCSAFunc: (4, 5, 6),
+               mqmasFunc: (4, 5, 6)}
+POWDERCACHE = {}          # Cheng numbers chosen by adaptivePowderFunc
+ADAPTIVEMINCHENG = 5      # Cheng number at which the adaptive powder averaging starts
+ADAPTIVEMAXCHENG = 20     # Default maximum Cheng number of the adaptive powder averaging
+ADAPTIVETOL = 0.01        # Default relative tolerance of the adaptive powder averaging
+ADAPTIVECACHESIZE = 10000 # Maximum number of cached parameter regions
+CAROUSELCHUNK = 2048      # Number of orientations per chunk in carouselAveraging
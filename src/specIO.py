@@ -28,7 +28,7 @@ import time
 class LoadException(sc.SpectrumException):
     pass
 
-def autoLoad(filePathList, asciiInfoList=None):
+def autoLoad(filePathList, asciiInfoList=None, single=False):
     """
     Loads and combines a list of files using the automatic routine.
     All data file should have the same shape in order for merging to work.
@@ -51,6 +51,9 @@ def autoLoad(filePathList, asciiInfoList=None):
         sw: float
             Spectral width in kHz
         If no info needs to be given 'None' should be passed
+    single: bool (optional)
+        If True, the data is stored in single precision (complex64).
+        False by default.
     Returns
     -------
     SpectrumClass:
@@ -60,7 +63,7 @@ def autoLoad(filePathList, asciiInfoList=None):
         filePathList = [filePathList]
     if asciiInfoList is None:
         asciiInfoList = [None] * len(filePathList)
-    masterData = autoLoadSingle(filePathList[0], asciiInfoList[0])
+    masterData = autoLoadSingle(filePathList[0], asciiInfoList[0], single)
     if isinstance(masterData, int) and len(filePathList) > 1:
         raise LoadException("ASCII data cannot be combined")
     if len(filePathList) == 1:
@@ -68,7 +71,7 @@ def autoLoad(filePathList, asciiInfoList=None):
     shapeRequired = masterData.shape()
     masterData.split(1, -1)
     for i in range(len(filePathList)-1):
-        addData = autoLoad(filePathList[i+1], asciiInfoList[i+1])
+        addData = autoLoad(filePathList[i+1], asciiInfoList[i+1], single)
         if addData is None:
             continue
         if addData.shape() != shapeRequired:
@@ -77,7 +80,7 @@ def autoLoad(filePathList, asciiInfoList=None):
     masterData.filePath = (filePathList, asciiInfoList)
     return masterData
 
-def autoLoadSingle(filePath, asciiInfo=None):
+def autoLoadSingle(filePath, asciiInfo=None, single=False):
     """
     Loads a single file using the automatic routine.
 
@@ -98,6 +101,9 @@ def autoLoadSingle(filePath, asciiInfo=None):
             Delimiter ('Tab','Space','Comma')
         sw: float
             Spectral width in kHz
+    single: bool (optional)
+        If True, the data is stored in single precision (complex64).
+        False by default.
     Returns
     -------
     SpectrumClass:
@@ -111,18 +117,18 @@ def autoLoadSingle(filePath, asciiInfo=None):
             temp_dir = tempfile.mkdtemp()
             zipfile.ZipFile(filePath).extractall(temp_dir)
             for i in os.listdir(temp_dir):
-                tmpSpec = loadFile(os.path.join(temp_dir, i), realpath=filePath, asciiInfo=asciiInfo)
+                tmpSpec = loadFile(os.path.join(temp_dir, i), realpath=filePath, asciiInfo=asciiInfo, single=single)
                 if tmpSpec:
                     break
         finally:
             shutil.rmtree(temp_dir)
     else:
-        tmpSpec = loadFile(filePath, asciiInfo=asciiInfo)
+        tmpSpec = loadFile(filePath, asciiInfo=asciiInfo, single=single)
     if isinstance(tmpSpec, sc.Spectrum):
         tmpSpec.filePath = ([filePath], [asciiInfo])
     return tmpSpec
 
-def loadFile(filePath, realpath=False, asciiInfo=None):
+def loadFile(filePath, realpath=False, asciiInfo=None, single=False):
     """
     Loads file from filePath using the correct routine.
 
@@ -145,6 +151,9 @@ def loadFile(filePath, realpath=False, asciiInfo=None):
             Delimiter ('Tab','Space','Comma')
         sw: float
             Spectral width in kHz
+    single: bool (optional)
+        If True, the data is stored in single precision (complex64).
+        False by default.
     Returns
     -------
     SpectrumClass:
@@ -158,9 +167,9 @@ def loadFile(filePath, realpath=False, asciiInfo=None):
     if num is None:
         return
     if num == 0:
-        masterData = loadVarianFile(filePath)
+        masterData = loadVarianFile(filePath, single)
     elif num == 1:
-        masterData = loadBrukerTopspin(filePath)
+        masterData = loadBrukerTopspin(filePath, single)
     elif num == 2:
         masterData = loadChemFile(filePath)
     elif num == 3:
@@ -199,6 +208,9 @@ def loadFile(filePath, realpath=False, asciiInfo=None):
         masterData = loadBrukerImagingTime(filePath)
     elif num == 19:
         masterData = loadDMfit(filePath)
+    dtype = np.dtype(np.complex64 if single else np.complex128)
+    if masterData.data.dtype() != dtype:
+        masterData.data = masterData.data.astype(dtype)
     masterData.rename(name)
     return masterData
 
@@ -341,7 +353,7 @@ def varianGetPars(procpar):
         pars[name] = val
     return pars
 
-def loadVarianFile(filePath):
+def loadVarianFile(filePath, single=False):
     """
     Loads a Varian/Agilent file.
 
@@ -349,6 +361,9 @@ def loadVarianFile(filePath):
     ----------
     filePath: string
         Path to the file that should be loaded
+    single: bool (optional)
+        If True, the data is stored in single precision (complex64).
+        False by default.
 
     Returns
     -------
@@ -400,7 +415,7 @@ def loadVarianFile(filePath):
             else:
                 bitType = ['>h', np.int16, 14]
         totalpoints = (ntraces * npoints + nbheaders**2 * bitType[2])*nblocks
-        fid = np.fromfile(f, bitType[1], totalpoints).newbyteorder(bitType[0]).astype(np.complex128)
+        fid = np.fromfile(f, bitType[1], totalpoints).newbyteorder(bitType[0]).astype(np.complex64 if single else np.complex128)
         if not spec or (spec and not hypercomplex):
             fid = fid.reshape(nblocks, int(totalpoints / nblocks))
             fid = fid[:, bitType[2]::] # Cut off block headers
@@ -1270,7 +1285,7 @@ def getBrukerFilter(pars):
 
     raise NameError("DSPFVS="+str(dspfvs)+" not implemented")
 
-def loadBrukerTopspin(filePath):
+def loadBrukerTopspin(filePath, single=False):
     """
     Loads Bruker Topspin/Xwinnmr data (i.e. fid/ser time-domain data). Looks for SF parameters (reference frequencies) 
     in all processing sub folders matching the acquisition dimensionality (1D, ..., nD)
@@ -1283,6 +1298,9 @@ def loadBrukerTopspin(filePath):
     ----------
     filePath: string
         Path to the file that should be loaded. The file can be part of path or not.
+    single: bool (optional)
+        If True, the data is stored in single precision (complex64).
+        False by default.
 
     Returns
     -------
@@ -1402,7 +1420,7 @@ def loadBrukerTopspin(filePath):
     
     if os.path.exists(Dir + os.path.sep + file):
         with open(Dir + os.path.sep + file, "rb") as f:
-            raw = np.fromfile(f, DtypeA, totsize).astype(float)
+            raw = np.fromfile(f, DtypeA, totsize).astype(np.float32 if single else float)
 
     raw = raw.reshape(shaperaw)
     # moveaxis to restore natural order (array dimensions match acquns entries)
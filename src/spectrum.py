@@ -18,6 +18,7 @@
 # along with ssNake. If not, see <http://www.gnu.org/licenses/>.
 
 import copy
+import functools
 import multiprocessing
 import itertools
 import scipy.optimize
@@ -27,6 +28,7 @@ import functions as func
 import hypercomplex as hc
 
 AUTOPHASETOL = 0.0002 #is ~0.01 degrees
+DATAVERSIONS = itertools.count(1)  # Source of the data version numbers, unique within a session
 
 
 class SpectrumException(Exception):
@@ -104,6 +106,8 @@ class Spectrum(object):
         self.undoList = []
         self.redoList = []
         self.noUndo = False
+        self.dataVersion = next(DATAVERSIONS)  # Changes whenever the data is changed, used as key for cached display data
+        self.sliceVersions = {}  # Data versions of the slices taken with getSlice since the last change
         if spec is None:
             self.spec = [0] * self.ndim()
         else:
@@ -180,6 +184,15 @@ class Spectrum(object):
             The message to add to the history list.
         """
         self.history.append(msg)
+        self.bumpVersion()
+
+    def bumpVersion(self):
+        """
+        Gives the spectrum a new data version.
+        Every operation that changes the data calls this via addHistory, so display caches keyed on the version are invalidated.
+        """
+        self.dataVersion = next(DATAVERSIONS)
+        self.sliceVersions = {}
 
     def removeFromHistory(self, num=1):
         """
@@ -267,7 +280,7 @@ class Spectrum(object):
         Reloads the data based on the filePath of this spectrum.
         """
         import specIO as io
-        loadData = io.autoLoad(*self.filePath)
+        loadData = io.autoLoad(*self.filePath, single=self.isSinglePrecision())
         self.restoreData(loadData, None)
 
     def checkAxis(self, axis):
@@ -691,15 +704,16 @@ class Spectrum(object):
         if not self.noUndo:
             self.undoList.append(lambda self: self.normalize(1.0 / mult, scale, type, axis, select=select))
 
-    def baselineCorrection(self, baseline, axis=-1, select=slice(None), degree=None, type=None):
+    def baselineCorrection(self, baseline=None, axis=-1, select=slice(None), degree=None, type=None, bArray=None):
         """
         Applies a baseline correction.
 
         Parameters
         ----------
-        baseline : array_like
+        baseline : array_like, optional
             The baseline to subtract.
-            It follows the Numpy broadcasting rules.
+            A 1D baseline is subtracted from every trace along axis, otherwise it follows the Numpy broadcasting rules.
+            When None, a baseline is fitted through every trace (see functions.baselineFit).
         axis : int, optional
             The dimension along which the baseline correction is performed.
             By default the last dimension is used.
@@ -707,12 +721,32 @@ class Spectrum(object):
             An optional selection of the spectrum data on which the baseline correction is performed.
             By default the entire data is used.
         degree : int, optional
-            The degree used for the fitting of the baseline, used for history output only.
+            The degree used for the fitting of the baseline.
+            Only used for history output when baseline is given.
         type : str, optional
-            The type (poly or sin/cos) used for the fitting, used for history output only.
+            The type (poly, sin/cos, spline or als) used for the fitting.
+            Only used for history output when baseline is given.
+        bArray : ndarray, optional
+            Boolean array along axis with the points used for the fit when baseline is None.
+            By default the baseline points are detected automatically.
+
+        Raises
+        ------
+        SpectrumException
+            When baseline is None and no degree or type is given.
         """
         axis = self.checkAxis(axis)
-        baselinetmp = baseline.reshape((self.shape()[axis], ) + (1, ) * (self.ndim() - axis - 1))
+        if baseline is None:
+            if degree is None or type is None:
+                raise SpectrumException("Baseline correction: the degree and type of the fit should be given")
+            tmpData = np.real(self.data.getHyperData(0))
+            if bArray is None:
+                bArray = func.autoBaselinePoints(tmpData, axis)
+            baseline = func.baselineFit(self.xaxArray[axis], tmpData, bArray, degree, type, axis)[select]
+        if np.ndim(baseline) == 1:
+            baselinetmp = baseline.reshape((self.shape()[axis], ) + (1, ) * (self.ndim() - axis - 1))
+        else:
+            baselinetmp = baseline
         self.data[select] -= baselinetmp
         Message = "Baseline corrected dimension " + str(axis + 1)
         if not isinstance(select, slice):
@@ -1330,7 +1364,7 @@ class Spectrum(object):
             copyData = copy.deepcopy(self)
         tmpSpec = np.fft.ifftshift(np.real(refSpec))
         pos = np.argmax(tmpSpec)
-        refFid = np.fft.ifft(tmpSpec)
+        refFid = hc.ifft(tmpSpec)
         if self.spec[axis] > 0:
             self.__invFourier(axis, tmp=True)
         t = np.arange(axLen) / self.sw[axis]
@@ -1537,14 +1571,39 @@ class Spectrum(object):
         if not self.noUndo:
             self.undoList.append(lambda self: self.phase(-phase0, -phase1, 0, axis))
 
-    def __phase(self, phase0, phase1, phase2, offset, axis, select=slice(None)):
+    def phaseVector(self, phase0, phase1, phase2, offset, axis):
+        """
+        Returns the phase correction of a spectrum along a given dimension.
+
+        Parameters
+        ----------
+        phase0 : float
+            Zero order phase.
+        phase1 : float
+            First order phase.
+        phase2 : float
+            Second order phase.
+        offset : float
+            The offset frequency for the first order phase correction.
+        axis : int
+            The dimension.
+
+        Returns
+        -------
+        ndarray
+            The 1-D complex vector with which the spectrum is multiplied.
+        """
         points = np.fft.fftshift(np.fft.fftfreq(self.shape()[axis], 1.0 / self.sw[axis]) + offset) / self.sw[axis]
         vector = np.exp(points * phase1 * 1j + np.power(points, 2) * phase2 * 1j)
+        return np.exp(phase0 * 1j) * vector
+
+    def __phase(self, phase0, phase1, phase2, offset, axis, select=slice(None)):
+        vector = self.phaseVector(phase0, phase1, phase2, offset, axis)
         if self.spec[axis] == 0:
             self.__fourier(axis, tmp=True)
         vector = vector.reshape(vector.shape + (1, )*(self.ndim()-axis-1))
         self.data.icomplexReorder(axis)
-        self.data[select] *= np.exp(phase0 * 1j) * vector
+        self.data[select] *= vector
         self.data.icomplexReorder(axis)
         if self.spec[axis] == 0:
             self.__invFourier(axis, tmp=True)
@@ -1820,7 +1879,7 @@ class Spectrum(object):
             else:
                 self.undoList.append(lambda self: self.setRef(oldRef, axis))
 
-    def regrid(self, limits, numPoints, axis=-1):
+    def regrid(self, limits, numPoints, axis=-1, method='linear'):
         """
         Regrids the data along a dimension to match a given number of points.
 
@@ -1833,7 +1892,11 @@ class Spectrum(object):
         axis : int, optional
             The dimension.
             By default the last dimension is used.
+        method : str, optional
+            The interpolation method, one of hypercomplex.REGRIDMETHODS.
+            Defaults to 'linear'.
         """
+        axis = self.checkAxis(axis)
         if not self.noUndo:
             copyData = copy.deepcopy(self)
         newSw = (limits[1] - limits[0]) / (numPoints - 1) * numPoints
@@ -1842,7 +1905,7 @@ class Spectrum(object):
         newFreq = self.freq[axis] + (newAxis[0] + newAxis[-1]) / 2
         if numPoints % 2 == 0:
             newFreq += newSw / numPoints / 2
-        self.data = self.data.regrid(newAxis, self.xaxArray[axis], axis)
+        self.data = self.data.regrid(newAxis, self.xaxArray[axis], axis, method)
         self.sw[axis] = newSw
         if self.ref[axis] is None:  # Set new 0 freq to those of the old view, if needed
             self.ref[axis] = self.freq[axis]
@@ -1850,10 +1913,13 @@ class Spectrum(object):
             newFreq += - self.freq[axis] + self.ref[axis]
         self.freq[axis] = newFreq
         self.resetXax(axis)
-        self.addHistory("Regrid dimension " + str(axis) + " between " + str(limits[0]) + ' and ' + str(limits[1]) + ' with ' + str(numPoints) + ' points')
+        Message = "Regrid dimension " + str(axis) + " between " + str(limits[0]) + ' and ' + str(limits[1]) + ' with ' + str(numPoints) + ' points'
+        if method != 'linear':
+            Message = Message + ' (' + method + ')'
+        self.addHistory(Message)
         self.redoList = []
         if not self.noUndo:
-            self.undoList.append(lambda self: self.restoreData(copyData, lambda self: self.regrid(limits, numPoints, axis)))
+            self.undoList.append(lambda self: self.restoreData(copyData, lambda self: self.regrid(limits, numPoints, axis, method)))
 
     def setWholeEcho(self, val, axis=-1):
         """
@@ -1874,6 +1940,40 @@ class Spectrum(object):
         if not self.noUndo:
             self.undoList.append(lambda self: self.setWholeEcho(not val, axis))
 
+    def setPrecision(self, single):
+        """
+        Sets the precision in which the data is stored and processed.
+
+        Parameters
+        ----------
+        single : bool
+            If True, the data is stored as complex64 (single precision), otherwise as complex128 (double precision).
+        """
+        dtype = np.dtype(np.complex64 if single else np.complex128)
+        if self.data.dtype() == dtype:
+            return
+        if not self.noUndo and single:
+            copyData = copy.deepcopy(self)
+        self.data = self.data.astype(dtype)
+        self.addHistory("Precision set to " + ("single" if single else "double"))
+        self.redoList = []
+        if not self.noUndo:
+            if single:
+                self.undoList.append(lambda self: self.restoreData(copyData, lambda self: self.setPrecision(single)))
+            else:
+                self.undoList.append(lambda self: self.setPrecision(True))
+
+    def isSinglePrecision(self):
+        """
+        Returns whether the data is stored in single precision.
+
+        Returns
+        -------
+        bool
+            True if the data is stored as complex64.
+        """
+        return self.data.dtype() == np.complex64
+
     def resize(self, size, pos, axis=-1):
         """
         Resizes the data along a dimension by zerofilling in the time domain.
@@ -1908,7 +2008,7 @@ class Spectrum(object):
         if not self.noUndo:
             self.undoList.append(lambda self: self.restoreData(copyData, lambda self: self.resize(size, pos, axis)))
 
-    def lpsvd(self, nPredict, maxFreq, forward=False, numPoints=None, axis=-1):
+    def lpsvd(self, nPredict, maxFreq, forward=False, numPoints=None, axis=-1, fast=False):
         """
         Performs linear prediction using the LPSVD algorithm.
 
@@ -1928,6 +2028,9 @@ class Spectrum(object):
         axis : int, optional
             The dimension.
             By default the last dimension is used.
+        fast : bool, optional
+            If True, a randomized SVD limited to maxFreq components is used (see functions.lpsvd).
+            False by default.
 
         Raises
         ------
@@ -1942,7 +2045,18 @@ class Spectrum(object):
         if self.spec[axis]:
             self.__invFourier(axis, tmp=True)
         try:
-            self.data = self.data.apply_along_axis(func.lpsvd, axis, nPredict, maxFreq, forward, numPoints)
+            # The traces are predicted in parallel
+            tmpData = np.moveaxis(self.data.data, axis + 1, -1)
+            tmpShape = tmpData.shape
+            tmpData = tmpData.reshape(-1, tmpShape[-1])
+            lpFunc = functools.partial(func.lpsvd, nPredict=nPredict, maxFreq=maxFreq, forward=forward, L=numPoints, fast=fast)
+            if len(tmpData) > 1 and multiprocessing.cpu_count() > 1:
+                with multiprocessing.Pool(min(multiprocessing.cpu_count(), len(tmpData))) as pool:
+                    tmpData = pool.map(lpFunc, tmpData)
+            else:
+                tmpData = [lpFunc(trace) for trace in tmpData]
+            tmpData = np.moveaxis(np.array(tmpData).reshape(tmpShape[:-1] + (-1, )), -1, axis + 1)
+            self.data = hc.HComplexData(tmpData, np.copy(self.data.hyper), self.data.dtype())
         except Exception:
             failed = True
         if self.spec[axis]:
@@ -1952,12 +2066,12 @@ class Spectrum(object):
             raise SpectrumException('LPSVD: Could not determine any acceptable values')
         self.resetXax(axis)
         if forward:
-            self.addHistory("Forward LPSVD along axis " + str(axis) + " with " + str(nPredict) + " points, max " + str(maxFreq) + " frequencies")
+            self.addHistory("Forward LPSVD along axis " + str(axis) + " with " + str(nPredict) + " points, max " + str(maxFreq) + " frequencies" + (" (fast)" if fast else ""))
         else:
-            self.addHistory("Backward LPSVD along axis " + str(axis) + " with " + str(nPredict) + " points, max " + str(maxFreq) + " frequencies")
+            self.addHistory("Backward LPSVD along axis " + str(axis) + " with " + str(nPredict) + " points, max " + str(maxFreq) + " frequencies" + (" (fast)" if fast else ""))
         self.redoList = []
         if not self.noUndo:
-            self.undoList.append(lambda self: self.restoreData(copyData, lambda self: self.lpsvd(nPredict, maxFreq, forward, numPoints, axis)))
+            self.undoList.append(lambda self: self.restoreData(copyData, lambda self: self.lpsvd(nPredict, maxFreq, forward, numPoints, axis, fast)))
 
     def setSpec(self, val, axis=-1):
         """
@@ -2106,9 +2220,10 @@ class Spectrum(object):
         if not self.noUndo:
             self.undoList.append(lambda self: self.roll(-shift, axis, select, shift_axis))
 
-    def align(self, pos1=None, pos2=None, axis=-1):
+    def align(self, pos1=None, pos2=None, axis=-1, subPoint=False):
         """
         Aligns the maxima between given indices along a certain dimension.
+        All traces are shifted with respect to the first trace in a single operation.
 
         Parameters
         ----------
@@ -2119,6 +2234,11 @@ class Spectrum(object):
         axis : int, optional
             The dimension.
             By default the last dimension is used.
+        subPoint : bool, optional
+            If True, the shifts are determined with sub-point precision from the cross-correlation with the first trace (see functions.correlationShift),
+            and the traces are rolled by a phase ramp in the Fourier domain.
+            Otherwise the positions of the maxima are used and the traces are rolled by an integer number of points.
+            False by default.
 
         Raises
         ------
@@ -2141,19 +2261,20 @@ class Spectrum(object):
         minPos = min(pos1, pos2)
         maxPos = max(pos1, pos2)
         slicing = (slice(None), ) * axis + (slice(minPos, maxPos), )
-        tmp = self.data[slicing].argmax(axis=axis)
-        maxArgPos = -np.array(tmp.data, dtype=int)
-        maxArgPos -= maxArgPos.flatten()[0]
-        shape = self.data.shape()
-        shape = np.delete(shape, axis)
-        rangeList = [range(i) for i in shape]
-        for i in itertools.product(*rangeList):
-            selectList = np.insert(np.array(i, dtype=object), axis, slice(None))
-            self.data[selectList] = self.data[selectList].roll(maxArgPos[0][tuple(i)], 0)
-        self.addHistory("Maxima aligned between " + str(minPos) + " and " + str(maxPos) + " along axis " + str(axis))
+        region = self.data.getHyperData(0)[slicing]
+        if subPoint:
+            reference = np.moveaxis(region, axis, -1).reshape(-1, maxPos - minPos)[0]
+            shifts = func.correlationShift(region, reference, axis)
+            tmpData = hc.fourierRollData(self.data.data, shifts[np.newaxis], axis + 1)
+            self.data = hc.HComplexData(tmpData, np.copy(self.data.hyper), self.data.dtype())
+        else:
+            shifts = -np.argmax(np.real(region), axis=axis)
+            shifts -= shifts.flatten()[0]
+            self.data = self.data.roll(shifts, axis)
+        self.addHistory("Maxima aligned between " + str(minPos) + " and " + str(maxPos) + " along axis " + str(axis) + (" with sub-point precision" if subPoint else ""))
         self.redoList = []
         if not self.noUndo:
-            self.undoList.append(lambda self: self.restoreData(copyData, lambda self: self.align(pos1, pos2, axis)))
+            self.undoList.append(lambda self: self.restoreData(copyData, lambda self: self.align(pos1, pos2, axis, subPoint)))
 
     def __fourier(self, axis, tmp=False, reorder=None):
         axis = self.checkAxis(axis)
@@ -2162,9 +2283,10 @@ class Spectrum(object):
         if reorder[0]:
             self.data.icomplexReorder(axis)
         if not self.wholeEcho[axis] and not tmp:
-            slicing = (slice(None), ) * axis + (0, )
-            self.data[slicing] = self.data[slicing] * 0.5
-        self.data = self.data.fft(axis).fftshift(axis)
+            # Scale the first point directly in the data array, indexing HComplexData would copy it
+            slicing = (slice(None), ) * (axis + 1) + (0, )
+            self.data.data[slicing] *= 0.5
+        self.data.fft(axis, shift=True, inplace=True)
         if not tmp:
             self.spec[axis] = 1
         if reorder[1]:
@@ -2177,10 +2299,10 @@ class Spectrum(object):
             reorder = [True, True]
         if reorder[0]:
             self.data.icomplexReorder(axis)
-        self.data = self.data.ifftshift(axis).ifft(axis)
+        self.data.ifft(axis, shift=True, inplace=True)
         if not self.wholeEcho[axis] and not tmp:
-            slicing = (slice(None), ) * axis + (0, )
-            self.data[slicing] *= 2.0
+            slicing = (slice(None), ) * (axis + 1) + (0, )
+            self.data.data[slicing] *= 2.0
         if not tmp:
             self.spec[axis] = 0
         if reorder[1]:
@@ -2373,7 +2495,7 @@ class Spectrum(object):
         pool.close()
         pool.join()
         tmpData = np.rollaxis(np.array(fit.get()).reshape(tmpShape), -1, axis)
-        self.data = hc.HComplexData(tmpData)
+        self.data = hc.HComplexData(tmpData, dtype=self.data.dtype())
         self.__invFourier(axis, tmp=True)  # Transform back to FID
         self.addHistory("Fast Forward Maximum Entropy reconstruction of dimension " + str(axis + 1) + " at positions " + str(pos))
         self.redoList = []
@@ -2412,18 +2534,18 @@ class Spectrum(object):
         posList = np.unique(posList)
         self.data.icomplexReorder(axis)
         tmpData = self.data.getHyperData(0)
-        tmpData = np.rollaxis(np.fft.fft(tmpData, axis=axis), axis, tmpData.ndim)
+        tmpData = np.rollaxis(hc.fft(tmpData, axis), axis, tmpData.ndim)
         tmpShape = tmpData.shape
         tmpData = tmpData.reshape((int(tmpData.size / tmpShape[-1]), tmpShape[-1]))
         mask = np.ones(tmpShape[-1]) / float(tmpShape[-1])
         mask[posList] = 0.0
-        mask = np.fft.fft(mask) # abs or real???
+        mask = hc.fft(mask) # abs or real???
         pool = multiprocessing.Pool(multiprocessing.cpu_count())
         fit = pool.map_async(nus.clean, [(i, mask, gamma, threshold, maxIter) for i in tmpData])
         pool.close()
         pool.join()
         tmpData = np.rollaxis(np.array(fit.get()).reshape(tmpShape), -1, axis)
-        self.data = hc.HComplexData(tmpData)
+        self.data = hc.HComplexData(tmpData, dtype=self.data.dtype())
         self.__invFourier(axis, tmp=True)  # Transform back to FID
         self.addHistory("CLEAN reconstruction (gamma = " + str(gamma) + " , threshold = " + str(threshold) + " , maxIter = " + str(maxIter) + ") " + "of dimension " + str(axis + 1) + " at positions " + str(pos))
         self.redoList = []
@@ -2461,7 +2583,7 @@ class Spectrum(object):
             posList = np.array(np.floor(posList / 2), dtype=int)
         elif typeVal == 2:  # type is TPPI, for now handle the same as Complex
             pass
-        NDmax = np.max(np.max(np.abs(np.real(np.fft.fft(tmpData, axis=axis))))) #Get max of ND matrix
+        NDmax = np.max(np.max(np.abs(np.real(hc.fft(tmpData, axis))))) #Get max of ND matrix
         tmpData = np.rollaxis(tmpData, axis, tmpData.ndim)
         tmpShape = tmpData.shape
         tmpData = tmpData.reshape((int(tmpData.size / tmpShape[-1]), tmpShape[-1]))
@@ -2470,7 +2592,7 @@ class Spectrum(object):
         pool.close()
         pool.join()
         tmpData = np.rollaxis(np.array(fit.get()).reshape(tmpShape), -1, axis)
-        self.data = hc.HComplexData(tmpData)
+        self.data = hc.HComplexData(tmpData, dtype=self.data.dtype())
         self.__invFourier(axis, tmp=True)  # Transform back to FID
         self.addHistory("IST reconstruction (threshold = " + str(threshold) + " , maxIter = " + str(maxIter) + " , tracelimit = " + str(tracelimit*100) + ") " + "of dimension " + str(axis + 1) + " at positions " + str(pos))
         self.redoList = []
@@ -2519,6 +2641,11 @@ class Spectrum(object):
                                            history=self.history,
                                            name=self.name))
         sliceSpec.noUndo = True
+        # The same slice of unchanged data gets the same version, so the caches of the slice are reused
+        sliceKey = repr((list(axes), list(locList)))
+        if sliceKey not in self.sliceVersions:
+            self.sliceVersions[sliceKey] = sliceSpec.dataVersion
+        sliceSpec.dataVersion = self.sliceVersions[sliceKey]
         return sliceSpec
 
     def restoreData(self, copyData, returnValue):
@@ -110,6 +110,14 @@ class PlotFrame(object):
         """Dummy method"""
         pass
 
+    def drawEvent(self, event):
+        """Dummy method"""
+        pass
+
+    def setFullResolution(self, full):
+        """Dummy method"""
+        pass
+
     ################
     # mouse events #
     ################
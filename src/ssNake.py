@@ -80,6 +80,7 @@ importList = [['matplotlib.figure', 'Figure', 'Figure'],
               ['saveFigure', 'SaveFigureWindow', 'SaveFigureWindow'],
               ['functions', 'func', None],
               ['specIO', 'io', None],
+              ['processChain', 'pc', None],
               ['views', 'views', None],
               ['simFunctions', 'sim', None],
               ['loadIsotopes', 'loadIsotopes', None],
@@ -252,6 +253,9 @@ class MainProgram(QtWidgets.QMainWindow):
         self.defaultStartupBool = False
         self.defaultStartupDir = '~'
         self.defaultTooltips = True
+        self.defaultFftBackend = 'scipy' if 'scipy' in hc.FFTBACKENDS else 'numpy'
+        self.defaultFftWorkers = 0
+        self.defaultSinglePrecision = False
         self.defaultToolbarActionList = ['File --> Open',
                                          'File -- > Save --> Matlab',
                                          'File --> Export --> Figure',
@@ -354,6 +358,16 @@ class MainProgram(QtWidgets.QMainWindow):
         except TypeError:
             self.dispMsg("Incorrect value in the config file for the contour/height_ratio")
         self.defaultSecondOrderPhaseDialog = settings.value("phasing/second_order_phase_dialog", self.defaultSecondOrderPhaseDialog, bool)
+        self.defaultFftBackend = settings.value("processing/fftbackend", self.defaultFftBackend, str)
+        if not str(self.defaultFftBackend) in hc.FFTBACKENDS:
+            self.dispMsg("FFT library in config file is not available")
+            self.defaultFftBackend = 'numpy'
+        try:
+            self.defaultFftWorkers = settings.value("processing/fftworkers", self.defaultFftWorkers, int)
+        except TypeError:
+            self.dispMsg("Incorrect value in the config file for the processing/fftworkers")
+        self.defaultSinglePrecision = settings.value("processing/single_precision", self.defaultSinglePrecision, bool)
+        hc.setFftBackend(self.defaultFftBackend, self.defaultFftWorkers)
 
     def saveDefaults(self):
         QtCore.QSettings.setDefaultFormat(QtCore.QSettings.IniFormat)
@@ -392,6 +406,9 @@ class MainProgram(QtWidgets.QMainWindow):
         settings.setValue("contour/diagonalmult", self.defaultDiagonalMult)
         settings.setValue("2Dcolor/colourmap", self.defaultPColorMap)
         settings.setValue("phasing/second_order_phase_dialog", self.defaultSecondOrderPhaseDialog)
+        settings.setValue("processing/fftbackend", self.defaultFftBackend)
+        settings.setValue("processing/fftworkers", self.defaultFftWorkers)
+        settings.setValue("processing/single_precision", self.defaultSinglePrecision)
 
     def dispMsg(self, msg, color='black'):
         if color == 'red':
@@ -622,13 +639,16 @@ class MainProgram(QtWidgets.QMainWindow):
         self.noUndoAct = QtWidgets.QAction("&No Undo Mode", self.editmenu, checkable=True)
         self.noUndoAct.toggled.connect(self.noUndoMode)
         self.editmenu.addAction(self.noUndoAct)
+        self.singlePrecisionAct = QtWidgets.QAction("&Single Precision", self.editmenu, checkable=True)
+        self.singlePrecisionAct.triggered.connect(self.singlePrecisionMode)
+        self.editmenu.addAction(self.singlePrecisionAct)
         self.clearundoAct = self.editmenu.addAction(QtGui.QIcon(IconDirectory + 'delete.png'), "&Clear Undo/Redo List", lambda: self.mainWindowCheck(lambda mainWindow: mainWindow.clearUndo()))
         self.clearundoAct.setToolTip('Clear Undo/Redo List')
         self.reloadAct = self.editmenu.addAction(QtGui.QIcon(IconDirectory + 'reload.png'), "Re&load", lambda: self.mainWindowCheck(lambda mainWindow: mainWindow.reloadLast()), QtGui.QKeySequence.Refresh)
         self.reloadAct.setToolTip('Reload Current Data')
         self.monitorAct = self.editmenu.addAction(QtGui.QIcon(IconDirectory + 'monitor.png'), "&Monitor", lambda: self.mainWindowCheck(lambda mainWindow: MonitorWindow(mainWindow)))
         self.monitorAct.setToolTip('Monitor Current Data')
-        self.editActList = [self.undoAction, self.redoAction, self.clearundoAct, self.noUndoAct, self.reloadAct, self.monitorAct]
+        self.editActList = [self.undoAction, self.redoAction, self.clearundoAct, self.noUndoAct, self.singlePrecisionAct, self.reloadAct, self.monitorAct]
         # the tool drop down menu
         self.toolMenu = QtWidgets.QMenu("&Tools", self)
         self.menubar.addMenu(self.toolMenu)
@@ -986,6 +1006,7 @@ class MainProgram(QtWidgets.QMainWindow):
                     self.noUndoAct.setChecked(True)
                 else:
                     self.noUndoAct.setChecked(False)
+                self.singlePrecisionAct.setChecked(self.mainWindow.masterData.isSinglePrecision())
                 if len(self.mainWindow.masterData.shape()) < 2:
                     for i in self.multiDActions:
                         i.setEnabled(False)
@@ -1338,6 +1359,10 @@ class MainProgram(QtWidgets.QMainWindow):
         self.mainWindow.current.setNoUndo(val)
         self.menuCheck()
 
+    def singlePrecisionMode(self, val):
+        self.mainWindow.current.setPrecision(val)
+        self.menuCheck()
+
     def changeMainWindow(self, var):
         if not self.allowChange:
             return
@@ -1491,7 +1516,7 @@ class MainProgram(QtWidgets.QMainWindow):
                 self.lastLocation = os.path.dirname(filePath)  # Save used path
             if not filePath:
                 return
-            masterData = io.autoLoad(filePath)
+            masterData = io.autoLoad(filePath, single=self.defaultSinglePrecision)
             if masterData is None:
                 raise SsnakeException("Could not load data")
             if masterData == -1:
@@ -1500,7 +1525,7 @@ class MainProgram(QtWidgets.QMainWindow):
                     if dialog.closed:
                         return
                 asciiInfo = (dialog.dataDimension, dialog.dataOrder, dialog.dataSpec, dialog.delim, dialog.sw, dialog.axisMulti)
-                masterData = io.autoLoad(filePath, [asciiInfo])
+                masterData = io.autoLoad(filePath, [asciiInfo], self.defaultSinglePrecision)
             if self.defaultAskName:
                 name = self.askName(filePath, masterData.name)
                 if name is None:
@@ -1532,7 +1557,7 @@ class MainProgram(QtWidgets.QMainWindow):
         return fileName
 
     def loadAndCombine(self, filePathList):
-        masterData = io.autoLoad(filePathList)
+        masterData = io.autoLoad(filePathList, single=self.defaultSinglePrecision)
         wsname = self.askName()
         if wsname is None:
             return
@@ -1704,6 +1729,7 @@ class Main1DWindow(QtWidgets.QWidget):
         self.canvas.mpl_connect('button_release_event', self.buttonRelease)
         self.canvas.mpl_connect('motion_notify_event', self.pan)
         self.canvas.mpl_connect('scroll_event', self.scroll)
+        self.canvas.mpl_connect('draw_event', self.drawEvent)
         self.canvas.setFocusPolicy(QtCore.Qt.ClickFocus)
         self.canvas.setFocus()
 
@@ -1722,6 +1748,9 @@ class Main1DWindow(QtWidgets.QWidget):
     def scroll(self, event):
         self.current.scroll(event)
 
+    def drawEvent(self, event):
+        self.current.drawEvent(event)
+
     def get_mainWindow(self):
         return self
 
@@ -1765,13 +1794,17 @@ class Main1DWindow(QtWidgets.QWidget):
         self.father.menuCheck()
 
     def runMacro(self, macro, display=True):
-        for i, _ in enumerate(macro):
-            iter1 = macro[i] # Do not loop over the macro list itself to prevent recursion if the running macro is also the one being recorded
-            self.addMacro(iter1)
-            try:
-                getattr(self.masterData, iter1[0])(*iter1[1])
-            except AttributeError:
+        steps = list(macro) # Do not loop over the macro list itself to prevent recursion if the running macro is also the one being recorded
+        for iter1 in steps:
+            if not callable(getattr(self.masterData, iter1[0], None)):
                 raise SsnakeException('unknown macro command: ' + iter1[0])
+        chain = pc.ProcessChain(steps)
+        for iter1 in steps:
+            self.addMacro(iter1)
+        if self.currentMacro is not None and not self.masterData.noUndo:
+            chain.runSteps(self.masterData)  # Every recorded step needs its own undo step
+        else:
+            chain.run(self.masterData)  # Fuses the steps that act on each trace
         if display:
             self.current.upd()  # get the first slice of data
             self.current.showFid()  # plot the data
@@ -1862,7 +1895,7 @@ class Main1DWindow(QtWidgets.QWidget):
         if not os.path.exists(filePath):
             self.stopMonitor()
             return
-        loadData = io.autoLoad(*self.masterData.filePath)
+        loadData = io.autoLoad(*self.masterData.filePath, single=self.masterData.isSinglePrecision())
         self.masterData.restoreData(loadData, None)
         for name in self.monitorMacros:
             self.runMacro(self.father.macros[name], display=False)
@@ -4248,6 +4281,8 @@ class LPSVDWindow(wc.ToolWindow):
         predictPoints = 10
         self.nPredictEntry = wc.QLineEdit(predictPoints)
         self.grid.addWidget(self.nPredictEntry, 8, 0)
+        self.fastCheck = QtWidgets.QCheckBox("Fast (truncated SVD)")
+        self.grid.addWidget(self.fastCheck, 9, 0)
 
     def applyFunc(self):
         analPoints = safeEval(self.aPointsEntry.text(), length=self.father.current.len(), Type='FI')
@@ -4267,7 +4302,7 @@ class LPSVDWindow(wc.ToolWindow):
             forward = True
         else:
             forward = False
-        self.father.current.lpsvd(predictPoints, numberFreq, forward, analPoints)
+        self.father.current.lpsvd(predictPoints, numberFreq, forward, analPoints, self.fastCheck.isChecked())
         self.father.sideframe.upd()
 
 ###########################################################################
@@ -4618,8 +4653,8 @@ class BaselineWindow(wc.ToolWindow):
 
     NAME = "Baseline correction"
     SINGLESLICE = True
-    TYPES = ['poly','sin/cos']
-    TYP_NAMES = ['Polynomial','sine/cosine']
+    TYPES = ['poly','sin/cos','spline','als']
+    TYP_NAMES = ['Polynomial','sine/cosine','Spline','Asymmetric least squares']
 
     def __init__(self, parent):
         super(BaselineWindow, self).__init__(parent)
@@ -4646,6 +4681,9 @@ class BaselineWindow(wc.ToolWindow):
         fitButton = QtWidgets.QPushButton("&Fit")
         fitButton.clicked.connect(self.preview)
         self.grid.addWidget(fitButton, 6, 1)
+        autoButton = QtWidgets.QPushButton("&Auto")
+        autoButton.clicked.connect(self.autoPoints)
+        self.grid.addWidget(autoButton, 7, 0, 1, 2)
         self.father.current.peakPickFunc = lambda pos, self=self: self.picked(pos)
         self.father.current.peakPick = True
 
@@ -4668,6 +4706,12 @@ class BaselineWindow(wc.ToolWindow):
         self.father.current.resetPreviewRemoveList()
         self.preview()
 
+    def autoPoints(self, *args):
+        self.removeList = self.father.current.autoBaselineRemoveList()
+        self.invertButton.setChecked(False)
+        self.father.current.resetPreviewRemoveList()
+        self.preview()
+
     def closeEvent(self, *args):
         self.father.current.removeListLines = []
         del self.father.current.removeListLines
@@ -5168,9 +5212,11 @@ class AlignDataWindow(regionWindow2):
 
     def __init__(self, parent):
         super(AlignDataWindow, self).__init__(parent, 'Align Maxima', False)
+        self.subPointCheck = QtWidgets.QCheckBox("Sub-point (cross-correlation)")
+        self.grid.addWidget(self.subPointCheck, 4, 0)
 
     def apply(self, maximum, minimum, newSpec):
-        self.father.current.align(maximum, minimum)
+        self.father.current.align(maximum, minimum, self.subPointCheck.isChecked())
         self.father.updAllFrames()
         return 1
 
@@ -5956,6 +6002,8 @@ class ReorderWindow(wc.ToolWindow):
 class RegridWindow(wc.ToolWindow):
 
     NAME = "Regrid"
+    METHODS = ['linear', 'cubic', 'sinc']
+    METHOD_NAMES = ['Linear', 'Cubic', 'Sinc']
 
     def __init__(self, parent):
         super(RegridWindow, self).__init__(parent)
@@ -6003,6 +6051,10 @@ class RegridWindow(wc.ToolWindow):
             self.grid.addWidget(self.maxLabel, 2, 0)
             self.grid.addWidget(self.pointsLabel, 3, 0)
             self.grid.addWidget(self.points, 3, 1)
+            self.grid.addWidget(wc.QLeftLabel('Interpolation:'), 4, 0)
+            self.methodDrop = QtWidgets.QComboBox(parent=self)
+            self.methodDrop.addItems(self.METHOD_NAMES)
+            self.grid.addWidget(self.methodDrop, 4, 1)
         else:
             self.closeEvent()
 
@@ -6027,7 +6079,7 @@ class RegridWindow(wc.ToolWindow):
         elif self.unit == 'ppm':
             maxVal *= self.father.masterData.ref[self.father.current.axes[-1]] / 1e6
             minVal *= self.father.masterData.ref[self.father.current.axes[-1]] / 1e6
-        self.father.current.regrid([minVal, maxVal], numPoints)
+        self.father.current.regrid([minVal, maxVal], numPoints, self.METHODS[self.methodDrop.currentIndex()])
 
 ##########################################################################################
 
@@ -7110,21 +7162,25 @@ class PreferenceWindow(QtWidgets.QWidget):
         tab3 = QtWidgets.QWidget()
         tab4 = QtWidgets.QWidget()
         tab5 = QtWidgets.QWidget()
+        tab6 = QtWidgets.QWidget()
         tabWidget.addTab(tab1, "Window")
         tabWidget.addTab(tab2, "Plot")
         tabWidget.addTab(tab3, "Contour")
         tabWidget.addTab(tab4, "2D Colour")
         tabWidget.addTab(tab5, "Phasing")
+        tabWidget.addTab(tab6, "Processing")
         grid1 = QtWidgets.QGridLayout()
         grid2 = QtWidgets.QGridLayout()
         grid3 = QtWidgets.QGridLayout()
         grid4 = QtWidgets.QGridLayout()
         grid5 = QtWidgets.QGridLayout()
+        grid6 = QtWidgets.QGridLayout()
         tab1.setLayout(grid1)
         tab2.setLayout(grid2)
         tab3.setLayout(grid3)
         tab4.setLayout(grid4)
         tab5.setLayout(grid5)
+        tab6.setLayout(grid6)
         grid1.setColumnStretch(10, 1)
         grid1.setRowStretch(10, 1)
         grid2.setColumnStretch(10, 1)
@@ -7135,6 +7191,8 @@ class PreferenceWindow(QtWidgets.QWidget):
         grid4.setRowStretch(10, 1)
         grid5.setColumnStretch(10, 1)
         grid5.setRowStretch(10, 1)
+        grid6.setColumnStretch(10, 1)
+        grid6.setRowStretch(10, 1)
         # grid1.addWidget(wc.QLabel("Window size:"), 0, 0, 1, 2)
         grid1.addWidget(wc.QLabel("Width:"), 1, 0)
         self.widthSpinBox = wc.SsnakeSpinBox()
@@ -7272,6 +7330,21 @@ class PreferenceWindow(QtWidgets.QWidget):
         self.secondOrderPhaseCheckBox = QtWidgets.QCheckBox("Always show 2nd order phase correction")
         self.secondOrderPhaseCheckBox.setChecked(self.father.defaultSecondOrderPhaseDialog)
         grid5.addWidget(self.secondOrderPhaseCheckBox, 0, 1)
+        # Processing
+        grid6.addWidget(QtWidgets.QLabel("FFT library:"), 0, 0)
+        self.fftBackendEntry = QtWidgets.QComboBox(self)
+        self.fftBackendEntry.addItems(hc.FFTBACKENDS)
+        self.fftBackendEntry.setCurrentIndex(hc.FFTBACKENDS.index(self.father.defaultFftBackend))
+        grid6.addWidget(self.fftBackendEntry, 0, 1)
+        grid6.addWidget(QtWidgets.QLabel("FFT threads:"), 1, 0)
+        self.fftWorkersSpinBox = wc.SsnakeSpinBox()
+        self.fftWorkersSpinBox.setMaximum(1024)
+        self.fftWorkersSpinBox.setSpecialValueText("All")
+        self.fftWorkersSpinBox.setValue(self.father.defaultFftWorkers)
+        grid6.addWidget(self.fftWorkersSpinBox, 1, 1)
+        self.singlePrecisionCheckBox = QtWidgets.QCheckBox("Load data in single precision")
+        self.singlePrecisionCheckBox.setChecked(self.father.defaultSinglePrecision)
+        grid6.addWidget(self.singlePrecisionCheckBox, 2, 0, 1, 2)
         # Others
         layout = QtWidgets.QGridLayout(self)
         layout.addWidget(tabWidget, 0, 0, 1, 4)
@@ -7340,11 +7413,16 @@ class PreferenceWindow(QtWidgets.QWidget):
         self.father.defaultHeightRatio = self.HRSpinBox.value()
         self.father.defaultPColorMap = self.cmEntry2D.currentText()
         self.father.defaultSecondOrderPhaseDialog = self.secondOrderPhaseCheckBox.isChecked()
+        self.father.defaultFftBackend = self.fftBackendEntry.currentText()
+        self.father.defaultFftWorkers = self.fftWorkersSpinBox.value()
+        self.father.defaultSinglePrecision = self.singlePrecisionCheckBox.isChecked()
+        hc.setFftBackend(self.father.defaultFftBackend, self.father.defaultFftWorkers)
         self.father.saveDefaults()
         self.closeEvent()
 
     def reset(self, *args):
         self.father.resetDefaults()
+        hc.setFftBackend(self.father.defaultFftBackend, self.father.defaultFftWorkers)
         self.father.saveDefaults()
         self.closeEvent()
 
@@ -22,7 +22,10 @@ import numpy as np
 from matplotlib.pyplot import get_cmap, colormaps
 import matplotlib
 import matplotlib.ticker as ticker
+from matplotlib.collections import LineCollection
 import spectrum as sc
+import functions as func
+import plotCache
 from spectrumFrame import PlotFrame
 import reimplement as reim
 
@@ -55,6 +58,11 @@ class Current1D(PlotFrame):
         super(Current1D, self).__init__(root, fig, canvas)
         self.data = data  # the actual spectrum instance
         self.data1D = None  # the data1D
+        self.previewMode = None  # 'full' or 'update' while showPreview draws the plot
+        self.previewArtists = None  # The animated artists of a preview, see showPreview
+        self.previewBackground = None
+        self.previewIndex = 0
+        self.previewFailed = False
         if duplicateCurrent is None:
             self.axes = np.array([len(self.data.shape()) - 1], dtype=int)
             self.resetLocList()
@@ -573,6 +581,20 @@ class Current1D(PlotFrame):
         self.root.addMacro(['setNoUndo', (val,)])
         self.data.setNoUndo(val)
 
+    def setPrecision(self, single):
+        """
+        Sets the precision in which the data is stored and processed.
+
+        Parameters
+        ----------
+        single: bool
+           If True, single precision is used, otherwise double precision
+        """
+        self.root.addMacro(['setPrecision', (single,)])
+        self.data.setPrecision(single)
+        self.upd()
+        self.showFid()
+
     def real(self, *args):
         """
         Takes the real value along the current axis.
@@ -624,7 +646,7 @@ class Current1D(PlotFrame):
         phase1 = float(phase1in)
         phase2 = float(phase2in)
         self.data1D.phase(phase0, phase1, phase2, -1)
-        self.showFid()
+        self.showPreview()
         self.upd()
 
     def applyPhase(self, phase0, phase1, phase2=0, select=False):
@@ -742,9 +764,9 @@ class Current1D(PlotFrame):
         if self.spec() == 0 and not isinstance(self, CurrentContour):
             tmp = self.getDataType(y.getHyperData(0))
             scale = np.max([np.real(tmp), np.imag(tmp)])
-            self.showFid(y, curve[0], scale*np.array(curve[1]), extraColor=['g'])
+            self.showPreview(y, curve[0], scale*np.array(curve[1]), extraColor=['g'])
         else:
-            self.showFid(y)
+            self.showPreview(y)
         self.upd()
     
     def applyApod(self, lor=None, gauss=None, cos2=None, hamming=None, shift=0.0, shifting=0.0, shiftingAxis=0, select=False):  # apply the apodization to the actual data
@@ -838,7 +860,7 @@ class Current1D(PlotFrame):
                 self.xmaxlim = self.xmaxlim + (oldref - ref) / 10**(val * 3)
         self.showFid()
 
-    def regrid(self, limits, numPoints):
+    def regrid(self, limits, numPoints, method='linear'):
         """
         Regrind along the current dimension. This creates a new x-axis, and interpolates to
         construct the new y-values.
@@ -849,9 +871,11 @@ class Current1D(PlotFrame):
             List with the minimum and maximum position of the new x-axis (in Hz).
         numPoints: int
             Number of points in the new x-axis
+        method (optional = 'linear'): str
+            The interpolation method, see hypercomplex.REGRIDMETHODS
         """
-        self.root.addMacro(['regrid', (limits, numPoints, self.axes[-1] - self.data.ndim())])
-        self.data.regrid(limits, numPoints, self.axes[-1])
+        self.root.addMacro(['regrid', (limits, numPoints, self.axes[-1] - self.data.ndim(), method)])
+        self.data.regrid(limits, numPoints, self.axes[-1], method)
         self.upd()
         self.showFid()
         self.plotReset()
@@ -883,7 +907,8 @@ class Current1D(PlotFrame):
         tmpData = self.data1D.getHyperData(0)
         tmpData = tmpData[(0,)*(self.ndim()-1) + (slice(None), )]
         tmpData = np.real(self.getDataType(tmpData))
-        return np.max(tmpData[minP:maxP]) / (np.std(tmpData[minN:maxN]))
+        noise = plotCache.SUMMARIES.noise((self.data1D.dataVersion, self.viewSettings["plotType"]), tmpData, minN, maxN)
+        return np.max(tmpData[minP:maxP]) / noise
 
     def fwhm(self, minPeak, maxPeak, level, unitType=None):
         """
@@ -1119,7 +1144,7 @@ class Current1D(PlotFrame):
             or removed.
         """
         self.data1D.resize(size, pos, -1)
-        self.showFid()
+        self.showPreview()
         if not self.spec():
             self.plotReset(True, False)
         self.upd()
@@ -1143,7 +1168,7 @@ class Current1D(PlotFrame):
         if not self.spec():
             self.plotReset(True, False)
 
-    def lpsvd(self, nPredict, maxFreq, forward, numPoints):
+    def lpsvd(self, nPredict, maxFreq, forward, numPoints, fast=False):
         """
         Apply linear prediction on the data. Both forward and backwards predictions
         are supported.
@@ -1158,9 +1183,11 @@ class Current1D(PlotFrame):
             If True, a forward prediction is performed, otherwise a backward prediction is performed.
         numPoints : int, optional
             The number of points to use for SVD.
+        fast : bool, optional
+            If True, a randomized SVD limited to maxFreq components is used.
         """
-        self.root.addMacro(['lpsvd', (nPredict, maxFreq, forward, numPoints, self.axes[-1] - self.data.ndim())])
-        self.data.lpsvd(nPredict, maxFreq, forward, numPoints, self.axes[-1])
+        self.root.addMacro(['lpsvd', (nPredict, maxFreq, forward, numPoints, self.axes[-1] - self.data.ndim(), fast)])
+        self.data.lpsvd(nPredict, maxFreq, forward, numPoints, self.axes[-1], fast)
         self.upd()
         self.showFid()
         if not self.spec():
@@ -1256,7 +1283,7 @@ class Current1D(PlotFrame):
             The amount of data points to shift (negative is left shift, positive right shift)
         """
         self.data1D.shift(shift, -1)
-        self.showFid()
+        self.showPreview()
         self.upd()
 
     def roll(self, shift, select=False, shift_axis=True):
@@ -1296,7 +1323,7 @@ class Current1D(PlotFrame):
         self.showFid()
         self.upd()
 
-    def align(self, pos1, pos2):
+    def align(self, pos1, pos2, subPoint=False):
         """
         Aligns the maximum of each slice along this dimension, within the pos1-pos2 region.
 
@@ -1307,9 +1334,11 @@ class Current1D(PlotFrame):
             First data position.
         pos2: int
             Second data position.
+        subPoint (optional = False): boolean
+            If True, align with sub-point precision using the cross-correlation.
         """
-        self.root.addMacro(['align', (pos1, pos2, self.axes[-1] - self.data.ndim())])
-        self.data.align(pos1, pos2, self.axes[-1])
+        self.root.addMacro(['align', (pos1, pos2, self.axes[-1] - self.data.ndim(), subPoint)])
+        self.data.align(pos1, pos2, self.axes[-1], subPoint)
         self.upd()
         self.showFid()
 
@@ -1364,26 +1393,29 @@ class Current1D(PlotFrame):
         degree: int
             Number of polynomial orders
         type: str
-            Either 'poly' for polynomial fit, or 'sin/cos' for sine/cosine
+            The model, see functions.BASELINETYPES
 
         Returns
         -------
         ndarray:
             The fitted polynomial
         """
-        if type == 'poly':
-            import numpy.polynomial.polynomial as poly
-            polyCoeff = poly.polyfit(x[bArray], data[bArray], degree)
-            return poly.polyval(x, polyCoeff)
-        elif type == 'sin/cos':
-            import numpy.linalg as ln
-            fit = np.ones([len(x),degree *2 + 1])
-            x_fake = np.linspace(0, 2 * np.pi, len(x)) #cos/sine always in 0-->2pi regime
-            for order in range(degree):
-                fit[:,order * 2 + 1] = np.cos((order + 1) * x_fake)
-                fit[:,order * 2 + 2] = np.sin((order + 1) * x_fake)
-            values = ln.lstsq(fit[bArray], data[bArray] ,rcond = None)[0] #Perform leats squares fit
-            return np.sum(fit * values, axis = 1)
+        return func.baselineFit(x, data, bArray, degree, type)
+
+    def autoBaselineRemoveList(self):
+        """
+        Detects the baseline points of the data along the current dimension.
+
+        Returns
+        -------
+        list
+            Pairs of indexes of the regions that are not baseline, in the format of the removeList.
+        """
+        bArray = func.autoBaselinePoints(np.real(self.data.getHyperData(0)), self.axes[-1])
+        edges = np.diff(np.concatenate(([False], np.logical_not(bArray), [False])).astype(int))
+        starts = np.nonzero(edges == 1)[0]
+        ends = np.nonzero(edges == -1)[0] - 1
+        return [int(val) for pair in zip(starts, ends) for val in pair]
 
     def baselineCorrectionAll(self, degree, removeList, type, invert=False):
         """
@@ -1396,7 +1428,7 @@ class Current1D(PlotFrame):
         removeList: list
             Indexes of points not include in function fit
         type: str
-            Either 'poly' for polynomial fit, or 'sin/cos' for sine/cosine
+            The model, see functions.BASELINETYPES
         invert (optional = False): boolean
             If True, the removeList is treated as an include list (i.e. inverting the selection)           
         """
@@ -1408,7 +1440,7 @@ class Current1D(PlotFrame):
             bArray = np.logical_and(bArray, np.logical_or((tmpAx < minVal), (tmpAx > maxVal)))
         if invert:
             bArray = np.logical_not(bArray)
-        y = np.apply_along_axis(lambda data: self.baselineFunctionFit(self.xax(), data, bArray, degree, type), self.axes[-1], self.data.getHyperData(0))
+        y = func.baselineFit(self.xax(), self.data.getHyperData(0), bArray, degree, type, self.axes[-1])
         y = np.real(self.getDataType(y))
         self.root.addMacro(['subtract', (y,)])
         self.data.subtract(y)
@@ -1424,7 +1456,7 @@ class Current1D(PlotFrame):
         removeList: list
             Indexes of points not include in function fit
         type: str
-            Either 'poly' for polynomial fit, or 'sin/cos' for sine/cosine
+            The model, see functions.BASELINETYPES
         select (optional = False): boolean
             If True, apply only to the current slice.
         invert (optional = False): boolean
@@ -1460,7 +1492,7 @@ class Current1D(PlotFrame):
         removeList: list
             Indexes of points not include in function fit
         type: str
-            Either 'poly' for polynomial fit, or 'sin/cos' for sine/cosine
+            The model, see functions.BASELINETYPES
         invert (optional = False): boolean
             If True, the removeList is treated as an include list (i.e. inverting the selection)           
         """
@@ -2381,7 +2413,7 @@ class Current1D(PlotFrame):
         int:
             Order of magnitude
         """
-        absVal = np.max(np.abs(self.data.getHyperData(0)))
+        absVal = plotCache.SUMMARIES.absMax(self.data.dataVersion, lambda: self.data.getHyperData(0))
         if absVal == 0.0:
             return 1
         return int(np.floor(np.log10(absVal)))
@@ -2403,7 +2435,9 @@ class Current1D(PlotFrame):
         """
         self.peakPickReset()
         tmpdata = self.data1D.getHyperData(0)
-        self.ax.cla()
+        incremental = self.startPlot()
+        if not incremental:
+            self.ax.cla()
         axMult = self.getAxMult(self.spec(), self.getAxType(), self.getppm(), self.freq(), self.ref())
         self.line_xdata = [self.xax() * axMult]
         self.line_xdata_extra = []
@@ -2418,27 +2452,29 @@ class Current1D(PlotFrame):
             tmp = np.real(self.getDataType(oldData.getHyperData(0)))
             self.line_xdata_extra.append(self.xax() * axMult)
             self.line_ydata_extra.append(tmp)
-            self.ax.plot(self.line_xdata_extra[-1], self.line_ydata_extra[-1], marker=marker, linestyle=linestyle, c=(0,0,0,0.2), linewidth=self.viewSettings["linewidth"], label=self.data.name + '_old', picker=True)
+            self.plotLine(self.line_xdata_extra[-1], self.line_ydata_extra[-1], marker=marker, linestyle=linestyle, color=(0,0,0,0.2), linewidth=self.viewSettings["linewidth"], label=self.data.name + '_old', picker=True)
         if extraX is not None:
             for num, _ in enumerate(extraX):
                 self.line_xdata_extra.append(extraX[num] * axMult)
                 self.line_ydata_extra.append(extraY[num])
                 if extraColor is None:
-                    self.ax.plot(self.line_xdata_extra[-1], self.line_ydata_extra[-1], marker='', linestyle='-', linewidth=self.viewSettings["linewidth"], picker=True)
+                    self.plotLine(self.line_xdata_extra[-1], self.line_ydata_extra[-1], marker='', linestyle='-', linewidth=self.viewSettings["linewidth"], picker=True)
                 else:
                     if len(extraColor) < len(extraY):
                         color = extraColor[0]
                     else:
                         color = extraColor[num]
-                    self.ax.plot(self.line_xdata_extra[-1], self.line_ydata_extra[-1], marker='', linestyle='-', c=color, linewidth=self.viewSettings["linewidth"], picker=True)
+                    self.plotLine(self.line_xdata_extra[-1], self.line_ydata_extra[-1], marker='', linestyle='-', color=color, linewidth=self.viewSettings["linewidth"], picker=True)
         tmpdata = self.getDataType(tmpdata)
         if self.viewSettings["plotType"] == 2:
             self.line_xdata.append(self.line_xdata[-1])
             self.line_ydata = [np.imag(tmpdata), np.real(tmpdata)]
-            self.ax.plot(self.line_xdata[-2], self.line_ydata[-2], marker=marker, linestyle=linestyle, c='#FF7F0E', linewidth=self.viewSettings["linewidth"], label=self.data.name + '_imag', picker=True)
+            self.plotLine(self.line_xdata[-2], self.line_ydata[-2], marker=marker, linestyle=linestyle, color='#FF7F0E', linewidth=self.viewSettings["linewidth"], label=self.data.name + '_imag', picker=True)
         else:
             self.line_ydata = [np.real(tmpdata)]
-        self.ax.plot(self.line_xdata[-1], self.line_ydata[-1], marker=marker, linestyle=linestyle, c=self.viewSettings["color"], linewidth=self.viewSettings["linewidth"], label=self.data.name, picker=True)
+        self.plotLine(self.line_xdata[-1], self.line_ydata[-1], marker=marker, linestyle=linestyle, color=self.viewSettings["color"], linewidth=self.viewSettings["linewidth"], label=self.data.name, picker=True)
+        if incremental:
+            return
         self.ax.set_xlabel(self.getLabel(self.spec(), self.axes[-1], self.getAxType(), self.getppm()))
         if self.logx:
             self.ax.set_xscale('log')
@@ -2460,6 +2496,150 @@ class Current1D(PlotFrame):
         self.setTicks()
         self.canvas.draw()
 
+    def plotLine(self, xdata, ydata, ax=None, decimate=True, **kwargs):
+        """
+        Plots a line, which is drawn as a min/max decimation to the canvas resolution (see plotCache.DecimatedLine).
+        The line data (e.g. line_xdata and line_ydata) keeps the full resolution.
+        Lines without linestyle (only markers) or without colour (which take the next colour of the cycle) are plotted as usual.
+        During an incremental preview the line of the previous draw is updated instead, see previewArtist.
+
+        Parameters
+        ----------
+        xdata: 1darray
+            The x positions
+        ydata: 1darray
+            The y values
+        ax (optional = None): Axes
+            The axes, by default self.ax
+        decimate (optional = True): bool
+            If False, the line is plotted as usual (e.g. for lines that are not a function of x)
+        **kwargs
+            Line properties, as for matplotlib plot
+
+        Returns
+        -------
+        Line2D
+            The line
+        """
+        if ax is None:
+            ax = self.ax
+        def create():
+            if not decimate or kwargs.get('linestyle') == 'none' or ('color' not in kwargs and 'c' not in kwargs):
+                return ax.plot(xdata, ydata, **kwargs)[0]
+            return ax.add_line(plotCache.DecimatedLine(xdata, ydata, **kwargs))
+        def update(line):
+            if not isinstance(line, matplotlib.lines.Line2D) or line.axes is not ax:
+                return False
+            plotCache.setLineData(line, xdata, ydata)
+            return True
+        return self.previewArtist(create, update)
+
+    def showPreview(self, *args, **kwargs):
+        """
+        Display the data of a preview (e.g. during phasing or apodization), with the arguments of showFid.
+        The first call draws the plot with showFid, with the data artists animated.
+        Later calls keep these artists, only update their data,
+        and redraw them on the cached background of the rest of the figure (blitting).
+        When the plot has changed in another way, it is drawn again with showFid.
+        """
+        if self.previewArtists and self.previewBackground is not None:
+            self.previewMode = 'update'
+            try:
+                self.showFid(*args, **kwargs)
+            finally:
+                self.previewMode = None
+            if not self.previewFailed and self.previewIndex == len(self.previewArtists):
+                self.blitPreview()
+                return
+        self.previewMode = 'full' if getattr(self.canvas, 'supports_blit', False) else None
+        try:
+            self.showFid(*args, **kwargs)
+        finally:
+            self.previewMode = None
+
+    def startPlot(self):
+        """
+        Prepares a draw of showFid.
+
+        Returns
+        -------
+        bool:
+            True when the artists of the previous draw are updated (incremental preview).
+            The axes should then not be cleared and only the data artists should be made.
+        """
+        if self.previewMode == 'update':
+            self.previewIndex = 0
+            self.previewFailed = False
+            return True
+        self.previewArtists = [] if self.previewMode == 'full' else None
+        self.previewBackground = None
+        return False
+
+    def previewArtist(self, create, update):
+        """
+        Makes a data artist of the plot.
+        During an incremental preview the next artist of the previous draw is updated instead.
+
+        Parameters
+        ----------
+        create: function
+            Makes the artist in the axes and returns it.
+        update: function
+            Updates a given artist and returns True, or returns False when the artist does not match.
+
+        Returns
+        -------
+        Artist:
+            The artist, None if the incremental preview failed.
+        """
+        if self.previewMode == 'update':
+            if self.previewIndex < len(self.previewArtists) and update(self.previewArtists[self.previewIndex]):
+                self.previewIndex += 1
+                return self.previewArtists[self.previewIndex - 1]
+            self.previewFailed = True
+            return None
+        artist = create()
+        if self.previewMode == 'full':
+            artist.set_animated(True)  # Animated artists are not drawn with the figure, but by drawEvent and blitPreview
+            self.previewArtists.append(artist)
+        return artist
+
+    def drawEvent(self, event):
+        """
+        Caches the background for a preview after the figure was drawn, and draws the preview artists on top of it.
+
+        Parameters
+        ----------
+        event: draw event
+        """
+        if not self.previewArtists or event.canvas is not self.canvas or self.ax not in self.fig.axes:
+            return
+        self.previewBackground = self.canvas.copy_from_bbox(self.fig.bbox)
+        for artist in self.previewArtists:
+            self.fig.draw_artist(artist)
+
+    def blitPreview(self):
+        """
+        Redraws the preview artists on the cached background.
+        """
+        self.canvas.restore_region(self.previewBackground)
+        for artist in self.previewArtists:
+            self.fig.draw_artist(artist)
+        self.canvas.blit(self.fig.bbox)
+
+    def setFullResolution(self, full):
+        """
+        Draws the lines at full resolution (for example for saving a figure), or again decimated to the canvas resolution.
+
+        Parameters
+        ----------
+        full: bool
+            True for full resolution.
+        """
+        for artist in self.ax.get_children():
+            if isinstance(artist, (plotCache.DecimatedLine, plotCache.DecimatedLineCollection)):
+                artist.setFullResolution(full)
+
     def setTicks(self, Xset=True, Yset=True):
         """
         Set ticks for the current plot.
@@ -2715,7 +2895,9 @@ class CurrentMulti(Current1D):
         """
         self.peakPickReset()
         tmpdata = self.data1D.getHyperData(0)
-        self.ax.cla()
+        incremental = self.startPlot()
+        if not incremental:
+            self.ax.cla()
         axMult = self.getAxMult(self.spec(), self.getAxType(), self.getppm(), self.freq(), self.ref())
         self.line_xdata = [self.xax() * axMult]
         self.line_xdata_extra = []
@@ -2746,13 +2928,13 @@ class CurrentMulti(Current1D):
                 linestyle = self.LINESTYLE
             extraData = np.real(self.getDataType(extraData1D.getHyperData(0)))
             self.line_ydata_extra.append(extraData * self.viewSettings["extraScale"][i] + self.viewSettings["extraOffset"][i])
-            self.ax.plot(self.line_xdata_extra[-1],
-                         self.line_ydata_extra[-1],
-                         marker=marker, linestyle=linestyle,
-                         c=self.viewSettings["extraColor"][i],
-                         linewidth=self.viewSettings["linewidth"],
-                         label=data.name,
-                         picker=True)
+            self.plotLine(self.line_xdata_extra[-1],
+                          self.line_ydata_extra[-1],
+                          marker=marker, linestyle=linestyle,
+                          color=self.viewSettings["extraColor"][i],
+                          linewidth=self.viewSettings["linewidth"],
+                          label=data.name,
+                          picker=True)
         if self.len() == 1:
             marker = 'o'
             linestyle = 'none'
@@ -2763,27 +2945,29 @@ class CurrentMulti(Current1D):
             tmp = np.real(self.getDataType(oldData.getHyperData(0)))
             self.line_xdata_extra.append(self.xax() * axMult)
             self.line_ydata_extra.append(tmp)
-            self.ax.plot(self.line_xdata_extra[-1], self.line_ydata_extra[-1], marker=marker, linestyle=linestyle, c=(0,0,0,0.2), linewidth=self.viewSettings["linewidth"], label=self.data.name + '_old', picker=True)
+            self.plotLine(self.line_xdata_extra[-1], self.line_ydata_extra[-1], marker=marker, linestyle=linestyle, color=(0,0,0,0.2), linewidth=self.viewSettings["linewidth"], label=self.data.name + '_old', picker=True)
         if extraX is not None:
             for num, _ in enumerate(extraX):
                 self.line_xdata_extra.append(extraX[num] * axMult)
                 self.line_ydata_extra.append(extraY[num])
                 if extraColor is None:
-                    self.ax.plot(self.line_xdata_extra[-1], self.line_ydata_extra[-1], marker=marker, linestyle=linestyle, linewidth=self.viewSettings["linewidth"], picker=True)
+                    self.plotLine(self.line_xdata_extra[-1], self.line_ydata_extra[-1], marker=marker, linestyle=linestyle, linewidth=self.viewSettings["linewidth"], picker=True)
                 else:
                     if len(extraColor) < len(extraY):
                         color = extraColor[0]
                     else:
                         color = extraColor[num]
-                    self.ax.plot(self.line_xdata_extra[-1], self.line_ydata_extra[-1], marker=marker, linestyle=linestyle, linewidth=self.viewSettings["linewidth"], c=color, picker=True)
+                    self.plotLine(self.line_xdata_extra[-1], self.line_ydata_extra[-1], marker=marker, linestyle=linestyle, linewidth=self.viewSettings["linewidth"], color=color, picker=True)
         tmpdata = self.getDataType(tmpdata)
         if self.viewSettings["plotType"] == 2:
             self.line_xdata.append(self.line_xdata[-1])
             self.line_ydata = [np.imag(tmpdata), np.real(tmpdata)]
-            self.ax.plot(self.line_xdata[-2], self.line_ydata[-2], marker=marker, linestyle=linestyle, c='#FF7F0E', linewidth=self.viewSettings["linewidth"], label=self.data.name + '_imag', picker=True)
+            self.plotLine(self.line_xdata[-2], self.line_ydata[-2], marker=marker, linestyle=linestyle, color='#FF7F0E', linewidth=self.viewSettings["linewidth"], label=self.data.name + '_imag', picker=True)
         else:
             self.line_ydata = [np.real(tmpdata)]
-        self.ax.plot(self.line_xdata[-1], self.line_ydata[-1], marker=marker, linestyle=linestyle, c=self.viewSettings["color"], linewidth=self.viewSettings["linewidth"], label=self.data.name, picker=True)
+        self.plotLine(self.line_xdata[-1], self.line_ydata[-1], marker=marker, linestyle=linestyle, color=self.viewSettings["color"], linewidth=self.viewSettings["linewidth"], label=self.data.name, picker=True)
+        if incremental:
+            return
         self.ax.set_xlabel(self.getLabel(self.spec(), self.axes[-1], self.getAxType(), self.getppm()))
         self.ax.get_xaxis().get_major_formatter().set_powerlimits((-4, 4))
         self.ax.get_yaxis().get_major_formatter().set_powerlimits((-4, 4))
@@ -2922,6 +3106,65 @@ class CurrentStacked(Current1D):
         self.root.sideframe.scrollSpacing(self.viewSettings["spacing"])
         self.showFid()
 
+    def traceColors(self, numTraces):
+        """
+        Returns the colours of the traces, from the colour range if one is set.
+
+        Parameters
+        ----------
+        numTraces: int
+            The number of traces
+
+        Returns
+        -------
+        color or 2darray:
+            A single colour, or an RGBA colour per trace
+        """
+        if self.viewSettings["colorRange"] == 'none':
+            return self.viewSettings["color"]
+        return get_cmap(self.viewSettings["colorRange"])(np.arange(numTraces) / float(numTraces))
+
+    def plotTraces(self, xdata, ydata, colors, marker='', linestyle='-', **kwargs):
+        """
+        Plots all traces as a single LineCollection, instead of a line per trace (see plotCache.DecimatedLineCollection).
+        Segment i of the collection is trace i, so a pick event gives the trace indices in its ind attribute.
+        Traces with only markers are plotted as separate lines.
+        During an incremental preview the collection of the previous draw is updated instead, see previewArtist.
+
+        Parameters
+        ----------
+        xdata: 1darray or 2darray
+            The x positions, shared by all traces or per trace
+        ydata: 2darray
+            The y values, including the offset of each trace
+        colors: color or list of colors
+            A colour for all traces or per trace
+        marker (optional = ''): str
+            The marker of the traces
+        linestyle (optional = '-'): str
+            The linestyle of the traces
+        **kwargs
+            Line properties, as for matplotlib plot (e.g. linewidth and label)
+        """
+        if linestyle == 'none':
+            colors = np.broadcast_to(COLORCONVERTER.to_rgba_array(colors), (len(ydata), 4))
+            for num, trace in enumerate(ydata):
+                self.plotLine(np.broadcast_to(xdata, ydata.shape)[num], trace, marker=marker, linestyle=linestyle, color=colors[num], picker=True, **kwargs)
+            return
+        linewidth = kwargs.pop('linewidth', None)
+
+        def create():
+            return self.ax.add_collection(plotCache.DecimatedLineCollection(xdata, ydata, colors=colors, linewidths=linewidth, linestyles=linestyle, picker=True, **kwargs), autolim=False)
+
+        def update(collection):
+            if not isinstance(collection, plotCache.DecimatedLineCollection) or collection.axes is not self.ax:
+                return False
+            collection.setFullData(xdata, ydata)
+            collection.set_color(colors)
+            return True
+
+        self.previewArtist(create, update)
+
     def showFid(self, oldData=None, extraX=None, extraY=None, extraColor=None):
         """
         Plot the data.
@@ -2939,7 +3182,9 @@ class CurrentStacked(Current1D):
         """
         self.peakPickReset()
         tmpdata = self.data1D.getHyperData(0)
-        self.ax.cla()
+        incremental = self.startPlot()
+        if not incremental:
+            self.ax.cla()
         axMult = self.getAxMult(self.spec(), self.getAxType(), self.getppm(), self.freq(), self.ref())
         tmp_line_xdata = self.xax() * axMult
         self.line_xdata = []
@@ -2953,41 +3198,38 @@ class CurrentStacked(Current1D):
             marker = self.MARKER
             linestyle = self.LINESTYLE
         if oldData is not None:
-            for num in range(len(oldData.getHyperData(0))):
-                tmp = np.real(self.getDataType(oldData.getHyperData(0)[num]))
-                self.line_xdata_extra.append(tmp_line_xdata)
-                self.line_ydata_extra.append(num * self.viewSettings["spacing"] + tmp)
-                self.ax.plot(self.line_xdata_extra[-1], self.line_ydata_extra[-1], marker=marker, linestyle=linestyle, c=(0,0,0,0.2), linewidth=self.viewSettings["linewidth"], label=self.data.name + '_old', picker=True)
+            tmp = np.real(self.getDataType(oldData.getHyperData(0)))
+            offsets = np.arange(len(tmp))[:, np.newaxis] * self.viewSettings["spacing"]
+            self.line_xdata_extra += [tmp_line_xdata] * len(tmp)
+            self.line_ydata_extra += list(offsets + tmp)
+            self.plotTraces(tmp_line_xdata, offsets + tmp, (0,0,0,0.2), marker=marker, linestyle=linestyle, linewidth=self.viewSettings["linewidth"], label=self.data.name + '_old')
         if extraX is not None:
             tmpx = extraX[0] * axMult
             for num, _ in enumerate(extraY):
                 self.line_xdata_extra.append(tmpx)
                 self.line_ydata_extra.append(num * self.viewSettings["spacing"] + extraY[num])
                 if extraColor is None:
-                    self.ax.plot(self.line_xdata_extra[-1], self.line_ydata_extra[-1], marker=marker, linestyle=linestyle, linewidth=self.viewSettings["linewidth"], picker=True)
+                    self.plotLine(self.line_xdata_extra[-1], self.line_ydata_extra[-1], marker=marker, linestyle=linestyle, linewidth=self.viewSettings["linewidth"], picker=True)
                 else:
                     if len(extraColor) < len(extraY):
                         color = extraColor[0]
                     else:
                         color = extraColor[num]
-                    self.ax.plot(self.line_xdata_extra[-1], self.line_ydata_extra[-1], marker=marker, linestyle=linestyle, linewidth=self.viewSettings["linewidth"], c=color, picker=True)
+                    self.plotLine(self.line_xdata_extra[-1], self.line_ydata_extra[-1], marker=marker, linestyle=linestyle, linewidth=self.viewSettings["linewidth"], color=color, picker=True)
         tmpdata = self.getDataType(tmpdata)
-        if self.viewSettings["colorRange"] == 'none':
-            colorRange = None
+        offsets = np.arange(len(tmpdata))[:, np.newaxis] * self.viewSettings["spacing"]
+        if self.viewSettings["plotType"] == 2:
+            imagData = offsets + np.imag(tmpdata)
+            self.plotTraces(tmp_line_xdata, imagData, '#FF7F0E', marker=marker, linestyle=linestyle, linewidth=self.viewSettings["linewidth"], label=self.data.name + '_imag')
+        realData = offsets + np.real(tmpdata)
+        self.plotTraces(tmp_line_xdata, realData, self.traceColors(len(tmpdata)), marker=marker, linestyle=linestyle, linewidth=self.viewSettings["linewidth"], label=self.data.name)
+        if self.viewSettings["plotType"] == 2:
+            self.line_ydata = [trace for pair in zip(imagData, realData) for trace in pair]
         else:
-            colorRange = get_cmap(self.viewSettings["colorRange"])
-        for num, _ in enumerate(tmpdata):
-            if self.viewSettings["plotType"] == 2:
-                self.line_xdata.append(tmp_line_xdata)
-                self.line_ydata.append(num * self.viewSettings["spacing"] + np.imag(tmpdata[num]))
-                self.ax.plot(self.line_xdata[-1], self.line_ydata[-1], marker=marker, linestyle=linestyle, c='#FF7F0E', linewidth=self.viewSettings["linewidth"], label=self.data.name + '_imag', picker=True)
-            self.line_xdata.append(tmp_line_xdata)
-            self.line_ydata.append(num * self.viewSettings["spacing"] + np.real(tmpdata[num]))
-            if colorRange is None:
-                color = self.viewSettings["color"]
-            else:
-                color = colorRange(num/float(len(tmpdata)))
-            self.ax.plot(self.line_xdata[-1], self.line_ydata[-1], marker=marker, linestyle=linestyle, c=color, linewidth=self.viewSettings["linewidth"], label=self.data.name, picker=True)
+            self.line_ydata = list(realData)
+        self.line_xdata = [tmp_line_xdata] * len(self.line_ydata)
+        if incremental:
+            return
         self.ax.set_xlabel(self.getLabel(self.spec(), self.axes[-1], self.getAxType(), self.getppm()))
         if self.spec() > 0:
             self.ax.set_xlim(self.xmaxlim, self.xminlim)
@@ -3108,7 +3350,9 @@ class CurrentArrayed(CurrentStacked):
         """
         self.peakPickReset()
         tmpdata = self.data1D.getHyperData(0)
-        self.ax.cla()
+        incremental = self.startPlot()
+        if not incremental:
+            self.ax.cla()
         if self.spec() > 0:
             direc = slice(None, None, -1)
         else:
@@ -3127,44 +3371,42 @@ class CurrentArrayed(CurrentStacked):
             marker = self.MARKER
             linestyle = self.LINESTYLE
         if oldData is not None:
-            for num in range(len(oldData.getHyperData(0))):
-                tmp = np.real(self.getDataType(oldData.getHyperData(0)[num]))
-                self.line_xdata_extra.append((num * self.viewSettings["spacing"] + self.xax()[xaxZlims]) * axMult)
-                self.line_ydata_extra.append(tmp[xaxZlims][direc])
-                self.ax.plot(self.line_xdata_extra[-1], self.line_ydata_extra[-1], marker=marker, linestyle=linestyle, c=(0,0,0,0.2), linewidth=self.viewSettings["linewidth"], label=self.data.name + '_old', picker=True)
+            tmp = np.real(self.getDataType(oldData.getHyperData(0)))
+            xdata = (np.arange(len(tmp))[:, np.newaxis] * self.viewSettings["spacing"] + self.xax()[xaxZlims]) * axMult
+            ydata = tmp[:, xaxZlims][:, direc]
+            self.line_xdata_extra += list(xdata)
+            self.line_ydata_extra += list(ydata)
+            self.plotTraces(xdata, ydata, (0,0,0,0.2), marker=marker, linestyle=linestyle, linewidth=self.viewSettings["linewidth"], label=self.data.name + '_old')
         if extraX is not None:
             extraZlims = (extraX[0] > self.zminlim) & (extraX[0] < self.zmaxlim)
             for num, _ in enumerate(extraY):
                 self.line_xdata_extra.append((num * self.viewSettings["spacing"] + extraX[0][extraZlims]) * axMult)
                 self.line_ydata_extra.append(extraY[num][extraZlims][direc])
                 if extraColor is None:
-                    self.ax.plot(self.line_xdata_extra[-1], self.line_ydata_extra[-1], marker=marker, linestyle=linestyle, linewidth=self.viewSettings["linewidth"], picker=True)
+                    self.plotLine(self.line_xdata_extra[-1], self.line_ydata_extra[-1], marker=marker, linestyle=linestyle, linewidth=self.viewSettings["linewidth"], picker=True)
                 else:
                     if len(extraColor) < len(extraY):
                         color = extraColor[0]
                     else:
                         color = extraColor[num]
-                    self.ax.plot(self.line_xdata_extra[-1], self.line_ydata_extra[-1], marker=marker, linestyle=linestyle, linewidth=self.viewSettings["linewidth"], c=color, picker=True)
+                    self.plotLine(self.line_xdata_extra[-1], self.line_ydata_extra[-1], marker=marker, linestyle=linestyle, linewidth=self.viewSettings["linewidth"], color=color, picker=True)
         tmpdata = self.getDataType(tmpdata)
-        ticksPos = []
-        if self.viewSettings["colorRange"] == 'none':
-            colorRange = None
+        offsets = np.arange(len(tmpdata)) * self.viewSettings["spacing"]
+        xdata = (offsets[:, np.newaxis] + self.xax()[xaxZlims]) * axMult
+        if self.viewSettings["plotType"] == 2:
+            imagData = np.imag(tmpdata[:, xaxZlims])[:, direc]
+            self.plotTraces(xdata, imagData, '#FF7F0E', marker=marker, linestyle=linestyle, linewidth=self.viewSettings["linewidth"], label=self.data.name + '_imag')
+        realData = np.real(tmpdata[:, xaxZlims])[:, direc]
+        self.plotTraces(xdata, realData, self.traceColors(len(tmpdata)), marker=marker, linestyle=linestyle, linewidth=self.viewSettings["linewidth"], label=self.data.name)
+        if self.viewSettings["plotType"] == 2:
+            self.line_xdata = [trace for trace in xdata for _ in range(2)]
+            self.line_ydata = [trace for pair in zip(imagData, realData) for trace in pair]
         else:
-            colorRange = get_cmap(self.viewSettings["colorRange"])
-        for num, _ in enumerate(tmpdata):
-            if self.viewSettings["plotType"] == 2:
-                self.line_xdata.append((num * self.viewSettings["spacing"] + self.xax()[xaxZlims]) * axMult)
-                self.line_ydata.append(np.imag(tmpdata[num][xaxZlims])[direc])
-                self.ax.plot(self.line_xdata[-1], self.line_ydata[-1], marker=marker, linestyle=linestyle, c='#FF7F0E', linewidth=self.viewSettings["linewidth"], label=self.data.name + '_imag', picker=True)
-            self.line_xdata.append((num * self.viewSettings["spacing"] + self.xax()[xaxZlims]) * axMult)
-            self.line_ydata.append(np.real(tmpdata[num][xaxZlims])[direc])
-            if colorRange is None:
-                color = self.viewSettings["color"]
-            else:
-                color = colorRange(num/float(len(tmpdata)))
-            self.ax.plot(self.line_xdata[-1], self.line_ydata[-1], marker=marker, linestyle=linestyle, c=color, linewidth=self.viewSettings["linewidth"], label=self.data.name, picker=True)
-            pos = (num * self.viewSettings["spacing"] + 0.5 * (self.xax()[xaxZlims][-1] + self.xax()[xaxZlims][0])) * axMult
-            ticksPos.append(pos)
+            self.line_xdata = list(xdata)
+            self.line_ydata = list(realData)
+        ticksPos = list((offsets + 0.5 * (self.xax()[xaxZlims][-1] + self.xax()[xaxZlims][0])) * axMult)
+        if incremental:
+            return
         self.ax.set_xticks(ticksPos)
         self.ax.set_xticklabels([('%#.3g') % x for x in self.xax(-2) * axMult2])
         self.ax.set_xlim(self.xminlim, self.xmaxlim)
@@ -3218,6 +3460,23 @@ class CurrentContour(CurrentStacked):
     INVERT_Y = True
     ZERO_SCROLL_ALLOWED = False
 
+    def __init__(self, root, fig, canvas, data, duplicateCurrent=None):
+        self.contourCache = plotCache.ContourCache()
+        self.contourLayers = []  # The contour plots in the axes, see plotContour
+        self.contourArtists = []
+        self.contourTimer = None
+        self.fullResolution = False
+        super(CurrentContour, self).__init__(root, fig, canvas, data, duplicateCurrent)
+
+    def kill(self):
+        """
+        Stops the background calculation of the contours.
+        """
+        if self.contourTimer is not None:
+            self.contourTimer.stop()
+            self.contourTimer = None
+        self.contourCache.shutdown()
+
     def startUp(self, xReset=True, yReset=True):
         """
         Run when starting this plot.
@@ -3440,11 +3699,17 @@ class CurrentContour(CurrentStacked):
         self.peakPickReset()
         tmpdata = np.real(self.getDataType(self.data1D.getHyperData(0)))
         if self.viewSettings["limitType"] == 0:
-            self.differ = np.max(np.abs(tmpdata))
+            self.differ = plotCache.SUMMARIES.absMax((self.data1D.dataVersion, self.viewSettings["plotType"]), tmpdata)
         else:
-            self.differ = np.max(np.abs(np.ravel(self.data.getHyperData(0))))
-        self.ax.cla()
-        self.clearProj()
+            self.differ = plotCache.SUMMARIES.absMax(self.data.dataVersion, lambda: self.data.getHyperData(0))
+        incremental = self.startPlot()
+        if incremental:
+            self.contourLayers = []
+            self.contourArtists = []
+        else:
+            self.ax.cla()
+            self.clearContours()
+            self.clearProj()
         for i in range(len(self.viewSettings["extraData"])):
             data = self.viewSettings["extraData"][i]
             try:
@@ -3476,7 +3741,7 @@ class CurrentContour(CurrentStacked):
             self.plotContour(self.line_xdata_extra[-1], self.line_ydata_extra[-1], self.line_zdata_extra[-1], color=[self.viewSettings["extraColor"][i],tuple(j+(1-j)*0.5 for j  in self.viewSettings["extraColor"][i])])
         axMult = self.getAxMult(self.spec(), self.getAxType(), self.getppm(), self.freq(), self.ref())
         axMult2 = self.getAxMult(self.spec(-2), self.getAxType(-2), self.getppm(-2), self.freq(-2), self.ref(-2))
-        if self.viewSettings["diagonalBool"]:
+        if self.viewSettings["diagonalBool"] and not incremental:
             add_diagonal(self.ax, self.viewSettings["diagonalMult"], c='k', ls='--')
         if oldData is not None:
             tmp = np.real(self.getDataType(oldData.getHyperData(0)))
@@ -3503,12 +3768,15 @@ class CurrentContour(CurrentStacked):
         self.line_xdata = [self.xax() * axMult]
         self.line_ydata = [self.xax(-2) * axMult2]
         self.line_zdata = [tmpdata]
+        key = (self.data1D.dataVersion, self.viewSettings["plotType"])
         if isinstance(self, CurrentMultiContour):
             tmpColor = COLORCONVERTER.to_rgb(self.viewSettings["contourColors"][0])
-            self.plotContour(self.line_xdata[-1], self.line_ydata[-1], self.line_zdata[-1], color=[tmpColor, tuple(j+(1-j)*0.5 for j  in tmpColor)])
+            self.plotContour(self.line_xdata[-1], self.line_ydata[-1], self.line_zdata[-1], color=[tmpColor, tuple(j+(1-j)*0.5 for j  in tmpColor)], key=key)
         else:
-            self.plotContour(self.line_xdata[-1], self.line_ydata[-1], self.line_zdata[-1])
+            self.plotContour(self.line_xdata[-1], self.line_ydata[-1], self.line_zdata[-1], key=key)
         self.showAllProj()
+        if incremental:
+            return
         self.ax.set_xlabel(self.getLabel(self.spec(), self.axes[-1], self.getAxType(), self.getppm()))
         self.ax.set_ylabel(self.getLabel(self.spec(-2), self.axes[-2], self.getAxType(-2), self.getppm(-2)))
         if self.spec():
@@ -3528,9 +3796,22 @@ class CurrentContour(CurrentStacked):
         self.setTicks()
         self.canvas.draw()
     
-    def plotContour(self, line_xdata, line_ydata, line_zdata, color=None, updateOnly=False):  
+    def contourLevels(self):
+        """
+        Returns the positive contour levels.
         """
-        Make the contour plot
+        if self.viewSettings["contourType"] == 0:  # if linear
+            return np.linspace(self.viewSettings["minLevels"] * self.differ, self.viewSettings["maxLevels"] * self.differ, self.viewSettings["numLevels"])
+        contourLevels = [self.viewSettings["minLevels"] * self.differ]  # Multiplier
+        while contourLevels[-1] < self.viewSettings["maxLevels"] * self.differ and len(contourLevels) < self.viewSettings["numLevels"]:
+            contourLevels.append(contourLevels[-1] * self.viewSettings["multiValue"])
+        return np.array(contourLevels)
+
+    def plotContour(self, line_xdata, line_ydata, line_zdata, color=None, updateOnly=False, key=None):
+        """
+        Make the contour plot.
+        The contours are calculated on a level of a resolution pyramid that matches the zoom and the canvas size,
+        see plotCache.DataPyramid, and are redrawn when a zoom requires another level.
 
         Parameters
         ----------
@@ -3544,19 +3825,210 @@ class CurrentContour(CurrentStacked):
             If not None, positive and negative contour colors should be in here
         updateOnly (optional = False): booleans
             If True, update only the contour plot
+        key (optional = None): hashable
+            Key of the data, which changes whenever the data changes.
+            When given, the pyramid and the contour lines are cached under this key.
         """
         if color is None and self.viewSettings["contourConst"]:
             color = self.viewSettings["contourColors"]
+        if plotCache.contourpy is None:
+            self.plotContourDirect(line_xdata, line_ydata, line_zdata, color, updateOnly)
+            return
+        if updateOnly:
+            self.clearContours()
+        if len(line_xdata) > 1 and len(line_ydata) > 1: # Do not plot if too few points
+            signs = (self.viewSettings["contourSign"] in (0, 1), self.viewSettings["contourSign"] in (0, 2) and self.viewSettings["plotType"] != 3)  # for Absolute plot no negative
+            self.contourLayers.append({"key": key,
+                                       "pyramid": self.contourCache.pyramid(key, line_xdata, line_ydata, line_zdata),
+                                       "levels": self.contourLevels(),
+                                       "signs": signs,
+                                       "color": color,
+                                       "vmax": max(np.abs(self.viewSettings["minLevels"] * self.differ), np.abs(self.viewSettings["maxLevels"] * self.differ)),
+                                       "plan": None})
+            self.drawContours([self.contourLayers[-1]])
+        self.setTicks()
+        if updateOnly:
+            self.canvas.draw()
+
+    def clearContours(self):
+        """
+        Removes the contour plots and stops their background calculation.
+        """
+        self.removeContourArtists()
+        self.contourLayers = []
+        self.contourCache.cancel()
+
+    def removeContourArtists(self):
+        """
+        Removes the contour lines from the axes.
+        """
+        for artist in self.contourArtists:
+            try:
+                artist.remove()
+            except Exception:  # Already removed by clearing the axes
+                pass
+        self.contourArtists = []
+
+    def contourPlan(self, layer, maxPoints=None):
+        """
+        Returns the pyramid level and tiles of a contour layer for the current view.
+        """
+        if self.fullResolution:
+            return layer["pyramid"].plan((self.xminlim, self.xmaxlim), (self.yminlim, self.ymaxlim), (np.inf, np.inf))
+        bbox = self.ax.get_window_extent()
+        return layer["pyramid"].plan((self.xminlim, self.xmaxlim), (self.yminlim, self.ymaxlim), (bbox.width, bbox.height), maxPoints)
+
+    def drawContours(self, layers=None, background=True):
+        """
+        Draws contour layers for the current view, using the cached contour lines where possible.
+        When many points are not yet contoured, a coarser level is drawn and the actual level is calculated in the background.
+
+        Parameters
+        ----------
+        layers (optional = None): list of dicts
+            The layers to draw, by default all layers are redrawn.
+        background (optional = True): bool
+            If False, all contours are calculated before drawing.
+        """
+        if layers is None:
+            # A redraw of all layers reuses the existing artists
+            layers = self.contourLayers
+            artists = self.contourArtists
+            self.contourArtists = []
+        else:
+            artists = []
+        for num, layer in enumerate(layers):
+            create, update = self.layerArtist(layer, background)
+            if num < len(artists) and update(artists[num]):
+                artist = artists[num]
+            else:
+                artist = self.previewArtist(create, update)
+            if artist is not None:
+                self.contourArtists.append(artist)
+        for artist in artists[len(self.contourArtists):]:
+            if artist.axes is not None:
+                artist.remove()
+
+    def layerArtist(self, layer, background=True):
+        """
+        Prepares the artist of a contour layer for the current view.
+
+        Parameters
+        ----------
+        layer: dict
+            The layer.
+        background (optional = True): bool
+            If False, all contours are calculated before drawing.
+
+        Returns
+        -------
+        function:
+            Makes the artist in the axes and returns it.
+        function:
+            Updates a given artist and returns True, or returns False when the artist does not match.
+        """
+        pyramid = layer["pyramid"]
+        factor, tiles = layer["plan"] = self.contourPlan(layer)
+        missing = self.contourCache.missing(layer["key"], factor, tiles, layer["levels"], layer["signs"])
+        if background and not self.fullResolution and layer["key"] is not None and pyramid.planPoints(factor, missing) > plotCache.CONTOURSYNCPOINTS:
+            self.contourCache.submit(layer["key"], pyramid, factor, missing, layer["levels"], layer["signs"])
+            self.startContourTimer()
+            factor, tiles = self.contourPlan(layer, plotCache.CONTOURSYNCPOINTS)
+        lines, lineLevels = self.contourCache.lines(layer["key"], pyramid, factor, tiles, layer["levels"], layer["signs"])
+        if layer["color"] is not None:
+            colors = [COLORCONVERTER.to_rgba(layer["color"][0]), COLORCONVERTER.to_rgba(layer["color"][1])]
+            colors = np.array(colors)[(lineLevels < 0).astype(int)]
+        else:
+            norm = matplotlib.colors.Normalize(-layer["vmax"], layer["vmax"])
+            colors = get_cmap(self.viewSettings["colorMap"])(norm(lineLevels))
+
+        def create():
+            return self.ax.add_collection(LineCollection(lines, colors=colors, linewidths=self.viewSettings["linewidth"], linestyles='solid'), autolim=False)
+
+        def update(collection):
+            if not isinstance(collection, LineCollection) or collection.axes is not self.ax:
+                return False
+            collection.set_segments(lines)
+            collection.set_color(colors)
+            collection.set_linewidth(self.viewSettings["linewidth"])
+            return True
+
+        return create, update
+
+    def startContourTimer(self):
+        """
+        Starts checking for the end of the background calculation of the contours.
+        """
+        if self.contourTimer is None:
+            self.contourTimer = self.canvas.new_timer(interval=plotCache.BACKGROUNDINTERVAL)
+            self.contourTimer.add_callback(self.checkContours)
+            self.contourTimer.start()
+
+    def checkContours(self):
+        """
+        Redraws the contours when the background calculation has finished.
+        """
+        if self.contourCache.busy():
+            return
+        self.contourTimer.stop()
+        self.contourTimer = None
+        if self.ax in self.fig.axes:
+            self.drawContours(background=False)
+            self.canvas.draw_idle()
+
+    def drawEvent(self, event):
+        """
+        Redraws the contours when the zoom or the canvas size requires another pyramid level or other tiles.
+        Otherwise the background of a preview is cached, see Current1D.drawEvent.
+
+        Parameters
+        ----------
+        event: draw event
+        """
+        if self.contourLayers and self.ax in self.fig.axes and any(self.contourPlan(layer) != layer["plan"] for layer in self.contourLayers):
+            self.contourCache.cancel()
+            self.drawContours()
+            self.canvas.draw_idle()
+        else:
+            super(CurrentContour, self).drawEvent(event)
+
+    def setFullResolution(self, full):
+        """
+        Draws the contours from the data at full resolution (for example for saving a figure), or again at the resolution of the canvas.
+
+        Parameters
+        ----------
+        full: bool
+            True for full resolution.
+        """
+        if self.fullResolution == full:
+            return
+        self.fullResolution = full
+        if self.contourLayers:
+            self.drawContours(background=False)
+
+    def plotContourDirect(self, line_xdata, line_ydata, line_zdata, color=None, updateOnly=False):
+        """
+        Make the contour plot with matplotlib at full resolution.
+        This is used when contourpy is not available.
+
+        Parameters
+        ----------
+        line_xdata: 1darray
+            xaxis
+        line_ydata: 1darray
+            yaxis
+        line_zdata: 2darray
+            Intensity (z) data
+        color (optional = None): list of colors
+            If not None, positive and negative contour colors should be in here
+        updateOnly (optional = False): booleans
+            If True, update only the contour plot
+        """
         X, Y = np.meshgrid(line_xdata, line_ydata)
         if updateOnly:  # Set some extra stuff if only the contour plot needs updating
             del self.ax.collections[:]  # Clear all plot collections
-        if self.viewSettings["contourType"] == 0:  # if linear
-            contourLevels = np.linspace(self.viewSettings["minLevels"] * self.differ, self.viewSettings["maxLevels"] * self.differ, self.viewSettings["numLevels"])
-        elif self.viewSettings["contourType"] == 1:  # if Multiplier
-            contourLevels = [self.viewSettings["minLevels"] * self.differ]
-            while contourLevels[-1] < self.viewSettings["maxLevels"] * self.differ and len(contourLevels) < self.viewSettings["numLevels"]:
-                contourLevels.append(contourLevels[-1] * self.viewSettings["multiValue"])
-            contourLevels = np.array(contourLevels)
+        contourLevels = self.contourLevels()
         # Trim matrix of unused rows/columns for more efficient contour plotting
         PlotPositive = False
         if self.viewSettings["contourSign"] == 0 or self.viewSettings["contourSign"] == 1:
@@ -3634,35 +4106,24 @@ class CurrentContour(CurrentStacked):
             x = self.line_xdata[-1]
             y = self.line_ydata[-1]
             tmpdata = self.line_zdata[-1]
+            # The sum and skyline projections of the main data are cached per data version
+            key = (self.data1D.dataVersion, self.viewSettings["plotType"])
         else:
             x = line_xdata
             y = line_ydata
             tmpdata = line_zdata
+            key = None
         yLimOld = self.y_ax.get_ylim()
         if color is None:
             color = self.viewSettings["color"]
         Limits = self.viewSettings["projLimits"]
-        topSlice = (slice(None), slice(None))
-        rightSlice = (slice(None), slice(None))
+        topLimits = None
+        rightLimits = None
         if self.viewSettings["projLimitsBool"] is True:
-            if Limits[0] < Limits[1]:
-                topSlice = (slice(Limits[0], Limits[1] + 1), slice(None))
-            elif Limits[0] > Limits[1]:
-                topSlice = (slice(Limits[1], Limits[0] + 1), slice(None))
-            else:
-                topSlice = (slice(Limits[0], Limits[0] + 1), slice(None))
-            if Limits[2] < Limits[3]:
-                rightSlice = (slice(None), slice(Limits[2], Limits[3] + 1))
-            elif Limits[2] > Limits[3]:
-                rightSlice = (slice(None), slice(Limits[3], Limits[2] + 1))
-            else:
-                rightSlice = (slice(None), slice(Limits[2], Limits[2] + 1))
-        if self.viewSettings["projTop"] == 0:
-            xprojdata = np.sum(tmpdata[topSlice], axis=0)
-        elif self.viewSettings["projTop"] == 1:
-            xprojdata = np.max(tmpdata[topSlice], axis=0)
-        elif self.viewSettings["projTop"] == 2:
-            xprojdata = np.min(tmpdata[topSlice], axis=0)
+            topLimits = (int(Limits[0]), int(Limits[1]))
+            rightLimits = (int(Limits[2]), int(Limits[3]))
+        if self.viewSettings["projTop"] in (0, 1, 2):
+            xprojdata = plotCache.SUMMARIES.projection(key, tmpdata, ('sum', 'max', 'min')[self.viewSettings["projTop"]], 0, topLimits)
         elif self.viewSettings["projTop"] == 4:
             if self.viewSettings["projPos"][0] >= tmpdata.shape[self.axes[-2]]:
                 self.viewSettings["projPos"][0] = tmpdata.shape[self.axes[-2]] - 1
@@ -3683,17 +4144,13 @@ class CurrentContour(CurrentStacked):
             xprojdata[x < np.min(y)] = np.nan
         if self.viewSettings["projTop"] != 3:
             self.line_xProjData.append(xprojdata)
-            self.x_ax.plot(x, self.line_xProjData[-1], color=color, linewidth=self.viewSettings["linewidth"], picker=True)
+            self.plotLine(x, self.line_xProjData[-1], ax=self.x_ax, color=color, linewidth=self.viewSettings["linewidth"], picker=True)
             #xmin, xmax = np.nanmin(xprojdata), np.nanmax(xprojdata)
             #self.x_ax.set_ylim([xmin - 0.15 * (xmax - xmin), xmax + 0.05 * (xmax - xmin)])  # Set projection limits, and force 15% whitespace below plot
             self.x_ax.set_ylim(self.zminlim_x_ax, self.zmaxlim_x_ax)
             self.x_ax.set_xlim(xLimOld)
-        if self.viewSettings["projRight"] == 0:
-            yprojdata = np.sum(tmpdata[rightSlice], axis=1)
-        elif self.viewSettings["projRight"] == 1:
-            yprojdata = np.max(tmpdata[rightSlice], axis=1)
-        elif self.viewSettings["projRight"] == 2:
-            yprojdata = np.min(tmpdata[rightSlice], axis=1)
+        if self.viewSettings["projRight"] in (0, 1, 2):
+            yprojdata = plotCache.SUMMARIES.projection(key, tmpdata, ('sum', 'max', 'min')[self.viewSettings["projRight"]], 1, rightLimits)
         elif self.viewSettings["projRight"] == 4:
             if self.viewSettings["projPos"][1] >= tmpdata.shape[self.axes[-1]]:
                 self.viewSettings["projPos"][1] = tmpdata.shape[self.axes[-1]] - 1
@@ -3714,11 +4171,13 @@ class CurrentContour(CurrentStacked):
             yprojdata[y < np.min(x)] = np.nan
         if self.viewSettings["projRight"] != 3:
             self.line_yProjData.append(yprojdata)
-            self.y_ax.plot(self.line_yProjData[-1], y, color=color, linewidth=self.viewSettings["linewidth"], picker=True)
+            self.plotLine(self.line_yProjData[-1], y, ax=self.y_ax, decimate=False, color=color, linewidth=self.viewSettings["linewidth"], picker=True)
             #ymin, ymax = np.nanmin(yprojdata), np.nanmax(yprojdata)
             #self.y_ax.set_xlim([ymin - 0.15 * (ymax - ymin), ymax + 0.05 * (ymax - ymin)])  # Set projection limits, and force 15% whitespace below plot
             self.y_ax.set_xlim(self.zminlim_y_ax, self.zmaxlim_y_ax)
             self.y_ax.set_ylim(yLimOld)
+        if self.previewMode == 'update':
+            return
         self.setTicks()
         self.canvas.draw()
 
@@ -3797,9 +4256,11 @@ class CurrentColour2D(CurrentContour):
     INVERT_Y = True
     ZERO_SCROLL_ALLOWED = False
     
-    def plotContour(self, line_xdata, line_ydata, line_zdata, color=None, updateOnly=False):  
+    def plotContour(self, line_xdata, line_ydata, line_zdata, color=None, updateOnly=False, key=None):
         """
-        Make the contour plot
+        Make the colour plot.
+        The image is drawn from a level of a resolution pyramid (the mean of blocks of points) that matches the zoom and the canvas size,
+        and only the tiles in view are drawn, see plotCache.DataPyramid.
 
         Parameters
         ----------
@@ -3810,22 +4271,62 @@ class CurrentColour2D(CurrentContour):
         line_zdata: 2darray
             Intensity (z) data
         color (optional = None): list of colors
-            If not None, positive and negative contour colors should be in here
+            Not used by the colour plot
         updateOnly (optional = False): booleans
-            If True, update only the contour plot
+            If True, update only the colour plot
+        key (optional = None): hashable
+            Key of the data, which changes whenever the data changes.
+            When given, the pyramid is cached under this key.
         """
-        if updateOnly:  # Set some extra stuff if only the contour plot needs updating
-            del self.ax.collections[:]  # Clear all plot collections
-
-        vmax = np.max(np.abs(line_zdata))
-        vmin = -vmax
-
-        self.ax.imshow(np.flipud(line_zdata), extent=[line_xdata[0],line_xdata[-1],line_ydata[0],line_ydata[-1]],
-                aspect='auto',cmap=get_cmap(self.viewSettings["pColorMap"]),vmax=vmax,vmin=vmin,interpolation='hanning')
+        if updateOnly:
+            self.clearContours()
+        pyramid = self.contourCache.pyramid(key, line_xdata, line_ydata, line_zdata)
+        self.contourLayers.append({"key": key,
+                                   "pyramid": pyramid,
+                                   "vmax": pyramid.absMax(),
+                                   "plan": None})
+        self.drawContours([self.contourLayers[-1]])
         self.setTicks()
         if updateOnly:
             self.canvas.draw()
 
+    def layerArtist(self, layer, background=True):
+        """
+        Prepares the image of a layer for the current view.
+
+        Parameters
+        ----------
+        layer: dict
+            The layer.
+        background (optional = True): bool
+            Not used by the colour plot
+
+        Returns
+        -------
+        function:
+            Makes the image in the axes and returns it.
+        function:
+            Updates a given image and returns True, or returns False when the image does not match.
+        """
+        factor, tiles = layer["plan"] = self.contourPlan(layer)
+        z, extent = layer["pyramid"].image(factor, tiles)
+        vmax = layer["vmax"]
+
+        def create():
+            return self.ax.imshow(z, extent=extent, origin='lower',
+                    aspect='auto',cmap=get_cmap(self.viewSettings["pColorMap"]),vmax=vmax,vmin=-vmax,interpolation='hanning')
+
+        def update(image):
+            if not isinstance(image, matplotlib.image.AxesImage) or image.axes is not self.ax:
+                return False
+            image.set_data(z)
+            image.set_clim(-vmax, vmax)
+            if list(image.get_extent()) != extent:
+                image.set_extent(extent)
+            return True
+
+        return create, update
+
             
 #########################################################################################################
 